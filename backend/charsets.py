@@ -0,0 +1,169 @@
+"""Detección de la codificación de los archivos de texto y decodificación en una sola pasada.
+
+`iter_decoded` toma como muestra el primer bloque del archivo (CHARSET_SAMPLE_KB) y decide:
+  1. BOM de UTF-8, UTF-16 o UTF-32
+  2. UTF-16 sin BOM (bytes nulos alternados, p. ej. exportaciones de Windows)
+  3. `<meta charset>` del HTML, si se pide, el codec existe y la muestra no es ya UTF-8 con acentos
+  4. UTF-8 si la muestra valida como UTF-8 (un carácter cortado al final de la muestra no cuenta)
+  5. entre las codificaciones de un byte, la que da texto más verosímil: se decodifica la muestra
+     con cada candidata y se puntúa cada carácter no ASCII (letras y puntuación tipográfica suman;
+     caracteres de control, símbolos sueltos y mayúsculas en medio de una palabra en minúsculas
+     restan). Así un archivo cp1252 con comillas “” y € ya no se lee como Latin-1.
+
+Después sigue leyendo el mismo archivo por bloques con un decoder incremental del codec elegido,
+así que cada byte se lee una sola vez. Si después de la muestra aparecen bytes que no son UTF-8
+válido se leen como cp1252 (o Latin-1 si cp1252 no los define) en lugar de fallar; en los codecs
+de un byte los bytes sin definir se reemplazan por U+FFFD.
+"""
+import codecs
+import logging
+import os
+import re
+import unicodedata
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CHARSET_SAMPLE_KB = int(os.getenv("CHARSET_SAMPLE_KB", 64))
+READ_BLOCK_SIZE = 64 * 1024
+
+# Codificaciones de un byte candidatas, en orden de preferencia ante un empate
+SINGLE_BYTE_CANDIDATES = ("cp1252", "iso-8859-15", "cp850", "mac_roman")
+FALLBACK_ENCODING = "latin-1"
+
+BOMS = (
+    # UTF-32 antes que UTF-16: el BOM de UTF-32 LE empieza con el de UTF-16 LE
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# Puntuación tipográfica habitual fuera de ASCII (lo que distingue a cp1252 de Latin-1)
+TYPOGRAPHIC = set("“”‘’«»–—…€¡¿°ºª·•")
+
+NON_ASCII_RE = re.compile(rb"[\x80-\xff]")
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_:.\-]+)""", re.IGNORECASE)
+# Bytes que cp1252 no define (se leen como Latin-1)
+CP1252_UNDEFINED = frozenset((0x81, 0x8D, 0x8F, 0x90, 0x9D))
+
+
+def _single_byte_fallback(error: UnicodeDecodeError):
+    """Los bytes que no son UTF-8 válido se leen como cp1252 o, si no lo definen, como Latin-1"""
+    chunk = error.object[error.start:error.end]
+    return "".join(chr(b) if b in CP1252_UNDEFINED else bytes([b]).decode("cp1252") for b in chunk), error.end
+
+
+codecs.register_error("single_byte_fallback", _single_byte_fallback)
+
+
+def _utf16_without_bom(sample: bytes) -> Optional[str]:
+    """utf-16-le/be si la mitad de los bytes pares o impares son nulos (texto mayormente ASCII)"""
+    if len(sample) < 4:
+        return None
+    pairs = len(sample) // 2
+    even_nulls = sample[0:pairs * 2:2].count(0)
+    odd_nulls = sample[1:pairs * 2:2].count(0)
+    if odd_nulls > pairs * 0.5 and even_nulls < pairs * 0.05:
+        return "utf-16-le"
+    if even_nulls > pairs * 0.5 and odd_nulls < pairs * 0.05:
+        return "utf-16-be"
+    return None
+
+
+def _is_utf8(sample: bytes) -> bool:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        # Sin final=True: una secuencia cortada al final de la muestra queda pendiente, no falla
+        decoder.decode(sample)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _declared_charset(sample: bytes) -> Optional[str]:
+    match = META_CHARSET_RE.search(sample)
+    if not match:
+        return None
+    try:
+        encoding = codecs.lookup(match.group(1).decode("ascii")).name
+    except LookupError:
+        return None
+    # Si el HTML se pudo leer como ASCII no está en UTF-16/32, diga lo que diga
+    return None if encoding.startswith(("utf-16", "utf-32")) else encoding
+
+
+def _plausibility(text: str, positions: List[int]) -> int:
+    """Puntaje de los caracteres no ASCII de `text` (en `positions`) según el carácter anterior"""
+    score = 0
+    for i in positions:
+        char = text[i]
+        if unicodedata.category(char)[0] == "C":
+            score -= 5
+        elif char.isalpha():
+            score += -2 if char.isupper() and i and text[i - 1].islower() else 2
+        elif char in TYPOGRAPHIC or char == "\xa0":
+            score += 1
+        else:
+            score -= 1
+    return score
+
+
+def _best_single_byte(sample: bytes) -> str:
+    # En un codec de un byte el carácter i es el byte i: las posiciones no ASCII son las mismas
+    positions = [match.start() for match in NON_ASCII_RE.finditer(sample)]
+    best, best_score = FALLBACK_ENCODING, None
+    for encoding in SINGLE_BYTE_CANDIDATES:
+        try:
+            text = sample.decode(encoding)
+        except UnicodeDecodeError:
+            # Byte sin definir en este codec (p. ej. 0x81 en cp1252)
+            continue
+        score = _plausibility(text, positions)
+        if best_score is None or score > best_score:
+            best, best_score = encoding, score
+    return best
+
+
+def detect_sample_encoding(sample: bytes, markup: bool = False) -> str:
+    """Codec con el que decodificar un archivo que empieza con `sample`.
+
+    Con `markup=True` (HTML) se respeta un `<meta charset>` salvo que la muestra ya sea UTF-8 con
+    caracteres no ASCII.
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    encoding = _utf16_without_bom(sample)
+    if encoding is None and markup and (sample.isascii() or not _is_utf8(sample)):
+        # Una muestra solo ASCII no dice nada: manda lo que declare el HTML
+        encoding = _declared_charset(sample)
+    if encoding is None and _is_utf8(sample):
+        encoding = "utf-8"
+    return encoding or _best_single_byte(sample)
+
+
+def detect_encoding(path: Path, markup: bool = False) -> str:
+    """Codec de `path`, decidido leyendo solo el comienzo del archivo"""
+    with open(path, "rb") as f:
+        return detect_sample_encoding(f.read(CHARSET_SAMPLE_KB * 1024), markup)
+
+
+def iter_decoded(path: Path, markup: bool = False) -> Iterator[str]:
+    """Decodifica el archivo por bloques en una sola pasada, detectando la codificación con el primero"""
+    with open(path, "rb") as f:
+        block = f.read(CHARSET_SAMPLE_KB * 1024)
+        encoding = detect_sample_encoding(block, markup)
+        logger.debug(f"Codificación detectada para {path.name}: {encoding}")
+        errors = "single_byte_fallback" if encoding == "utf-8" else "replace"
+        decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+        while block:
+            text = decoder.decode(block)
+            if text:
+                yield text
+            block = f.read(READ_BLOCK_SIZE)
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
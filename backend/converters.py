@@ -0,0 +1,361 @@
+"""Conversores de imágenes y documentos (CPU intensivos).
+
+Este módulo se ejecuta dentro de los procesos del pool (ver process_pool.py), por eso no depende
+de FastAPI: los errores se reportan con ConversionError, que sí se puede serializar entre procesos
+y main.py traduce a HTTPException.
+"""
+import logging
+import os
+import re
+import traceback
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from profiling import stage
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionError(Exception):
+    """Error de conversión con código HTTP y mensaje para el cliente"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+    def __str__(self):
+        return self.detail
+
+
+# Presupuesto de píxeles decodificados por imagen (o por frame). Reemplaza al aviso de Pillow
+# contra "decompression bombs": lo que cuenta es el tamaño que realmente se decodifica, así una
+# foto JPEG enorme que se pide reducida puede pasar gracias a draft()
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", 100_000_000))
+
+# Como en Image.thumbnail: se decodifica/reduce hasta el doble del tamaño final y el último paso
+# se hace con LANCZOS, así la calidad es la misma que redimensionando desde el original
+REDUCING_GAP = 2.0
+
+
+def target_size(size: Tuple[int, int], resize: Optional[dict] = None) -> Tuple[int, int]:
+    """Tamaño final según max_width, max_height y scale (nunca agranda y conserva la proporción)"""
+    width, height = size
+    if not resize:
+        return size
+    factor = 1.0
+    if resize.get("scale"):
+        factor = min(factor, resize["scale"])
+    if resize.get("max_width"):
+        factor = min(factor, resize["max_width"] / width)
+    if resize.get("max_height"):
+        factor = min(factor, resize["max_height"] / height)
+    if factor >= 1.0:
+        return size
+    return max(1, round(width * factor)), max(1, round(height * factor))
+
+
+def check_pixel_budget(img):
+    width, height = img.size
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ConversionError(
+            status_code=413,
+            detail=f"La imagen es demasiado grande ({width}x{height}, {width * height / 1e6:.0f} megapíxeles). "
+                   f"Máximo permitido: {IMAGE_MAX_PIXELS / 1e6:.0f} megapíxeles"
+                   + (". Prueba reduciendo el tamaño con max_width, max_height o scale" if img.format == "JPEG" else "")
+        )
+
+
+def open_image(input_path: Path, resize: Optional[dict] = None):
+    """Abre la imagen sin decodificarla y aplica el presupuesto de píxeles; retorna (imagen, tamaño final).
+    
+    En JPEG, si se pide un tamaño menor, draft() configura el decodificador para que entregue la
+    imagen ya reducida a 1/2, 1/4 u 1/8 (reducción en el dominio DCT) en lugar del tamaño original.
+    """
+    from PIL import Image
+    
+    # El control lo hace check_pixel_budget sobre lo que efectivamente se decodifica
+    Image.MAX_IMAGE_PIXELS = None
+    img = Image.open(input_path)
+    target = target_size(img.size, resize)
+    if img.format == "JPEG" and target != img.size:
+        img.draft(None, (int(target[0] * REDUCING_GAP), int(target[1] * REDUCING_GAP)))
+    check_pixel_budget(img)
+    return img, target
+
+
+def scale_image(img, size: Tuple[int, int]):
+    """Redimensiona a `size`; reducing_gap hace primero un reduce() entero (barato) y después LANCZOS"""
+    from PIL import Image
+    
+    if img.size == size:
+        return img
+    if img.mode in ("1", "P"):
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+
+
+def prepare_image_mode(img, output_format: str):
+    """Convierte modos de color problemáticos a RGB/RGBA según lo que soporta el formato de salida.
+    
+    Retorna la misma imagen si no hace falta convertirla.
+    """
+    from PIL import Image
+    
+    # Convertir modos de color problemáticos
+    if img.mode in ["P", "LA", "PA"]:
+        # P = Palette, LA = Luminance + Alpha, PA = Palette + Alpha
+        if img.mode == "P":
+            # Verificar si tiene transparencia
+            if "transparency" in img.info:
+                img = img.convert("RGBA")
+            else:
+                img = img.convert("RGB")
+        elif img.mode in ["LA", "PA"]:
+            img = img.convert("RGBA")
+    
+    # Convertir RGBA a RGB si es necesario (para formatos que no soportan transparencia)
+    if output_format in ["jpg", "jpeg"]:
+        # JPG no soporta transparencia, siempre convertir a RGB
+        if img.mode == "RGBA":
+            # Crear fondo blanco y pegar la imagen con transparencia
+            rgb_img = Image.new("RGB", img.size, (255, 255, 255))
+            if img.mode == "RGBA":
+                # Usar el canal alpha como máscara
+                alpha = img.split()[3] if len(img.split()) > 3 else None
+                rgb_img.paste(img, mask=alpha)
+            else:
+                rgb_img.paste(img)
+            img = rgb_img
+        elif img.mode not in ["RGB", "L"]:
+            # Convertir otros modos a RGB
+            img = img.convert("RGB")
+    elif output_format in ["bmp", "webp"]:
+        # BMP y WEBP pueden manejar RGBA, pero mejor convertir a RGB si no hay transparencia
+        if img.mode == "RGBA" and output_format == "bmp":
+            # BMP no soporta transparencia bien, convertir a RGB
+            rgb_img = Image.new("RGB", img.size, (255, 255, 255))
+            rgb_img.paste(img, mask=img.split()[3] if len(img.split()) > 3 else None)
+            img = rgb_img
+    elif output_format == "png":
+        # PNG soporta transparencia, mantener RGBA si existe
+        if img.mode not in ["RGB", "RGBA", "L", "LA", "P"]:
+            img = img.convert("RGBA")
+    elif output_format == "gif":
+        # GIF puede tener transparencia
+        if img.mode not in ["RGB", "RGBA", "P", "L"]:
+            img = img.convert("RGB")
+    return img
+
+
+def pillow_save_args(output_format: str, preset: Optional[str] = None):
+    """Formato de Pillow y opciones de guardado para un formato de salida y preset (ver presets.py)"""
+    from presets import image_save_options
+    
+    format_map = {
+        "jpg": "JPEG",
+        "jpeg": "JPEG",
+        "png": "PNG",
+        "gif": "GIF",
+        "bmp": "BMP",
+        "webp": "WEBP",
+        "tiff": "TIFF",
+        "ico": "ICO"
+    }
+    
+    pillow_format = format_map.get(output_format.lower(), output_format.upper())
+    
+    # Opciones de guardado según el formato
+    return pillow_format, image_save_options(pillow_format, preset)
+
+
+def convert_image_sync(input_path: Path, output_path: Path, output_format: str, frames: Optional[str] = None,
+                       resize: Optional[dict] = None, preset: Optional[str] = None):
+    """Convierte imágenes usando Pillow (se ejecuta en un proceso del pool).
+    
+    `frames` ("auto", "first" o "all") decide qué pasa con GIF/WebP animados y TIFF de varias
+    páginas; ver multiframe.py. `resize` (max_width, max_height, scale) reduce la imagen, en JPEG
+    ya desde el decodificador. `preset` elige velocidad vs tamaño de la codificación.
+    """
+    try:
+        with stage("decode"):
+            img, size = open_image(input_path, resize)
+        
+        import multiframe
+        if multiframe.wants_all_frames(img, output_format, frames or "auto"):
+            # Cada frame se decodifica, transforma y codifica por separado: una sola etapa
+            with stage("frames"):
+                multiframe.convert_frames(img, input_path, output_path, output_format, resize, preset)
+            return
+        
+        # Manejar GIFs animados - tomar solo el primer frame
+        if img.format == "GIF":
+            try:
+                # Verificar si es animado
+                if hasattr(img, 'is_animated') and img.is_animated:
+                    # Ir al primer frame y copiarlo
+                    img.seek(0)
+                    # Crear una copia del primer frame
+                    first_frame = img.copy()
+                    img = first_frame
+            except Exception as e:
+                logger.warning(f"Error manejando GIF animado, usando frame actual: {str(e)}")
+                # Si hay error, simplemente usar la imagen tal como está
+                pass
+        
+        with stage("decode"):
+            # Pillow decodifica al primer acceso a los píxeles: forzarlo aquí para medir la etapa
+            img.load()
+        
+        with stage("transform"):
+            # Convertir modos de color problemáticos a RGB/RGBA según necesidad
+            # Esto debe hacerse antes de las conversiones específicas de formato
+            img = prepare_image_mode(img, output_format)
+            img = scale_image(img, size)
+        
+        # Guardar en el nuevo formato
+        with stage("encode"):
+            pillow_format, save_kwargs = pillow_save_args(output_format, preset)
+            img.save(output_path, format=pillow_format, **save_kwargs)
+        
+    except ConversionError:
+        raise
+    except Exception as e:
+        logger.error(f"Error convirtiendo imagen: {str(e)}\n{traceback.format_exc()}")
+        raise ConversionError(
+            status_code=500,
+            detail=f"Error al convertir imagen: {str(e)}"
+        )
+
+
+# Formatos de salida a los que se extrae el texto de un PDF página por página
+PDF_TEXT_FORMATS = ("txt", "md", "html", "docx")
+
+# Separador de páginas en los archivos parciales de la extracción en paralelo
+PAGE_SEPARATOR = "\f"
+
+def parse_page_range(spec: str, page_count: Optional[int] = None) -> List[int]:
+    """Convierte un rango como "1-5,8,10-" (páginas desde 1) en índices desde 0.
+
+    Sin `page_count` solo valida la sintaxis (los rangos abiertos "10-" quedan sin resolver).
+    """
+    pages = []
+    for part in spec.replace(" ", "").split(","):
+        match = re.fullmatch(r"(\d*)(-?)(\d*)", part)
+        if not part or not match or not (match.group(1) or match.group(3)) or (match.group(3) and not match.group(2)):
+            raise ConversionError(
+                status_code=400,
+                detail=f"Rango de páginas inválido: '{spec}'. Usa por ejemplo 1-5,8,10-"
+            )
+        first = int(match.group(1)) if match.group(1) else 1
+        last = int(match.group(3)) if match.group(3) else (first if not match.group(2) else page_count)
+        if first < 1 or (last is not None and last < first):
+            raise ConversionError(status_code=400, detail=f"Rango de páginas inválido: '{part}'")
+        if page_count is None:
+            continue
+        if first > page_count:
+            raise ConversionError(
+                status_code=400,
+                detail=f"La página {first} no existe: el PDF tiene {page_count} páginas"
+            )
+        pages.extend(range(first - 1, min(last, page_count)))
+    # Quitar repetidas manteniendo el orden pedido
+    return list(dict.fromkeys(pages))
+
+
+def open_pdf(pdf_path: Path):
+    """Abre un PDF con PyPDF2 (las páginas se leen a medida que se piden)"""
+    try:
+        import PyPDF2
+    except ImportError:
+        raise ConversionError(
+            status_code=500,
+            detail="PyPDF2 no está instalado. Ejecuta: pip install PyPDF2"
+        )
+    try:
+        reader = PyPDF2.PdfReader(str(pdf_path))
+        page_count = len(reader.pages)
+    except Exception as e:
+        logger.error(f"Error abriendo PDF: {str(e)}\n{traceback.format_exc()}")
+        raise ConversionError(status_code=500, detail=f"Error al leer archivo PDF: {str(e)}")
+    if page_count == 0:
+        raise ConversionError(
+            status_code=400,
+            detail="El archivo PDF está vacío o no tiene páginas"
+        )
+    return reader
+
+
+def pdf_page_numbers(pdf_path: Path, pages: Optional[str] = None) -> List[int]:
+    """Índices (desde 0) de las páginas a extraer: todas, o las del rango `pages`"""
+    page_count = len(open_pdf(pdf_path).pages)
+    if not pages:
+        return list(range(page_count))
+    return parse_page_range(pages, page_count)
+
+
+def iter_pdf_text(pdf_path: Path, page_numbers: Optional[Iterable[int]] = None) -> Iterator[str]:
+    """Genera el texto de cada página con contenido, sin cargar el texto del documento completo"""
+    reader = open_pdf(pdf_path)
+    if page_numbers is None:
+        page_numbers = range(len(reader.pages))
+    for page_num in page_numbers:
+        try:
+            text = reader.pages[page_num].extract_text()
+        except Exception as e:
+            logger.error(f"Error extrayendo texto de la página {page_num + 1}: {str(e)}\n{traceback.format_exc()}")
+            raise ConversionError(status_code=500, detail=f"Error al leer archivo PDF: {str(e)}")
+        if text and text.strip():
+            yield text
+
+
+def extract_pdf_text_to_file(pdf_path: Path, part_path: Path, page_numbers: List[int]) -> int:
+    """Extrae un tramo de páginas a un archivo parcial (tarea de la extracción en paralelo)"""
+    count = 0
+    with open(part_path, "w", encoding="utf-8") as f:
+        for text in iter_pdf_text(pdf_path, page_numbers):
+            f.write(text.replace(PAGE_SEPARATOR, "") + PAGE_SEPARATOR)
+            count += 1
+    return count
+
+
+def iter_text_parts(part_paths: Iterable[Path]) -> Iterator[str]:
+    """Lee en orden las páginas de los archivos parciales"""
+    for part_path in part_paths:
+        with open(part_path, "r", encoding="utf-8") as f:
+            for text in f.read().split(PAGE_SEPARATOR):
+                if text:
+                    yield text
+
+
+def convert_pdf_text_sync(input_path: Path, output_path: Path, output_format: str,
+                          page_numbers: Optional[List[int]] = None):
+    """Extrae el texto de un PDF (todas las páginas o solo `page_numbers`) directo al archivo de salida"""
+    import documents
+    documents.write_document(documents.page_lines(iter_pdf_text(input_path, page_numbers)), output_path, output_format)
+
+
+def write_text_parts_sync(part_paths: List[Path], output_path: Path, output_format: str):
+    """Une los archivos parciales de la extracción en paralelo en el formato de salida"""
+    import documents
+    documents.write_document(documents.page_lines(iter_text_parts(part_paths)), output_path, output_format)
+
+
+def convert_document_sync(input_path: Path, output_path: Path, output_format: str, pages: Optional[str] = None):
+    """Convierte documentos con manejo robusto de errores (se ejecuta en un proceso del pool).
+    
+    El lector del formato de entrada y el escritor del de salida se conectan en documents.py.
+    `pages` ("1-5,8") limita la extracción de texto de un PDF a esas páginas.
+    """
+    import documents
+    try:
+        with stage("document"):
+            documents.convert_document(input_path, output_path, output_format, pages)
+    except ConversionError:
+        raise
+    except Exception as e:
+        logger.error(f"Error en convert_document: {str(e)}\n{traceback.format_exc()}")
+        raise ConversionError(
+            status_code=500,
+            detail=f"Error al convertir documento: {str(e)}"
+        )
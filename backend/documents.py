@@ -0,0 +1,250 @@
+"""Conversión de documentos por lectores y escritores sobre una representación intermedia común.
+
+Cada formato de entrada tiene un lector que genera las líneas del documento (sin el salto de
+línea final; una línea vacía separa párrafos) y cada formato de salida un escritor que las
+consume a medida que llegan. Cualquier combinación lector × escritor funciona, el texto de
+entrada se decodifica una sola vez y los archivos grandes pasan en memoria acotada (salvo DOCX,
+que python-docx carga completo). La codificación del texto la detecta charsets.py.
+
+Para agregar un formato basta con registrar su lector (`@reader(".ext")`) o su escritor
+(`@writer("fmt")`). Se ejecuta dentro de los procesos del pool, como converters.py.
+"""
+import html
+import logging
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from charsets import iter_decoded
+from converters import ConversionError, iter_pdf_text, pdf_page_numbers
+
+logger = logging.getLogger(__name__)
+
+Reader = Callable[[Path, Optional[str]], Iterator[str]]
+Writer = Callable[[Iterable[str], Path], None]
+
+READERS: Dict[str, Reader] = {}
+WRITERS: Dict[str, Writer] = {}
+
+# Lector por defecto para extensiones sin lector propio (rtf, odt, md, txt...): texto plano
+TEXT_READER_KEY = "*"
+
+# Plantilla de las salidas HTML (el texto va dentro de <pre>)
+HTML_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Documento Convertido</title>
+</head>
+<body>
+"""
+HTML_FOOTER = """</pre>
+</body>
+</html>"""
+
+
+def reader(*extensions: str):
+    """Registra un lector para las extensiones dadas (con punto, p. ej. ".docx")"""
+    def register(fn: Reader) -> Reader:
+        for ext in extensions:
+            READERS[ext] = fn
+        return fn
+    return register
+
+
+def writer(*formats: str):
+    """Registra un escritor para los formatos de salida dados"""
+    def register(fn: Writer) -> Writer:
+        for fmt in formats:
+            WRITERS[fmt] = fn
+        return fn
+    return register
+
+
+# --- Líneas ------------------------------------------------------------------------------------
+
+def _normalize_newlines(text: str) -> str:
+    return text.replace("\r\n", "\n").replace("\r", "\n") if "\r" in text else text
+
+
+def split_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Parte texto que llega por bloques en líneas, igual que str.split("\\n") sobre el texto completo.
+
+    Los saltos "\\r\\n" y "\\r" se normalizan como al abrir un archivo en modo texto. Cada bloque
+    se recorre una sola vez: el comienzo de la línea en curso se guarda en partes y se une recién
+    cuando llega su salto, así una línea enorme no se vuelve a copiar con cada bloque.
+    """
+    pending: List[str] = []  # comienzo de la línea en curso, en partes
+    carriage_return = False
+    for chunk in chunks:
+        if carriage_return:
+            chunk = "\r" + chunk
+        # Un "\r\n" puede quedar partido entre dos bloques: el "\r" final espera al siguiente
+        carriage_return = chunk.endswith("\r")
+        if carriage_return:
+            chunk = chunk[:-1]
+        first, *lines = _normalize_newlines(chunk).split("\n")
+        pending.append(first)
+        if lines:
+            yield "".join(pending)
+            *lines, last = lines
+            yield from lines
+            pending = [last]
+    if carriage_return:
+        yield "".join(pending)
+        pending = []
+    yield "".join(pending)
+
+
+# --- Lectores ------------------------------------------------------------------------------------
+
+@reader(TEXT_READER_KEY, ".txt", ".md", ".rtf", ".odt")
+def read_text(path: Path, pages: Optional[str] = None) -> Iterator[str]:
+    """Texto plano (los RTF y ODT se leen como texto, igual que antes)"""
+    return split_lines(iter_decoded(path))
+
+
+class _TextExtractor(HTMLParser):
+    """Acumula el texto de un HTML sin etiquetas, con las entidades ya convertidas"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+
+    def handle_data(self, data: str):
+        self.parts.append(data)
+
+    def take(self) -> str:
+        text = "".join(self.parts)
+        self.parts = []
+        return text
+
+
+@reader(".html", ".htm")
+def read_html(path: Path, pages: Optional[str] = None) -> Iterator[str]:
+    """Texto de un HTML sin etiquetas (el parser es incremental: el archivo se lee por bloques)"""
+    def chunks():
+        parser = _TextExtractor()
+        for text in iter_decoded(path, markup=True):
+            parser.feed(text)
+            yield parser.take()
+        parser.close()
+        yield parser.take()
+    return split_lines(chunks())
+
+
+@reader(".docx")
+def read_docx(path: Path, pages: Optional[str] = None) -> Iterator[str]:
+    from docx import Document
+    try:
+        doc = Document(path)
+    except Exception as e:
+        logger.error(f"Error leyendo DOCX: {str(e)}")
+        raise ConversionError(status_code=500, detail=f"Error al leer archivo DOCX: {str(e)}")
+    for para in doc.paragraphs:
+        yield from para.text.split("\n")
+
+
+@reader(".pdf")
+def read_pdf(path: Path, pages: Optional[str] = None) -> Iterator[str]:
+    """Texto de un PDF página por página (`pages` limita las páginas), con una línea vacía entre páginas"""
+    page_numbers = pdf_page_numbers(path, pages) if pages else None
+    return page_lines(iter_pdf_text(path, page_numbers))
+
+
+def page_lines(pages: Iterable[str]) -> Iterator[str]:
+    """Líneas de una secuencia de páginas de texto; falla si ninguna tiene texto"""
+    count = 0
+    for text in pages:
+        if count:
+            yield ""
+        yield from text.split("\n")
+        count += 1
+    if not count:
+        raise ConversionError(
+            status_code=400,
+            detail="El archivo PDF no contiene texto extraíble. Puede ser un PDF escaneado (imagen) o estar protegido."
+        )
+
+
+# --- Escritores ----------------------------------------------------------------------------------
+
+@writer("txt", "md")
+def write_text(lines: Iterable[str], output_path: Path):
+    with open(output_path, "w", encoding="utf-8") as f:
+        first = True
+        for line in lines:
+            f.write(line if first else "\n" + line)
+            first = False
+
+
+@writer("html")
+def write_html(lines: Iterable[str], output_path: Path):
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(HTML_HEADER + "    <pre>")
+        first = True
+        for line in lines:
+            escaped = html.escape(line)
+            f.write(escaped if first else "\n" + escaped)
+            first = False
+        f.write(HTML_FOOTER)
+
+
+@writer("docx")
+def write_docx(lines: Iterable[str], output_path: Path):
+    """Un párrafo por línea con texto y un párrafo vacío entre bloques separados por líneas vacías"""
+    from docx import Document
+    doc = Document()
+    started = gap = False
+    for line in lines:
+        if not line:
+            gap = started
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        if gap:
+            doc.add_paragraph()
+            gap = False
+        doc.add_paragraph(line)
+        started = True
+    doc.save(str(output_path))
+
+
+@writer("pdf")
+def write_pdf(lines: Iterable[str], output_path: Path):
+    """PDF A4 con Helvetica 10 y márgenes de 50 pt, partiendo las líneas en tiempo lineal"""
+    try:
+        from pdf_layout import render_text_pdf
+    except ImportError:
+        raise ConversionError(
+            status_code=500,
+            detail="Librería reportlab no está instalada. Ejecuta: pip install reportlab"
+        )
+    render_text_pdf(lines, output_path)
+
+
+# --- Conversión ----------------------------------------------------------------------------------
+
+def write_document(lines: Iterable[str], output_path: Path, output_format: str):
+    """Escribe las líneas de la representación intermedia con el escritor de `output_format`"""
+    write = WRITERS.get(output_format)
+    if write is None:
+        raise ConversionError(
+            status_code=400,
+            detail=f"Conversión de documentos a {output_format} no está implementada aún. "
+                   f"Formatos disponibles: {', '.join(WRITERS)}"
+        )
+    write(lines, output_path)
+
+
+def convert_document(input_path: Path, output_path: Path, output_format: str, pages: Optional[str] = None):
+    """Convierte un documento conectando el lector de su extensión con el escritor del formato de salida"""
+    input_ext = input_path.suffix.lower()
+    if input_ext.lstrip(".") == output_format:
+        raise ConversionError(
+            status_code=400,
+            detail=f"El archivo ya es un {output_format.upper()}. No es necesario convertirlo."
+        )
+    read = READERS.get(input_ext, READERS[TEXT_READER_KEY])
+    write_document(read(input_path, pages), output_path, output_format)
@@ -0,0 +1,101 @@
+"""Validadores HTTP de /download: ETag fuerte por contenido, If-None-Match y Cache-Control.
+
+Las salidas no cambian una vez escritas, así que el ETag es el SHA-256 del archivo. Se calcula la
+primera vez que se descarga (en un hilo) y se guarda en memoria junto con el tamaño y mtime del
+archivo; si el archivo se reemplaza, el hash se vuelve a calcular. Los rangos (Range / If-Range)
+los resuelve FileResponse de Starlette usando este mismo ETag.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# "no-store": sin caché (comportamiento anterior); "revalidate": el cliente guarda la descarga y la
+# revalida con If-None-Match; "immutable": además las salidas de la caché de resultados (nombre =
+# hash) se sirven como públicas e inmutables por un año, para que un CDN las pueda retener
+DOWNLOAD_CACHE_MODES = ("no-store", "revalidate", "immutable")
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class ETagStore:
+    """ETags de los archivos de salida, indexados por nombre y validados con (tamaño, mtime)"""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, int, int], asyncio.Task] = {}
+        self.computed = 0
+
+    def _lookup(self, path: Path, stat: os.stat_result) -> Optional[str]:
+        entry = self._entries.get(path.name)
+        if entry is None or entry[:2] != (stat.st_size, stat.st_mtime_ns):
+            return None
+        self._entries.move_to_end(path.name)
+        return entry[2]
+
+    async def get(self, path: Path, stat: os.stat_result) -> str:
+        """ETag entre comillas; las descargas simultáneas del mismo archivo comparten un solo cálculo"""
+        etag = self._lookup(path, stat)
+        if etag is not None:
+            return etag
+        key = (path.name, stat.st_size, stat.st_mtime_ns)
+        task = self._pending.get(key)
+        if task is None:
+            # Tarea propia: si el cliente que la inició se desconecta, las demás descargas no se cancelan
+            task = asyncio.create_task(self._compute(path, key))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _compute(self, path: Path, key: Tuple[str, int, int]) -> str:
+        etag = f'"{await asyncio.to_thread(file_sha256, path)}"'
+        self.computed += 1
+        self._entries[key[0]] = (key[1], key[2], etag)
+        self._entries.move_to_end(key[0])
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return etag
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """True si If-None-Match coincide con el ETag (comparación débil, como pide RFC 9110)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def cache_headers(mode: str, content_addressed: bool) -> dict:
+    """Cache-Control (y compañía) de una descarga según DOWNLOAD_CACHE_MODE"""
+    if mode == "no-store":
+        return {
+            "Cache-Control": "no-cache, no-store, must-revalidate",
+            "Pragma": "no-cache",
+            "Expires": "0",
+        }
+    if mode == "immutable" and content_addressed:
+        return {"Cache-Control": f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"}
+    return {"Cache-Control": "private, no-cache"}
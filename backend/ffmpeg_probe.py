@@ -0,0 +1,107 @@
+"""Detección de FFmpeg y de sus encoders de audio (se ejecuta al arrancar, no en cada petición)"""
+import asyncio
+import logging
+import shutil
+import time
+from dataclasses import dataclass, field
+from typing import FrozenSet, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Encoder de FFmpeg que usa convert_media para cada formato de salida de audio
+AUDIO_ENCODERS = {
+    "mp3": "libmp3lame",
+    "wav": "pcm_s16le",
+    "aac": "aac",
+    "ogg": "libvorbis",
+    "flac": "flac",
+    "m4a": "aac",
+    "wma": "wmav2",
+}
+
+
+@dataclass
+class FFmpegCapabilities:
+    """Resultado de la detección de FFmpeg"""
+    available: bool = False
+    path: Optional[str] = None
+    version: Optional[str] = None
+    encoders: FrozenSet[str] = field(default_factory=frozenset)
+    probed_at: float = 0.0
+    error: Optional[str] = None
+
+    def supports(self, output_format: str) -> bool:
+        """Indica si el host puede codificar audio en `output_format`"""
+        encoder = AUDIO_ENCODERS.get(output_format)
+        return self.available and encoder is not None and encoder in self.encoders
+
+    def supported_formats(self, formats: Iterable[str]) -> List[str]:
+        return [fmt for fmt in formats if self.supports(fmt)]
+
+    def to_dict(self) -> dict:
+        return {
+            "available": self.available,
+            "path": self.path,
+            "version": self.version,
+            "encoders": sorted(self.encoders & set(AUDIO_ENCODERS.values())),
+            "formats": self.supported_formats(AUDIO_ENCODERS),
+            "probed_at": self.probed_at,
+            "error": self.error,
+        }
+
+
+async def _run(*cmd: str) -> str:
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=30.0)
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode("utf-8", errors="ignore")[-300:] or f"returncode {process.returncode}")
+    return stdout.decode("utf-8", errors="ignore")
+
+
+def parse_encoders(output: str) -> FrozenSet[str]:
+    """Extrae los nombres de encoder de la salida de `ffmpeg -encoders`"""
+    encoders = set()
+    in_list = False
+    for line in output.splitlines():
+        if line.strip().startswith("------"):
+            in_list = True
+            continue
+        if not in_list:
+            continue
+        parts = line.split()
+        # Formato: " A....D libmp3lame           libmp3lame MP3 (MPEG audio layer 3)"
+        if len(parts) >= 2:
+            encoders.add(parts[1])
+    return frozenset(encoders)
+
+
+async def probe_ffmpeg(binary: str = "ffmpeg") -> FFmpegCapabilities:
+    """Localiza FFmpeg y obtiene su versión y encoders disponibles"""
+    path = shutil.which(binary)
+    if path is None:
+        logger.warning("FFmpeg no está instalado o no está en el PATH: la conversión de audio no estará disponible")
+        return FFmpegCapabilities(probed_at=time.time(), error="FFmpeg no encontrado en el PATH")
+    try:
+        version_output = await _run(path, "-hide_banner", "-version")
+        encoders_output = await _run(path, "-hide_banner", "-encoders")
+    except (OSError, RuntimeError, asyncio.TimeoutError) as e:
+        logger.error(f"Error detectando capacidades de FFmpeg: {str(e)}")
+        return FFmpegCapabilities(path=path, probed_at=time.time(), error=str(e))
+
+    first_line = version_output.splitlines()[0] if version_output else ""
+    # "ffmpeg version 6.1.1-3ubuntu5 Copyright (c) ..."
+    version = first_line.split()[2] if first_line.startswith("ffmpeg version") and len(first_line.split()) > 2 else first_line
+    capabilities = FFmpegCapabilities(
+        available=True,
+        path=path,
+        version=version,
+        encoders=parse_encoders(encoders_output),
+        probed_at=time.time(),
+    )
+    missing = [fmt for fmt in AUDIO_ENCODERS if not capabilities.supports(fmt)]
+    logger.info(f"FFmpeg {version} en {path}" + (f" (sin encoder para: {', '.join(missing)})" if missing else ""))
+    return capabilities
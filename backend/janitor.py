@@ -0,0 +1,173 @@
+"""Limpieza en segundo plano de UPLOAD_DIR y OUTPUT_DIR: expiración por antigüedad y cuota de disco"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from shared_state import MemoryStore
+
+logger = logging.getLogger(__name__)
+
+
+class FileIndex:
+    """Índice de los archivos temporales, ordenado del más antiguo al más reciente.
+
+    Los archivos se registran al crearse, así la limpieza nunca necesita recorrer los directorios
+    (solo se hace un `scandir` al arrancar para recuperar lo que quedó de ejecuciones anteriores).
+    Las entradas viven en el store de shared_state.py: en memoria con un solo worker o en SQLite
+    cuando varios procesos comparten los directorios.
+    """
+
+    def __init__(self, store: Optional[MemoryStore] = None):
+        self.store = store or MemoryStore()
+
+    @property
+    def total_bytes(self) -> int:
+        return self.store.file_totals()[1]
+
+    def add(self, path: Path, size: Optional[int] = None, pinned: bool = False):
+        """Registra (o renueva) un archivo como recién creado; con `pinned` ya queda fijado (ver `pin`)"""
+        if size is None:
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                return
+        self.store.file_add(str(path), size, time.time(), pinned=pinned)
+
+    def touch(self, path: Path):
+        """Marca un archivo como usado recientemente (p. ej. acierto de caché)"""
+        self.store.file_touch(str(path), time.time())
+
+    def remove(self, path: Path) -> Optional[int]:
+        """Quita el archivo del índice (y su pin); retorna su tamaño o None si ya no estaba"""
+        return self.store.file_remove(str(path))
+
+    def pin(self, path: Path):
+        """Protege un archivo en uso (p. ej. entrada de una conversión en curso) de la limpieza"""
+        self.store.file_pin(str(path))
+
+    def unpin(self, path: Path):
+        self.store.file_unpin(str(path))
+
+    def bytes_in(self, directory: Path) -> int:
+        return self.store.file_bytes(str(directory))
+
+    def oldest_first(self) -> List[Tuple[str, int, float]]:
+        """(ruta, tamaño, timestamp) de los archivos no fijados, del más antiguo al más reciente"""
+        return self.store.file_oldest()
+
+    def scan(self, directories: Iterable[Path]):
+        """Registra los archivos existentes usando su mtime (solo al arrancar)"""
+        found = []
+        for directory in directories:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        found.append((stat.st_mtime, entry.path, stat.st_size))
+        found.sort()
+        for mtime, path, size in found:
+            self.add_existing(path, size, mtime)
+
+    def add_existing(self, path, size: int, mtime: float):
+        """Registra un archivo que ya existía al arrancar"""
+        # Otro worker pudo registrarlo antes (con su timestamp real): no pisarlo
+        self.store.file_add(str(path), size, mtime, if_missing=True)
+
+    def __len__(self):
+        return self.store.file_totals()[0]
+
+
+class Janitor:
+    """Tarea asyncio que elimina archivos expirados y mantiene el total bajo la cuota.
+
+    `remove_file` borra un archivo del índice de su almacenamiento (por defecto `Path.unlink`; las
+    salidas guardadas en S3 se borran del bucket). El barrido corre en un hilo para que esas
+    peticiones (y las esperas del store SQLite) no bloqueen el event loop; por eso `on_delete` se
+    llama desde ese hilo y tiene que ser seguro entre hilos.
+    """
+
+    def __init__(self, index: FileIndex, max_age_seconds: float, quota_bytes: int, interval_seconds: float = 60,
+                 on_delete: Optional[Callable[[Path], None]] = None,
+                 remove_file: Optional[Callable[[Path], None]] = None):
+        self.index = index
+        self.remove_file = remove_file or Path.unlink
+        # Con varios workers compartiendo el índice, solo barre el que tiene el turno
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.max_age_seconds = max_age_seconds
+        self.quota_bytes = quota_bytes
+        self.interval_seconds = interval_seconds
+        self.on_delete = on_delete
+        self.bytes_reclaimed = 0
+        self.files_deleted = 0
+        self.sweeps = 0
+        self.last_sweep: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="janitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # El turno dura dos intervalos: si el worker que barre muere, otro lo toma
+                store = self.index.store
+                if await store.call(store.acquire_lease, "janitor", self.owner, self.interval_seconds * 2):
+                    await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Error en la limpieza de archivos temporales: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def sweep(self) -> int:
+        """Elimina primero lo expirado y luego lo más antiguo hasta cumplir la cuota; retorna bytes liberados"""
+        reclaimed = 0
+        limit = time.time() - self.max_age_seconds
+        total = self.index.total_bytes
+        for path, size, created in self.index.oldest_first():
+            expired = self.max_age_seconds > 0 and created < limit
+            over_quota = self.quota_bytes > 0 and total > self.quota_bytes
+            if not expired and not over_quota:
+                break
+            removed = self.index.remove(Path(path))
+            if removed is not None:
+                total -= removed
+                reclaimed += self._delete(Path(path), removed)
+        self.sweeps += 1
+        self.last_sweep = time.time()
+        if reclaimed:
+            logger.info(f"Limpieza: {reclaimed} bytes liberados ({len(self.index)} archivos en disco)")
+        return reclaimed
+
+    def _delete(self, path: Path, size: int) -> int:
+        """Borra un archivo que ya se quitó del índice"""
+        try:
+            self.remove_file(path)
+        except FileNotFoundError:
+            # Ya eliminado por otro medio (/cleanup, desalojo de la caché)
+            return 0
+        self.bytes_reclaimed += size
+        self.files_deleted += 1
+        if self.on_delete is not None:
+            self.on_delete(path)
+        return size
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self.index),
+            "bytes": self.index.total_bytes,
+            "quota_bytes": self.quota_bytes,
+            "max_age_seconds": self.max_age_seconds,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "files_deleted": self.files_deleted,
+            "sweeps": self.sweeps,
+            "last_sweep": self.last_sweep,
+        }
@@ -0,0 +1,135 @@
+"""Eventos de progreso de los trabajos para GET /jobs/{id}/events (Server-Sent Events).
+
+Cada trabajo tiene un EventChannel: un buffer circular con los últimos EVENT_BUFFER_SIZE eventos
+y un único future que se resuelve al publicar. Los suscriptores solo guardan el id del último
+evento que enviaron y esperan ese future compartido, así que miles de conexiones inactivas no
+hacen polling ni ocupan más memoria que el buffer del trabajo. Un suscriptor lento (o que se
+reconecta con Last-Event-ID) se salta los eventos que ya salieron del buffer: el progreso es
+acumulativo y el evento final nunca se descarta.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EVENT_BUFFER_SIZE = int(os.getenv("JOB_EVENT_BUFFER", 32))
+# Intervalo de los comentarios ": ping" que mantienen viva la conexión a través de proxies
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", 15))
+# Publicar progreso solo si avanzó al menos este porcentaje (o pasó PROGRESS_MIN_INTERVAL)
+PROGRESS_MIN_STEP = 1.0
+PROGRESS_MIN_INTERVAL = 2.0
+# Cada cuánto se relee el estado de un trabajo que corre en otro worker
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1))
+
+Event = Tuple[int, str, dict]
+
+
+class EventChannel:
+    """Buffer circular de eventos de un trabajo con notificación a los suscriptores"""
+
+    def __init__(self, maxlen: int = EVENT_BUFFER_SIZE):
+        self.buffer: "deque[Event]" = deque(maxlen=maxlen)
+        self.last_id = 0
+        self.closed = False
+        self._changed: Optional[asyncio.Future] = None
+        self._last_percent: Optional[float] = None
+        self._last_progress_at = 0.0
+
+    def publish(self, event: str, data: dict, final: bool = False):
+        """Agrega un evento y despierta a los suscriptores (llamar desde el event loop)"""
+        if self.closed:
+            return
+        self.last_id += 1
+        self.buffer.append((self.last_id, event, data))
+        self.closed = final
+        if self._changed is not None and not self._changed.done():
+            self._changed.set_result(None)
+        self._changed = None
+
+    def stage(self, name: str, **data):
+        self.publish("stage", {"stage": name, **data})
+
+    def progress(self, percent: Optional[float], **data):
+        """Publica progreso (0-100) descartando los cambios demasiado pequeños o frecuentes"""
+        now = time.monotonic()
+        if percent is not None:
+            percent = round(min(max(percent, 0.0), 100.0), 1)
+            if (self._last_percent is not None and percent - self._last_percent < PROGRESS_MIN_STEP
+                    and now - self._last_progress_at < PROGRESS_MIN_INTERVAL):
+                return
+            self._last_percent = percent
+        elif now - self._last_progress_at < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_progress_at = now
+        self.publish("progress", {"percent": percent, **data})
+
+    def since(self, last_id: int) -> List[Event]:
+        return [event for event in self.buffer if event[0] > last_id]
+
+    async def wait(self, timeout: float) -> bool:
+        """Espera el siguiente evento; retorna False si pasó `timeout` sin novedades"""
+        if self._changed is None:
+            self._changed = asyncio.get_running_loop().create_future()
+        try:
+            # shield: que un suscriptor agote su timeout o se desconecte no cancela el future compartido
+            await asyncio.wait_for(asyncio.shield(self._changed), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def subscribe(self, last_id: int = 0,
+                        keepalive: float = SSE_KEEPALIVE_SECONDS) -> AsyncIterator[Optional[Event]]:
+        """Eventos posteriores a `last_id` hasta el evento final; None indica un keepalive"""
+        while True:
+            events = self.since(last_id)
+            for event in events:
+                yield event
+            if events:
+                last_id = events[-1][0]
+            if self.closed:
+                return
+            if not await self.wait(keepalive):
+                yield None
+
+
+async def poll_snapshots(fetch: Callable[[], Awaitable[Optional[dict]]], interval: float = JOB_POLL_SECONDS,
+                         keepalive: float = SSE_KEEPALIVE_SECONDS) -> AsyncIterator[Optional[Event]]:
+    """Eventos de un trabajo que corre en otro worker, a partir de su estado en el store compartido.
+
+    Solo hay eventos `status` y el final (`done`/`failed`): etapas y progreso quedan en el worker
+    que convierte. Termina si el trabajo desaparece del store. `fetch` es asíncrona: la lectura del
+    store no debe bloquear el event loop.
+    """
+    last = None
+    event_id = 0
+    idle = 0.0
+    while True:
+        data = await fetch()
+        if data is None:
+            return
+        if data != last:
+            last = data
+            event_id += 1
+            idle = 0.0
+            final = data.get("status") in ("done", "failed")
+            yield event_id, data["status"] if final else "status", data
+            if final:
+                return
+        elif idle >= keepalive:
+            idle = 0.0
+            yield None
+        await asyncio.sleep(interval)
+        idle += interval
+
+
+def format_sse(event: Optional[Event]) -> bytes:
+    """Serializa un evento en el formato text/event-stream (None = comentario keepalive)"""
+    if event is None:
+        return b": ping\n\n"
+    event_id, name, data = event
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
@@ -0,0 +1,221 @@
+"""Cola de trabajos de conversión con un pool de workers acotado por tipo de archivo"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+
+from job_events import EventChannel
+from scheduler import FairQueue, FairShare
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """La cola del tipo de archivo (o la parte del cliente) está llena; el cliente debe reintentar más tarde"""
+
+    def __init__(self, file_type: str, retry_after: int, client_limit: bool = False):
+        super().__init__(f"Cola de {file_type} llena")
+        self.file_type = file_type
+        self.retry_after = retry_after
+        self.client_limit = client_limit
+
+
+@dataclass
+class Job:
+    """Trabajo de conversión y su estado"""
+    id: str
+    file_type: str
+    output_format: str
+    params: dict
+    client: str = ""
+    units: float = 1.0  # unidades de trabajo estimadas (ver scheduler.estimate_units)
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    exception: Optional[BaseException] = None
+    done_event: asyncio.Event = field(default_factory=asyncio.Event)
+    events: EventChannel = field(default_factory=EventChannel)
+
+    def to_dict(self) -> dict:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "file_type": self.file_type,
+            "output_format": self.output_format,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == JOB_DONE and self.result:
+            data.update(self.result)
+        if self.status == JOB_FAILED:
+            data["error"] = self.error
+        return data
+
+    def publish_status(self):
+        """Publica el estado actual; el de un trabajo terminado cierra su canal de eventos"""
+        final = self.status in (JOB_DONE, JOB_FAILED)
+        self.events.publish(self.status if final else "status", self.to_dict(), final=final)
+
+
+class JobManager:
+    """Ejecuta trabajos con concurrencia limitada por tipo (audio/image/document).
+
+    Cada tipo tiene su propia cola acotada que reparte los workers entre clientes según el costo
+    estimado de sus trabajos (ver scheduler.py); cuando se llena, o cuando un cliente ya tiene
+    `client_max_queue` trabajos esperando, `submit` lanza JobQueueFull con una estimación de
+    cuántos segundos esperar (para el header Retry-After). `on_status` recibe cada cambio de
+    estado (p. ej. para publicarlo en el store compartido entre workers).
+    """
+
+    def __init__(self, runner: Callable[[Job], Awaitable[dict]], concurrency: Dict[str, int],
+                 max_queue: int = 20, retention_seconds: float = 3600,
+                 on_status: Optional[Callable[[Job], None]] = None,
+                 client_max_queue: int = 0, share: Optional[FairShare] = None):
+        self.runner = runner
+        self.on_status = on_status
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.client_max_queue = client_max_queue
+        self.share = share or FairShare()
+        self.retention_seconds = retention_seconds
+        self.jobs: Dict[str, Job] = {}
+        self.queues: Dict[str, FairQueue] = {}
+        self.workers = []
+        # Duraciones recientes por tipo para estimar Retry-After
+        self.durations: Dict[str, deque] = {t: deque(maxlen=20) for t in concurrency}
+
+    async def start(self):
+        """Crea las colas y lanza los workers (llamar dentro del event loop)"""
+        for file_type, workers in self.concurrency.items():
+            self.queues[file_type] = FairQueue(self.share, self.max_queue, self.client_max_queue)
+            for i in range(max(1, workers)):
+                task = asyncio.create_task(self._worker(file_type), name=f"job-worker-{file_type}-{i}")
+                self.workers.append(task)
+        logger.info(f"Pool de trabajos iniciado: {self.concurrency} (cola máxima {self.max_queue} por tipo)")
+
+    async def stop(self):
+        """Detiene los workers"""
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def queue_depth(self, file_type: str) -> int:
+        queue = self.queues.get(file_type)
+        return queue.qsize() if queue else 0
+
+    def is_full(self, file_type: str, client: Optional[str] = None) -> bool:
+        queue = self.queues.get(file_type)
+        return queue is not None and (queue.full() or (client is not None and queue.client_full(client)))
+
+    def retry_after(self, file_type: str) -> int:
+        """Segundos estimados hasta que se libere espacio en la cola"""
+        durations = self.durations.get(file_type)
+        average = sum(durations) / len(durations) if durations else 5.0
+        workers = max(1, self.concurrency.get(file_type, 1))
+        return max(1, int(average * (self.queue_depth(file_type) + 1) / workers))
+
+    def submit(self, file_type: str, output_format: str, params: dict, client: str = "",
+               units: float = 1.0) -> Job:
+        """Encola un trabajo de `client` con `units` unidades de trabajo; lanza JobQueueFull si no hay espacio"""
+        if file_type not in self.queues:
+            raise ValueError(f"Tipo de archivo sin pool de trabajos: {file_type}")
+        self._prune()
+        job = Job(id=str(uuid.uuid4()), file_type=file_type, output_format=output_format, params=params,
+                  client=client, units=units)
+        queue = self.queues[file_type]
+        try:
+            queue.put_nowait(job, client, self.share.estimate(file_type, units))
+        except asyncio.QueueFull:
+            raise JobQueueFull(file_type, self.retry_after(file_type), client_limit=not queue.full())
+        self.jobs[job.id] = job
+        self._publish(job)
+        return job
+
+    async def submit_wait(self, file_type: str, output_format: str, params: dict, client: str = "",
+                          units: float = 1.0) -> Job:
+        """Encola un trabajo esperando a que haya espacio en la cola (para lotes)"""
+        if file_type not in self.queues:
+            raise ValueError(f"Tipo de archivo sin pool de trabajos: {file_type}")
+        self._prune()
+        job = Job(id=str(uuid.uuid4()), file_type=file_type, output_format=output_format, params=params,
+                  client=client, units=units)
+        await self.queues[file_type].put(job, client, self.share.estimate(file_type, units))
+        self.jobs[job.id] = job
+        self._publish(job)
+        return job
+
+    def add_completed(self, file_type: str, output_format: str, result: dict) -> Job:
+        """Registra un trabajo ya resuelto sin pasar por la cola (p. ej. acierto de caché)"""
+        self._prune()
+        now = time.time()
+        job = Job(id=str(uuid.uuid4()), file_type=file_type, output_format=output_format, params={},
+                  status=JOB_DONE, started_at=now, finished_at=now, result=result)
+        job.done_event.set()
+        self._publish(job)
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def wait(self, job: Job) -> dict:
+        """Espera a que termine el trabajo; relanza su excepción si falló"""
+        await job.done_event.wait()
+        if job.exception is not None:
+            raise job.exception
+        return job.result
+
+    def _publish(self, job: Job):
+        job.publish_status()
+        if self.on_status is not None:
+            try:
+                self.on_status(job)
+            except Exception as e:
+                logger.error(f"Error publicando el estado del trabajo {job.id}: {str(e)}")
+
+    def _prune(self):
+        """Olvida trabajos terminados hace más de retention_seconds"""
+        limit = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished_at is not None and job.finished_at < limit]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    async def _worker(self, file_type: str):
+        queue = self.queues[file_type]
+        while True:
+            job = await queue.get()
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            self._publish(job)
+            try:
+                job.result = await self.runner(job)
+                job.status = JOB_DONE
+                self.share.observe(file_type, job.units, time.time() - job.started_at)
+            except asyncio.CancelledError:
+                job.status = JOB_FAILED
+                job.error = "Trabajo cancelado"
+                job.exception = RuntimeError(job.error)
+                raise
+            except Exception as e:
+                job.status = JOB_FAILED
+                job.error = getattr(e, "detail", None) or str(e)
+                job.exception = e
+            finally:
+                job.finished_at = time.time()
+                self.durations[file_type].append(job.finished_at - job.started_at)
+                job.done_event.set()
+                self._publish(job)
@@ -1,19 +1,111 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Header, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse, RedirectResponse
+from starlette.requests import ClientDisconnect
 import os
-import subprocess
 import shutil
 from pathlib import Path
 import uuid
-from typing import Optional
+from typing import List, Optional
 import aiofiles
 import socket
 import logging
 import traceback
 import asyncio
+import hashlib
+import re
+import time
+import json
+import secrets
+import math
+import contextlib
+from contextlib import asynccontextmanager
+from concurrent.futures.process import BrokenProcessPool
+from jobs import JobManager, JobQueueFull, Job, JOB_QUEUED
+from job_events import EventChannel, format_sse, poll_snapshots
+from process_pool import RecyclingProcessPool
+from result_cache import CACHE_FILENAME_RE, ResultCache
+from downloads import DOWNLOAD_CACHE_MODES, ETagStore, cache_headers, if_none_match
+from zip_stream import ZipStreamWriter
+from uploads import UploadSessionError, UploadSessionStore
+from multipart_upload import ReceivedUpload, streamed_upload_route
+from janitor import FileIndex, Janitor
+from shared_state import open_store
+from storage import RangeNotSatisfiable, open_storage
+from ratelimit import RateLimiter, RateLimitMiddleware
+from scheduler import SCHEDULING_MODES, FairShare, estimate_units
+from metrics import Counter, Gauge, Histogram, MetricsMiddleware, Registry
+from ffmpeg_probe import AUDIO_ENCODERS, FFmpegCapabilities, probe_ffmpeg
+import converters
+from converters import ConversionError
+import multiframe
+from presets import ENCODING_PRESETS, audio_args, resolve_preset
+from profiling import ConversionProfile, ProfileStore, active_profile, profiled_call
+from startup import DEFAULT_WARMUP_IMPORTS, STARTUP_MODES, StartupReport, process_uptime
 
-app = FastAPI(title="Convertidor de Archivos API")
+# Modo de arranque: "full" precalienta todo antes de aceptar peticiones; "minimal" prioriza el
+# tiempo de arranque (scale-to-zero) y difiere el trabajo a segundo plano o a la primera petición
+STARTUP_MODE = os.getenv("STARTUP_MODE", "full").lower()
+if STARTUP_MODE not in STARTUP_MODES:
+    STARTUP_MODE = "full"
+startup_report = StartupReport(STARTUP_MODE, target_seconds=float(os.getenv("STARTUP_TARGET_SECONDS", 0)))
+
+def env_list(name: str, default) -> tuple:
+    """Lista separada por comas desde el entorno ("none" = vacía)"""
+    value = os.getenv(name)
+    if value is None:
+        return tuple(default)
+    if value.strip().lower() == "none":
+        return ()
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+WARMUP_IMPORTS = env_list("WARMUP_IMPORTS", DEFAULT_WARMUP_IMPORTS if STARTUP_MODE == "full" else ())
+WARMUP_POOL = os.getenv("WARMUP_POOL", "1" if STARTUP_MODE == "full" else "0").lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranca y detiene los servicios en segundo plano, cronometrando cada fase (ver /startup)"""
+    global ffmpeg_probe_task
+    # Intérprete, uvicorn e imports de este módulo (en Linux se mide desde el inicio del proceso)
+    uptime = process_uptime()
+    startup_report.record("imports", uptime if uptime is not None else time.perf_counter() - startup_report.started)
+    if STARTUP_MODE == "minimal":
+        # Las peticiones de audio esperan a que termine la detección (ffmpeg_ready)
+        ffmpeg_probe_task = asyncio.create_task(detect_ffmpeg(background=True))
+    else:
+        await detect_ffmpeg()
+    with startup_report.phase("temp_dirs_scan"):
+        file_index.scan([UPLOAD_DIR, OUTPUT_DIR])
+        if output_storage.remote:
+            # Las salidas que ya estaban en el bucket también expiran y cuentan para la cuota
+            for entry in await asyncio.to_thread(lambda: list(output_storage.list())):
+                file_index.add_existing(OUTPUT_DIR / entry.name, entry.size, entry.modified)
+    with startup_report.phase("cache_load"):
+        await storage_call(result_cache.load)
+    await job_manager.start()
+    janitor.start()
+    if WARMUP_POOL:
+        with startup_report.phase("pool_warmup") as phase:
+            phase["workers"] = await process_pool.warm_up(WARMUP_IMPORTS)
+            phase["imports"] = list(WARMUP_IMPORTS)
+    else:
+        # Los workers se crean con la primera conversión, pero igual con las librerías precargadas
+        process_pool.preload = WARMUP_IMPORTS
+        startup_report.skip("pool_warmup", "WARMUP_POOL desactivado")
+    if STARTUP_MODE == "full":
+        with startup_report.phase("cors_local_origins"):
+            cors_origins.extend(await asyncio.to_thread(local_network_origins))
+    else:
+        startup_report.skip("cors_local_origins", "modo minimal")
+    startup_report.ready()
+    yield
+    if ffmpeg_probe_task is not None:
+        ffmpeg_probe_task.cancel()
+    await janitor.stop()
+    await job_manager.stop()
+    process_pool.shutdown()
+
+app = FastAPI(title="Convertidor de Archivos API", lifespan=lifespan)
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -52,24 +144,41 @@ production_domains = [
 ]
 cors_origins.extend(production_domains)
 
-# Agregar IPs de red local comunes (solo en desarrollo)
-try:
-    hostname = socket.gethostname()
-    local_ip = socket.gethostbyname(hostname)
-    # Agregar IP local
-    cors_origins.extend([
-        f"http://{local_ip}:5173",
-        f"http://{local_ip}:3000",
-    ])
-    # Agregar rangos comunes de red local
-    ip_parts = local_ip.split('.')
-    if len(ip_parts) == 4:
-        base_ip = '.'.join(ip_parts[:3])
-        # Permitir cualquier IP en el mismo segmento de red
-        cors_origins.append(f"http://{base_ip}.*:5173")
-        cors_origins.append(f"http://{base_ip}.*:3000")
-except:
-    pass
+def local_network_origins() -> List[str]:
+    """IPs de red local comunes (solo en desarrollo).
+    
+    Resuelve el hostname por DNS, que puede bloquear varios segundos: se ejecuta en el lifespan
+    (en un hilo) y no al importar el módulo.
+    """
+    origins = []
+    try:
+        hostname = socket.gethostname()
+        local_ip = socket.gethostbyname(hostname)
+        # Agregar IP local
+        origins.extend([
+            f"http://{local_ip}:5173",
+            f"http://{local_ip}:3000",
+        ])
+        # Agregar rangos comunes de red local
+        ip_parts = local_ip.split('.')
+        if len(ip_parts) == 4:
+            base_ip = '.'.join(ip_parts[:3])
+            # Permitir cualquier IP en el mismo segmento de red
+            origins.append(f"http://{base_ip}.*:5173")
+            origins.append(f"http://{base_ip}.*:3000")
+    except:
+        pass
+    return origins
+
+# Límite de peticiones de conversión por cliente (ver ratelimit.py). Se agrega antes que CORS para
+# quedar por dentro: el 429 también lleva los headers CORS y el navegador puede leerlo
+rate_limiter = RateLimiter(
+    per_minute=float(os.getenv("RATE_LIMIT_PER_MINUTE", 30)),
+    burst=int(os.getenv("RATE_LIMIT_BURST", 10)),
+    api_keys=env_list("RATE_LIMIT_API_KEYS", ()),
+    client_ip_header=os.getenv("CLIENT_IP_HEADER") or None,
+)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
 
 # Permitir todos los orígenes (ajustar en producción según necesidad)
 app.add_middleware(
@@ -80,6 +189,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas expuestas en /metrics (formato Prometheus)
+metrics_registry = Registry()
+HTTP_REQUESTS = metrics_registry.register(Counter(
+    "convertidor_http_requests_total", "Peticiones HTTP por método, ruta y status", ["method", "route", "status"]))
+HTTP_SECONDS = metrics_registry.register(Histogram(
+    "convertidor_http_request_duration_seconds", "Duración de las peticiones HTTP por ruta", ["route"]))
+CONVERSIONS = metrics_registry.register(Counter(
+    "convertidor_conversions_total", "Conversiones por conversor, tipo de entrada, formato de salida y resultado",
+    ["converter", "input_type", "output_format", "result"]))
+CONVERSION_SECONDS = metrics_registry.register(Histogram(
+    "convertidor_conversion_duration_seconds", "Duración de cada conversión por conversor, tipo de entrada y formato de salida",
+    ["converter", "input_type", "output_format"]))
+UPLOAD_BYTES = metrics_registry.register(Counter(
+    "convertidor_upload_bytes_total", "Bytes recibidos en subidas"))
+UPLOAD_SECONDS = metrics_registry.register(Counter(
+    "convertidor_upload_seconds_total", "Segundos dedicados a recibir subidas (bytes/s = rate(bytes) / rate(segundos))"))
+UPLOAD_THROUGHPUT = metrics_registry.register(Histogram(
+    "convertidor_upload_throughput_bytes_per_second", "Velocidad de cada subida",
+    buckets=(1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8, 1e9)))
+FFMPEG_WALL_SECONDS = metrics_registry.register(Counter(
+    "convertidor_ffmpeg_wall_seconds_total", "Tiempo real de los procesos de FFmpeg", ["output_format"]))
+FFMPEG_CPU_SECONDS = metrics_registry.register(Counter(
+    "convertidor_ffmpeg_cpu_seconds_total", "Tiempo de CPU de FFmpeg (reportado por -benchmark)", ["output_format", "mode"]))
+
+app.add_middleware(MetricsMiddleware, requests_total=HTTP_REQUESTS, request_seconds=HTTP_SECONDS)
+
 # Directorios para archivos temporales
 # Detectar si estamos en un contenedor (Fly.io, Docker) o desarrollo local
 if Path("/app").exists():
@@ -97,11 +232,85 @@ else:
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Procesos de uvicorn (el mismo WEB_CONCURRENCY que leen uvicorn y gunicorn). Con más de uno, el
+# estado (trabajos, índice de la caché, archivos temporales, subidas reanudables) se comparte por
+# SHARED_STORE; por defecto un SQLite junto a los directorios temporales
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+SHARED_STORE = os.getenv("SHARED_STORE") or (
+    f"sqlite:///{UPLOAD_DIR.parent / 'shared_state.db'}" if WEB_CONCURRENCY > 1 else "memory")
+shared_store = open_store(SHARED_STORE)
+if shared_store.shared:
+    # Un solo límite por cliente para todos los workers
+    rate_limiter.store = shared_store
+
+# Dónde quedan las salidas terminadas (ver storage.py): "local" (OUTPUT_DIR) o "s3://bucket/prefijo".
+# OUTPUT_DIR sigue siendo el directorio de trabajo de las conversiones en curso
+OUTPUT_STORAGE = os.getenv("OUTPUT_STORAGE", "local")
+output_storage = open_storage(OUTPUT_STORAGE, OUTPUT_DIR)
+
+async def storage_call(fn, *args):
+    """Ejecuta una operación del almacenamiento; las de S3 hacen peticiones de red y van a un hilo.
+    
+    Las locales también pueden tocar el store compartido (índice de la caché): van por `shared_store.call`.
+    """
+    if output_storage.remote:
+        return await asyncio.to_thread(fn, *args)
+    return await shared_store.call(fn, *args)
+
+async def iter_in_thread(chunks):
+    """Recorre un iterador bloqueante (p. ej. el cuerpo de un objeto de S3) sin frenar el event loop"""
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+# Pool de procesos para conversiones de imágenes y documentos (no bloquean el event loop). Con
+# varios workers de uvicorn cada uno tiene su pool: por defecto se reparten los núcleos
+process_pool = RecyclingProcessPool(
+    max_workers=int(os.getenv("PROCESS_POOL_WORKERS", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))),
+    max_tasks_per_worker=int(os.getenv("PROCESS_POOL_MAX_TASKS", 50)),
+    start_method=os.getenv("PROCESS_POOL_START_METHOD") or None,
+)
+
 # Formatos soportados
 AUDIO_FORMATS = ["mp3", "wav", "aac", "ogg", "flac", "m4a", "wma"]
 IMAGE_FORMATS = ["jpg", "jpeg", "png", "webp", "gif", "bmp", "ico", "tiff"]
 DOCUMENT_FORMATS = ["pdf", "docx", "txt", "html", "md", "rtf", "odt"]
 
+# Tipos MIME de los archivos convertidos
+MIME_TYPES = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'aac': 'audio/aac',
+    'ogg': 'audio/ogg',
+    'flac': 'audio/flac',
+    'm4a': 'audio/mp4',
+    'wma': 'audio/x-ms-wma',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+    'bmp': 'image/bmp',
+    'ico': 'image/x-icon',
+    'tiff': 'image/tiff',
+    'pdf': 'application/pdf',
+    'zip': 'application/zip',
+    'txt': 'text/plain',
+    'html': 'text/html',
+    'md': 'text/markdown',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+}
+
+# Tamaño máximo de archivo (50 MB) y tamaño del bloque de lectura al recibir subidas
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB en bytes
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 50))  # Archivos por petición a /convert/batch
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # 1 MB por bloque
+# Subidas reanudables (/uploads): tamaño máximo de cada PUT y del archivo completo
+RESUMABLE_CHUNK_MAX = int(float(os.getenv("RESUMABLE_CHUNK_MAX_MB", 8)) * 1024 * 1024)
+RESUMABLE_MAX_FILE_SIZE = int(float(os.getenv("RESUMABLE_MAX_FILE_MB", MAX_FILE_SIZE / (1024 * 1024))) * 1024 * 1024)
+
 def get_file_type(filename: str) -> str:
     """Determina el tipo de archivo basado en la extensión"""
     ext = filename.split('.')[-1].lower()
@@ -113,13 +322,40 @@ def get_file_type(filename: str) -> str:
         return "document"
     return "unknown"
 
-def check_ffmpeg():
-    """Verifica si FFmpeg está instalado"""
-    try:
-        subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
+# Capacidades de FFmpeg detectadas al arrancar (ver ffmpeg_probe.py); se refrescan con /admin/ffmpeg/refresh
+ffmpeg_caps = FFmpegCapabilities()
+# En modo minimal la detección corre en segundo plano mientras el servidor ya acepta peticiones
+ffmpeg_probe_task: Optional[asyncio.Task] = None
+
+async def detect_ffmpeg(background: bool = False):
+    global ffmpeg_caps
+    with startup_report.phase("ffmpeg_probe", background=background):
+        ffmpeg_caps = await probe_ffmpeg()
+
+async def ffmpeg_ready():
+    """Espera a que termine la detección de FFmpeg si todavía está en curso"""
+    if ffmpeg_probe_task is not None and not ffmpeg_probe_task.done():
+        await asyncio.shield(ffmpeg_probe_task)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependencia para endpoints de administración: exige el header X-Admin-Token igual a ADMIN_TOKEN"""
+    admin_token = os.getenv("ADMIN_TOKEN", "")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Endpoints de administración deshabilitados (ADMIN_TOKEN no configurado)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=401, detail="Token de administración inválido")
+
+def profiling_requested(
+    profile: Optional[str] = None,
+    x_profile: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None)
+) -> bool:
+    """Dependencia: `?profile=1` o el header `X-Profile: 1` piden perfilar la conversión (solo admins)"""
+    flag = x_profile if x_profile is not None else profile
+    if flag is None or flag.strip().lower() not in ("1", "true", "yes"):
         return False
+    require_admin(x_admin_token)
+    return True
 
 def get_local_ip():
     """Obtiene la IP local del servidor"""
@@ -136,6 +372,71 @@ def get_local_ip():
         except:
             return "127.0.0.1"
 
+async def save_upload_streaming(file: UploadFile, destination: Path, max_size: int = MAX_FILE_SIZE) -> str:
+    """Deja el archivo subido en `destination` y retorna su SHA-256.
+    
+    Los formularios de las rutas de la app ya llegan escritos en UPLOAD_DIR (ver multipart_upload.py):
+    el archivo se mueve sin copiarlo y el hash y el tiempo de subida son los medidos al recibirlo.
+    Cualquier otro UploadFile se copia por bloques de UPLOAD_CHUNK_SIZE, abortando con 413 en cuanto
+    supera el tamaño máximo.
+    """
+    max_mb = max_size / (1024 * 1024)
+    
+    # Si el servidor ya conoce el tamaño (multipart ya recibido), rechazar sin copiar nada
+    known_size = getattr(file, "size", None)
+    if known_size is not None and known_size > max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El archivo es demasiado grande. Tamaño máximo permitido: {max_mb:.0f} MB. Tu archivo: {known_size / (1024 * 1024):.2f} MB"
+        )
+    if isinstance(file, ReceivedUpload):
+        if not file.size:
+            raise HTTPException(status_code=400, detail="El archivo está vacío")
+        file.move_to(destination)
+        record_upload(file.size, file.upload_seconds)
+        return file.sha256
+    
+    hasher = hashlib.sha256()
+    file_size = 0
+    start = time.perf_counter()
+    try:
+        async with aiofiles.open(destination, 'wb') as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                if file_size > max_size:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"El archivo es demasiado grande. Tamaño máximo permitido: {max_mb:.0f} MB"
+                    )
+                hasher.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        # No dejar archivos parciales en disco
+        if destination.exists():
+            destination.unlink()
+        raise
+    
+    if file_size == 0:
+        destination.unlink()
+        raise HTTPException(status_code=400, detail="El archivo está vacío")
+    
+    record_upload(file_size, time.perf_counter() - start)
+    return hasher.hexdigest()
+
+def record_upload(file_size: int, elapsed: float):
+    """Registra bytes y velocidad de una subida en las métricas"""
+    UPLOAD_BYTES.inc(file_size)
+    UPLOAD_SECONDS.inc(elapsed)
+    if elapsed > 0:
+        UPLOAD_THROUGHPUT.observe(file_size / elapsed)
+
+# Los formularios multipart se reciben directo en UPLOAD_DIR: cada archivo se escribe una sola vez y
+# se rechaza con 413 apenas supera MAX_FILE_SIZE (o antes de leer el cuerpo, por Content-Length)
+app.router.route_class = streamed_upload_route(UPLOAD_DIR, MAX_FILE_SIZE, max_files={"/convert/batch": BATCH_MAX_FILES})
+
 @app.get("/")
 async def root():
     local_ip = get_local_ip()
@@ -143,6 +444,10 @@ async def root():
     return {
         "message": "Convertidor de Archivos API",
         "status": "running",
+        "pid": os.getpid(),
+        "shared_store": shared_store.describe(),
+        "output_storage": output_storage.describe(),
+        "job_scheduling": JOB_SCHEDULING,
         "local_ip": local_ip,
         "access_url": f"http://{local_ip}:{port}"
     }
@@ -150,47 +455,26 @@ async def root():
 @app.get("/formats")
 async def get_formats():
     """Retorna los formatos soportados"""
+    await ffmpeg_ready()
     return {
-        "audio": AUDIO_FORMATS,
+        "audio": ffmpeg_caps.supported_formats(AUDIO_FORMATS),
         "image": IMAGE_FORMATS,
         "document": DOCUMENT_FORMATS
     }
 
-@app.post("/convert")
-async def convert_file(
-    file: UploadFile = File(...),
-    output_format: str = Form(...)
-):
-    """Convierte un archivo al formato especificado"""
-    
+def validate_conversion_request(filename: str, output_format: str):
+    """Valida nombre de archivo y formato de salida; retorna (file_type, output_format normalizado)"""
     if not output_format:
         raise HTTPException(status_code=400, detail="Formato de salida no especificado")
     
     output_format = output_format.lower()
-    file_type = get_file_type(file.filename)
+    file_type = get_file_type(filename)
     
     if file_type == "unknown":
         raise HTTPException(status_code=400, detail="Formato de archivo no soportado")
     
-    # Validar tamaño máximo del archivo (50 MB)
-    MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB en bytes
-    file_size = 0
-    
-    # Leer el contenido del archivo y verificar tamaño
-    content = await file.read()
-    file_size = len(content)
-    
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"El archivo es demasiado grande. Tamaño máximo permitido: 50 MB. Tu archivo: {file_size / (1024 * 1024):.2f} MB"
-        )
-    
-    if file_size == 0:
-        raise HTTPException(status_code=400, detail="El archivo está vacío")
-    
     # Validar que el formato de salida sea diferente al de entrada
-    input_ext = file.filename.split('.')[-1].lower()
+    input_ext = filename.split('.')[-1].lower()
     # Normalizar extensiones (jpg = jpeg)
     if input_ext == "jpeg":
         input_ext = "jpg"
@@ -201,41 +485,50 @@ async def convert_file(
             detail=f"El archivo ya está en formato {output_format.upper()}. Por favor elige un formato de salida diferente."
         )
     
-    # Generar nombres únicos
-    file_id = str(uuid.uuid4())
-    input_path = UPLOAD_DIR / f"{file_id}_{file.filename}"
-    output_filename = f"{file_id}.{output_format}"
-    output_path = OUTPUT_DIR / output_filename
+    # Rechazar al instante los formatos de audio que este servidor no puede codificar
+    if file_type == "audio":
+        if not ffmpeg_caps.available:
+            raise HTTPException(
+                status_code=500, 
+                detail="FFmpeg no está instalado. Por favor instálalo para convertir audio."
+            )
+        if not ffmpeg_caps.supports(output_format):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Conversión de audio a {output_format.upper()} no disponible en este servidor. Formatos disponibles: {', '.join(ffmpeg_caps.supported_formats(AUDIO_FORMATS))}"
+            )
     
+    return file_type, output_format
+
+async def run_conversion(file_type: str, input_path: Path, output_path: Path, output_format: str,
+                         options: Optional[dict] = None, events: Optional[EventChannel] = None):
+    """Ejecuta la conversión según el tipo de archivo y limpia los archivos si falla.
+    
+    Si se pasa `events` publica allí las etapas y el progreso (ver job_events.py).
+    """
+    options = options or {}
+    converter_name = CONVERTER_NAMES.get(file_type, "unknown")
+    if events is not None:
+        events.stage("converting", converter=converter_name)
+    input_type = input_path.suffix.lstrip('.').lower()
+    start = time.perf_counter()
+    result = "error"
     try:
-        # Guardar archivo subido (ya tenemos el contenido en memoria)
-        async with aiofiles.open(input_path, 'wb') as f:
-            await f.write(content)
-        
         # Realizar conversión según el tipo
         if file_type == "audio":
-            if not check_ffmpeg():
-                raise HTTPException(
-                    status_code=500, 
-                    detail="FFmpeg no está instalado. Por favor instálalo para convertir audio."
-                )
-            await convert_media(input_path, output_path, output_format)
+            await convert_media(input_path, output_path, output_format, preset=options.get("preset"), events=events)
         elif file_type == "image":
-            await convert_image(input_path, output_path, output_format)
+            await convert_image(input_path, output_path, output_format, frames=options.get("frames"),
+                                resize=options.get("resize"), preset=options.get("preset"))
         elif file_type == "document":
-            await convert_document(input_path, output_path, output_format)
+            await convert_document(input_path, output_path, output_format, pages=options.get("pages"), events=events)
         else:
             raise HTTPException(status_code=400, detail="Tipo de archivo no soportado")
         
         # Verificar que el archivo de salida existe
         if not output_path.exists():
             raise HTTPException(status_code=500, detail="Error en la conversión")
-        
-        return {
-            "success": True,
-            "download_url": f"/download/{output_filename}",
-            "filename": output_filename
-        }
+        result = "ok"
     
     except HTTPException:
         # Re-lanzar HTTPException sin modificar
@@ -253,15 +546,877 @@ async def convert_file(
         if output_path.exists():
             output_path.unlink()
         raise HTTPException(status_code=500, detail=f"Error en la conversión: {str(e)}")
+    finally:
+        CONVERSIONS.inc(1, converter_name, input_type, output_format, result)
+        CONVERSION_SECONDS.observe(time.perf_counter() - start, converter_name, input_type, output_format)
+
+# Nombre del conversor de cada tipo de archivo (label de las métricas)
+CONVERTER_NAMES = {"audio": "convert_media", "image": "convert_image", "document": "convert_document"}
+
+def download_result(output_filename: str, cached: bool = False) -> dict:
+    """Datos de descarga que se retornan al cliente"""
+    return {
+        "download_url": f"/download/{output_filename}",
+        "filename": output_filename,
+        "cached": cached
+    }
+
+async def run_job(job: Job) -> dict:
+    """Ejecuta un trabajo de la cola, publica la salida en la caché y retorna los datos de descarga"""
+    params = job.params
+    input_path = params["input_path"]
+    cache_key = params.get("cache_key")
+    profile = start_profile(job)
+    token = active_profile.set(profile)
+    try:
+        with profile_stage(profile, "convert"):
+            await run_conversion(job.file_type, input_path, params["output_path"], job.output_format,
+                                 params["options"], events=job.events)
+        with profile_stage(profile, "publish"):
+            # La entrada ya no se necesita: liberar el disco de inmediato
+            await remove_temp_file(input_path)
+            output_filename = await publish_output(params["output_path"], cache_key)
+        return download_result(output_filename)
+    finally:
+        active_profile.reset(token)
+        if profile is not None:
+            finish_profile(profile)
+        # Quita la entrada del índice junto con su pin
+        await shared_store.call(file_index.remove, input_path)
+        if cache_key:
+            inflight_jobs.pop(cache_key, None)
+
+async def publish_output(output_path: Path, cache_key: Optional[str]) -> str:
+    """Guarda la salida en el almacenamiento (en la caché si hay clave) y retorna su nombre final.
+    
+    Con S3 la salida se sube por partes y se borra del disco local.
+    """
+    output_format = output_path.suffix.lstrip(".")
+    content_type = MIME_TYPES.get(output_format)
+    try:
+        size = output_path.stat().st_size
+        if cache_key and result_cache.enabled:
+            output_filename = await storage_call(result_cache.put, cache_key, output_path, output_format, content_type)
+        else:
+            output_filename = output_path.name
+            await storage_call(output_storage.save, output_path, output_filename, content_type)
+    except BaseException:
+        output_path.unlink(missing_ok=True)
+        raise
+    await shared_store.call(file_index.add, OUTPUT_DIR / output_filename, size)
+    return output_filename
+
+def start_profile(job: Job) -> Optional[ConversionProfile]:
+    """Perfil del trabajo si se pidió (`profile`) o si está activo el disparador PROFILE_SLOW_SECONDS"""
+    params = job.params
+    if params.get("profile"):
+        profile = ConversionProfile(job.id, reason="requested")
+    elif PROFILE_SLOW_SECONDS > 0:
+        # Las muestras solo empiezan si la conversión supera el umbral
+        profile = ConversionProfile(job.id, reason="slow", sample_after=PROFILE_SLOW_SECONDS)
+    else:
+        return None
+    if params.get("upload_seconds") is not None:
+        profile.add_stage("upload", params["upload_seconds"])
+    profile.add_stage("queue", job.started_at - job.created_at)
+    profile.details.update(file_type=job.file_type, input=params["input_path"].suffix.lstrip("."),
+                           output_format=job.output_format, options=params["options"])
+    return profile
+
+def profile_stage(profile: Optional[ConversionProfile], name: str):
+    return profile.stage(name) if profile is not None else contextlib.nullcontext()
+
+def finish_profile(profile: ConversionProfile):
+    """Guarda el perfil si se pidió o si la conversión superó PROFILE_SLOW_SECONDS"""
+    profile.total_seconds = round(sum(profile.stages.values()), 4)
+    if profile.reason == "requested" or profile.stages.get("convert", 0) >= PROFILE_SLOW_SECONDS:
+        profile_store.add(profile)
+        if profile.reason == "slow":
+            logger.warning(f"Conversión lenta ({profile.stages['convert']:.1f}s), perfil guardado: {profile.job_id}")
+
+async def remove_temp_file(path: Path):
+    """Elimina un archivo temporal y lo quita del índice de limpieza"""
+    if path.exists():
+        path.unlink()
+    await shared_store.call(file_index.remove, path)
+
+# Índice de archivos temporales y limpieza periódica por antigüedad y cuota de disco
+file_index = FileIndex(shared_store)
+
+# Caché de resultados direccionada por contenido (CACHE_MAX_MB=0 la desactiva)
+result_cache = ResultCache(
+    output_storage,
+    max_bytes=int(float(os.getenv("CACHE_MAX_MB", 200)) * 1024 * 1024),
+    on_evict=lambda filename: file_index.remove(OUTPUT_DIR / filename),
+    store=shared_store,
+)
+
+# Perfiles de conversión (ver profiling.py): pedidos por un admin o automáticos para las
+# conversiones que tardan más de PROFILE_SLOW_SECONDS (0 desactiva el disparador)
+PROFILE_SLOW_SECONDS = float(os.getenv("PROFILE_SLOW_SECONDS", 0))
+profile_store = ProfileStore(max_entries=int(os.getenv("PROFILE_MAX_ENTRIES", 100)))
+
+# Segundos que se conserva el estado de un trabajo terminado (y el de una subida reanudable completada)
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", 3600))
+
+# Sesiones de subida reanudable; sus archivos parciales los limpia el janitor como cualquier temporal
+upload_sessions = UploadSessionStore(UPLOAD_DIR, RESUMABLE_CHUNK_MAX, store=shared_store,
+                                     completed_retention=JOB_RETENTION_SECONDS)
+
+def on_janitor_delete(path: Path):
+    # Corre en el hilo de la limpieza: la caché solo usa el store y las sesiones tienen su lock
+    result_cache.discard(path.name)
+    upload_sessions.discard_path(path)
+
+def remove_indexed_file(path: Path):
+    """Borra un archivo del índice de limpieza: las salidas del almacenamiento, el resto del disco"""
+    if output_storage.remote and path.parent == OUTPUT_DIR:
+        # Puede quedar en disco la salida de una conversión interrumpida con ese nombre
+        path.unlink(missing_ok=True)
+        output_storage.delete(path.name)
+    else:
+        path.unlink()
+
+janitor = Janitor(
+    file_index,
+    max_age_seconds=float(os.getenv("FILE_TTL_MINUTES", 60)) * 60,
+    quota_bytes=int(float(os.getenv("DISK_QUOTA_MB", 500)) * 1024 * 1024),
+    interval_seconds=float(os.getenv("JANITOR_INTERVAL_SECONDS", 60)),
+    on_delete=on_janitor_delete,
+    remove_file=remove_indexed_file,
+)
+
+# Métricas que se leen de otros componentes al consultar /metrics
+def read_store_metrics() -> dict:
+    """Valores de /metrics que salen del store compartido (se leen con `shared_store.call` antes de formatear)"""
+    return {
+        "disk": {("uploads",): file_index.bytes_in(UPLOAD_DIR), ("outputs",): file_index.bytes_in(OUTPUT_DIR)},
+        "upload_sessions": {(): upload_sessions.stats()["sessions"]},
+        "cache_bytes": {(): result_cache.total_bytes},
+    }
+
+store_metrics = read_store_metrics()
+
+metrics_registry.register(Gauge(
+    "convertidor_disk_usage_bytes", "Bytes en los directorios temporales", ["directory"],
+    callback=lambda: store_metrics["disk"]))
+metrics_registry.register(Counter(
+    "convertidor_janitor_reclaimed_bytes_total", "Bytes liberados por la limpieza automática",
+    callback=lambda: {(): janitor.bytes_reclaimed}))
+metrics_registry.register(Gauge(
+    "convertidor_upload_sessions", "Subidas reanudables abiertas",
+    callback=lambda: store_metrics["upload_sessions"]))
+metrics_registry.register(Counter(
+    "convertidor_cache_lookups_total", "Consultas a la caché de resultados", ["result"],
+    callback=lambda: {("hit",): result_cache.hits, ("miss",): result_cache.misses}))
+metrics_registry.register(Gauge(
+    "convertidor_cache_bytes", "Bytes ocupados por la caché de resultados",
+    callback=lambda: store_metrics["cache_bytes"]))
+# Trabajos en curso por clave de caché, para no convertir dos veces el mismo archivo a la vez
+inflight_jobs = {}
+
+def share_job_status(job: Job):
+    """Publica el estado del trabajo para que lo vean los demás workers (GET /jobs, /events).
+    
+    Se escribe en el hilo del store sin esperar: los cambios de estado se aplican en orden. Quien
+    responde con el id de un trabajo nuevo espera antes `shared_store.flush()`, para que otro worker
+    ya lo encuentre.
+    """
+    shared_store.defer(shared_store.put_job, job.id, job.to_dict())
+    shared_store.defer(shared_store.prune_jobs, time.time() - JOB_RETENTION_SECONDS)
+
+# Orden de las colas (ver scheduler.py): "fair" reparte por cliente según el costo estimado,
+# "fifo" atiende por orden de llegada
+JOB_SCHEDULING = os.getenv("JOB_SCHEDULING", "fair").lower()
+if JOB_SCHEDULING not in SCHEDULING_MODES:
+    JOB_SCHEDULING = "fair"
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", 20))
+
+job_manager = JobManager(
+    run_job,
+    concurrency={
+        "audio": int(os.getenv("JOB_CONCURRENCY_AUDIO", 1)),
+        "image": int(os.getenv("JOB_CONCURRENCY_IMAGE", 2)),
+        "document": int(os.getenv("JOB_CONCURRENCY_DOCUMENT", 2)),
+    },
+    max_queue=JOB_QUEUE_MAX,
+    retention_seconds=JOB_RETENTION_SECONDS,
+    on_status=share_job_status if shared_store.shared else None,
+    # Trabajos en espera por cliente y tipo: un cliente no puede llenar la cola de los demás
+    client_max_queue=int(os.getenv("JOB_QUEUE_MAX_PER_CLIENT", max(1, JOB_QUEUE_MAX // 2))),
+    share=FairShare(JOB_SCHEDULING),
+)
+
+metrics_registry.register(Gauge(
+    "convertidor_startup_phase_seconds", "Duración de cada fase del arranque", ["phase"],
+    callback=lambda: {(p["name"],): p["seconds"] for p in startup_report.phases if p["seconds"] is not None}))
+metrics_registry.register(Gauge(
+    "convertidor_job_queue_depth", "Trabajos esperando en la cola por tipo de archivo", ["file_type"],
+    callback=lambda: {(file_type,): job_manager.queue_depth(file_type) for file_type in job_manager.concurrency}))
+metrics_registry.register(Counter(
+    "convertidor_rate_limit_requests_total", "Peticiones de conversión según el límite por cliente", ["result"],
+    callback=lambda: {("allowed",): rate_limiter.allowed, ("rejected",): rate_limiter.rejected}))
+
+def queue_full_error(file_type: str, retry_after: int, client_limit: bool = False) -> HTTPException:
+    """Error 429 con Retry-After cuando la cola de conversiones (o la parte del cliente) está llena"""
+    if client_limit:
+        detail = "Ya tienes demasiadas conversiones en espera. Intenta de nuevo cuando terminen las anteriores."
+    else:
+        detail = "El servidor está procesando demasiadas conversiones. Por favor intenta de nuevo en unos segundos."
+    return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(retry_after)})
+
+def client_id(request: Request) -> str:
+    """Cliente de la petición para el límite de peticiones y el reparto de las colas"""
+    return rate_limiter.client_key(request.headers, request.client.host if request.client else None)
+
+def conversion_options(filename: str, pages: Optional[str], frames: Optional[str] = None,
+                       max_width: Optional[int] = None, max_height: Optional[int] = None,
+                       scale: Optional[float] = None, preset: Optional[str] = None) -> Optional[dict]:
+    """Valida las opciones de conversión del formulario; retorna None si no hay ninguna"""
+    options = {}
+    file_type = get_file_type(filename or "")
+    if preset and preset.strip():
+        preset = preset.strip().lower()
+        if preset not in ENCODING_PRESETS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Preset inválido. Opciones: {', '.join(ENCODING_PRESETS)}"
+            )
+        if file_type not in ("audio", "image"):
+            raise HTTPException(status_code=400, detail="El parámetro preset solo aplica a audio e imágenes")
+    if file_type in ("audio", "image"):
+        # Siempre en las opciones: así la caché distingue salidas de distintos presets por defecto
+        options["preset"] = resolve_preset(preset)
+    if pages and pages.strip():
+        if Path(filename or "").suffix.lower() != ".pdf":
+            raise HTTPException(status_code=400, detail="El parámetro pages solo aplica a archivos PDF")
+        try:
+            converters.parse_page_range(pages)
+        except ConversionError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        options["pages"] = pages.replace(" ", "")
+    if frames and frames.strip():
+        frames = frames.strip().lower()
+        if frames not in multiframe.FRAME_MODES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Valor de frames inválido. Opciones: {', '.join(multiframe.FRAME_MODES)}"
+            )
+        if file_type != "image":
+            raise HTTPException(status_code=400, detail="El parámetro frames solo aplica a imágenes")
+        if frames != "auto":
+            options["frames"] = frames
+    resize = {name: value for name, value in
+              (("max_width", max_width), ("max_height", max_height), ("scale", scale)) if value is not None}
+    if resize:
+        if file_type != "image":
+            raise HTTPException(status_code=400, detail="max_width, max_height y scale solo aplican a imágenes")
+        if any(resize.get(name, 1) < 1 for name in ("max_width", "max_height")):
+            raise HTTPException(status_code=400, detail="max_width y max_height deben ser mayores que 0")
+        if not 0 < resize.get("scale", 1) <= 1:
+            raise HTTPException(status_code=400, detail="scale debe estar entre 0 y 1 (solo se puede reducir)")
+        options["resize"] = resize
+    return options or None
+
+async def enqueue_upload(file: UploadFile, output_format: str, options: Optional[dict] = None,
+                         wait_for_slot: bool = False, profile: bool = False, client: str = "") -> Job:
+    """Valida la petición, guarda el archivo subido y encola su conversión.
+    
+    Si el mismo contenido, con la misma extensión, ya se convirtió con el mismo formato y opciones,
+    retorna un trabajo terminado que apunta a la salida cacheada sin volver a convertir. Con
+    `wait_for_slot` espera a que haya espacio en la cola en lugar de responder 429. Con `profile`
+    la conversión se perfila (ver profiling.py) y no se usa la caché. `client` identifica a quién
+    se le cuenta el trabajo en el reparto de las colas.
+    """
+    await ffmpeg_ready()
+    file_type, output_format = validate_conversion_request(file.filename, output_format)
+    
+    # Rechazar si la cola (o la parte del cliente) ya está llena: el archivo recibido se borra al cerrar el formulario
+    if not wait_for_slot and job_manager.is_full(file_type, client):
+        raise queue_full_error(file_type, job_manager.retry_after(file_type),
+                               client_limit=not job_manager.is_full(file_type))
+    
+    # Generar nombres únicos
+    file_id = str(uuid.uuid4())
+    input_path = UPLOAD_DIR / f"{file_id}_{file.filename}"
+    
+    # Mover el archivo recibido a su nombre definitivo (ya llegó a disco con su hash calculado)
+    start = time.perf_counter()
+    sha256 = await save_upload_streaming(file, input_path)
+    upload_seconds = getattr(file, "upload_seconds", 0) + time.perf_counter() - start
+    # Fijada hasta que el trabajo termine: la cuota no puede borrar la entrada de un trabajo en cola
+    await shared_store.call(file_index.add, input_path, input_path.stat().st_size, pinned=True)
+    return await enqueue_saved_file(file_id, input_path, file_type, output_format, sha256,
+                                    options, wait_for_slot, profile=profile, upload_seconds=upload_seconds,
+                                    client=client)
+
+async def enqueue_saved_file(file_id: str, input_path: Path, file_type: str, output_format: str, sha256: str,
+                             options: Optional[dict] = None, wait_for_slot: bool = False,
+                             profile: bool = False, upload_seconds: Optional[float] = None,
+                             client: str = "") -> Job:
+    """Encola la conversión de un archivo que ya está en UPLOAD_DIR (o reutiliza la caché).
+    
+    `input_path` llega registrado y fijado en `file_index`; run_job lo suelta al terminar y, si no
+    llega a encolarse, remove_temp_file lo quita del índice junto con su pin.
+    """
+    output_ext = multiframe.output_extension(output_format, (options or {}).get("frames"))
+    output_path = OUTPUT_DIR / f"{file_id}.{output_ext}"
+    
+    cache_key = None
+    # Un perfil pedido explícitamente necesita que la conversión corra de verdad
+    if result_cache.enabled and not profile:
+        cache_key = ResultCache.make_key(sha256, input_path.suffix, output_format, options)
+        cached_filename = await storage_call(result_cache.get, cache_key)
+        if cached_filename is not None:
+            await remove_temp_file(input_path)
+            await shared_store.call(file_index.touch, OUTPUT_DIR / cached_filename)
+            job = job_manager.add_completed(file_type, output_format, download_result(cached_filename, cached=True))
+            await shared_store.flush()
+            return job
+        inflight = inflight_jobs.get(cache_key)
+        if inflight is not None:
+            # La misma conversión ya está en la cola: compartir su resultado
+            await remove_temp_file(input_path)
+            return inflight
+    
+    params = {
+        "input_path": input_path,
+        "output_path": output_path,
+        "cache_key": cache_key,
+        "options": options or {},
+        "profile": profile,
+        "upload_seconds": upload_seconds,
+    }
+    try:
+        # Costo del trabajo para el reparto entre clientes: duración, megapíxeles o páginas
+        units = await asyncio.to_thread(estimate_units, file_type, input_path, options)
+        if wait_for_slot:
+            job = await job_manager.submit_wait(file_type, output_format, params, client=client, units=units)
+        else:
+            job = job_manager.submit(file_type, output_format, params, client=client, units=units)
+    except JobQueueFull as e:
+        await remove_temp_file(input_path)
+        raise queue_full_error(e.file_type, e.retry_after, e.client_limit)
+    except BaseException:
+        await remove_temp_file(input_path)
+        raise
+    if cache_key:
+        inflight_jobs[cache_key] = job
+    # El trabajo tiene que estar en el store antes de responder con su id (GET /jobs en otro worker)
+    await shared_store.flush()
+    return job
+
+@app.post("/convert")
+async def convert_file(
+    file: UploadFile = File(...),
+    output_format: str = Form(...),
+    pages: Optional[str] = Form(None),
+    frames: Optional[str] = Form(None),
+    max_width: Optional[int] = Form(None),
+    max_height: Optional[int] = Form(None),
+    scale: Optional[float] = Form(None),
+    preset: Optional[str] = Form(None),
+    profile: bool = Depends(profiling_requested),
+    client: str = Depends(client_id)
+):
+    """Convierte un archivo al formato especificado y espera el resultado.
+    
+    `pages` ("1-5,8,10-") convierte solo esas páginas de un PDF. `frames` ("auto", "first", "all")
+    controla los GIF/WebP animados y TIFF de varias páginas: con "all" y un formato de una sola
+    imagen el resultado es un ZIP con un archivo por frame. `max_width`, `max_height` y `scale`
+    reducen las imágenes conservando la proporción (los JPEG se decodifican ya reducidos).
+    `preset` ("fast", "balanced", "small") elige velocidad vs tamaño al codificar audio e imágenes.
+    Con `?profile=1` o `X-Profile: 1` (y `X-Admin-Token`) la respuesta incluye `profile_url`.
+    """
+    options = conversion_options(file.filename, pages, frames, max_width, max_height, scale, preset)
+    job = await enqueue_upload(file, output_format, options, profile=profile, client=client)
+    result = await job_manager.wait(job)
+    response = {"success": True, **result}
+    if profile:
+        response["profile_url"] = f"/admin/profiles/{job.id}"
+    return response
+
+@app.post("/convert/batch")
+async def convert_batch(
+    files: List[UploadFile] = File(...),
+    output_format: str = Form(...),
+    preset: Optional[str] = Form(None),
+    client: str = Depends(client_id)
+):
+    """Convierte varios archivos en paralelo y transmite un ZIP que se arma a medida que terminan.
+    
+    Los archivos que fallan no interrumpen el lote: se agrega un `<nombre>.error.txt` con el motivo
+    y el ZIP incluye `resultados.json` con el estado de cada archivo. `preset` se aplica a los
+    archivos de audio e imagen del lote. Cada archivo cuenta como una petición para el límite
+    por cliente (el middleware ya tomó la primera).
+    """
+    if not output_format:
+        raise HTTPException(status_code=400, detail="Formato de salida no especificado")
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Demasiados archivos en el lote. Máximo permitido: {BATCH_MAX_FILES}"
+        )
+    # Un lote más grande que el balde cuesta el balde completo (si no, nunca pasaría)
+    extra_tokens = min(len(files), rate_limiter.burst) - 1
+    if extra_tokens > 0:
+        allowed, remaining, wait = await shared_store.call(rate_limiter.take, client, extra_tokens)
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail=f"El lote supera las conversiones que te quedan. Intenta de nuevo en {max(1, math.ceil(wait))} segundos.",
+                headers=rate_limiter.headers(remaining, wait)
+            )
+    output_format = output_format.lower()
+    
+    async def convert_one(index: int, file: UploadFile):
+        try:
+            file_preset = preset if get_file_type(file.filename or "") in ("audio", "image") else None
+            options = conversion_options(file.filename, None, preset=file_preset)
+            job = await enqueue_upload(file, output_format, options, wait_for_slot=True, client=client)
+            result = await job_manager.wait(job)
+            return index, file.filename, result, None
+        except HTTPException as e:
+            return index, file.filename, None, e.detail
+        except Exception as e:
+            logger.error(f"Error en conversión por lote de {file.filename}: {str(e)}\n{traceback.format_exc()}")
+            return index, file.filename, None, f"Error en la conversión: {str(e)}"
+    
+    tasks = [asyncio.create_task(convert_one(i, f)) for i, f in enumerate(files)]
+    
+    async def body():
+        writer = ZipStreamWriter()
+        summary = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, filename, result, error = await next_done
+                stem = Path(filename or f"archivo_{index + 1}").stem
+                entry = {"file": filename, "success": error is None}
+                if error is None:
+                    name = writer.unique_name(f"{stem}.{output_format}")
+                    if output_storage.remote:
+                        yield writer.begin_file(name)
+                        chunks = await asyncio.to_thread(output_storage.iter_chunks, result["filename"])
+                        async for chunk in iter_in_thread(chunks):
+                            data = writer.write(chunk)
+                            if data:
+                                yield data
+                        yield writer.end_file()
+                    else:
+                        for data in writer.add_file(name, OUTPUT_DIR / result["filename"]):
+                            yield data
+                    entry["output"] = name
+                else:
+                    name = writer.unique_name(f"{stem}.error.txt")
+                    yield writer.add_bytes(name, f"{filename}: {error}\n".encode("utf-8"))
+                    entry["error"] = error
+                summary.append(entry)
+            yield writer.add_bytes("resultados.json", json.dumps(summary, ensure_ascii=False, indent=2).encode("utf-8"))
+            yield writer.close()
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(
+        body(),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="convertidos_{output_format}.zip"',
+            "Cache-Control": "no-cache, no-store, must-revalidate",
+        }
+    )
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    output_format: str = Form(...),
+    pages: Optional[str] = Form(None),
+    frames: Optional[str] = Form(None),
+    max_width: Optional[int] = Form(None),
+    max_height: Optional[int] = Form(None),
+    scale: Optional[float] = Form(None),
+    preset: Optional[str] = Form(None),
+    profile: bool = Depends(profiling_requested),
+    client: str = Depends(client_id)
+):
+    """Encola una conversión y retorna el id del trabajo inmediatamente"""
+    options = conversion_options(file.filename, pages, frames, max_width, max_height, scale, preset)
+    job = await enqueue_upload(file, output_format, options, profile=profile, client=client)
+    response = {
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}"
+    }
+    if profile:
+        response["profile_url"] = f"/admin/profiles/{job.id}"
+    return response
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Consulta el estado de un trabajo (queued, running, done, failed)"""
+    job = job_manager.get(job_id)
+    if job is None:
+        # Puede estar en otro worker: su último estado está en el store compartido
+        data = await shared_store.call(shared_store.get_job, job_id) if shared_store.shared else None
+        if data is None:
+            raise HTTPException(status_code=404, detail="Trabajo no encontrado. Puede haber expirado.")
+        return data
+    data = job.to_dict()
+    if job.status == JOB_QUEUED:
+        data["queue_depth"] = job_manager.queue_depth(job.file_type)
+    return data
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """Transmite el avance de un trabajo como Server-Sent Events.
+    
+    Eventos: `status` (queued/running), `stage` (etapa de la conversión), `progress` (porcentaje;
+    en audio según la duración de la entrada) y al final `done` o `failed` con los mismos datos que
+    GET /jobs/{job_id}, tras lo cual se cierra el stream. Al reconectar, el navegador envía
+    `Last-Event-ID` y solo recibe lo que falta.
+    """
+    job = job_manager.get(job_id)
+    if job is None and not (shared_store.shared and await shared_store.call(shared_store.get_job, job_id) is not None):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado. Puede haber expirado.")
+    last_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    
+    async def body():
+        if job is None:
+            # Trabajo de otro worker: solo cambios de estado, leídos del store compartido
+            events = poll_snapshots(lambda: shared_store.call(shared_store.get_job, job_id))
+        else:
+            events = job.events.subscribe(last_id)
+        async for event in events:
+            yield format_sse(event)
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # nginx: no acumular el stream
+        }
+    )
+
+def upload_session_error(e: UploadSessionError) -> HTTPException:
+    """Convierte un error de sesión en HTTPException; incluye el offset confirmado para reanudar"""
+    headers = {"Upload-Offset": str(e.offset)} if e.offset is not None else None
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+
+async def get_upload_session(upload_id: str):
+    try:
+        return await upload_sessions.get(upload_id)
+    except UploadSessionError as e:
+        raise upload_session_error(e)
+
+@app.post("/uploads", status_code=201)
+async def create_upload(
+    filename: str = Form(...),
+    size: int = Form(...),
+    sha256: Optional[str] = Form(None)
+):
+    """Inicia una subida reanudable: el archivo se envía después en bloques con PUT /uploads/{id}.
+    
+    `size` es el tamaño total en bytes; `sha256` (opcional) se verifica al completar la subida.
+    """
+    filename = Path(filename).name
+    if get_file_type(filename) == "unknown":
+        raise HTTPException(status_code=400, detail="Formato de archivo no soportado")
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="El archivo está vacío")
+    if size > RESUMABLE_MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El archivo es demasiado grande. Tamaño máximo permitido: {RESUMABLE_MAX_FILE_SIZE / (1024 * 1024):.0f} MB"
+        )
+    if sha256 is not None and not re.fullmatch(r"[0-9a-fA-F]{64}", sha256):
+        raise HTTPException(status_code=400, detail="sha256 debe ser un hash hexadecimal de 64 caracteres")
+    session = await upload_sessions.create(filename, size, sha256)
+    await shared_store.call(file_index.add, session.path, 0)
+    return {
+        **session.to_dict(),
+        "chunk_size": min(RESUMABLE_CHUNK_MAX, size),
+        "upload_url": f"/uploads/{session.id}",
+    }
+
+@app.put("/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: Optional[int] = Header(None),
+    x_chunk_sha256: Optional[str] = Header(None)
+):
+    """Agrega un bloque al archivo. Requiere `Upload-Offset` (bytes ya confirmados) y `X-Chunk-Sha256`.
+    
+    Si el offset no coincide responde 409 con el offset correcto en `Upload-Offset`; si el checksum
+    no coincide el bloque se descarta (422) y se puede reenviar.
+    """
+    session = await get_upload_session(upload_id)
+    if upload_offset is None:
+        raise HTTPException(status_code=400, detail="Falta la cabecera Upload-Offset")
+    if not x_chunk_sha256:
+        raise HTTPException(status_code=400, detail="Falta la cabecera X-Chunk-Sha256")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > RESUMABLE_CHUNK_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El bloque supera el máximo de {RESUMABLE_CHUNK_MAX / (1024 * 1024):.0f} MB"
+        )
+    
+    # Fijado mientras se escribe: la limpieza por cuota no puede borrarlo a mitad de un bloque
+    await shared_store.call(file_index.pin, session.path)
+    start = time.perf_counter()
+    try:
+        previous = session.offset
+        offset = await upload_sessions.append(session, upload_offset, x_chunk_sha256, request.stream())
+    except UploadSessionError as e:
+        raise upload_session_error(e)
+    except ClientDisconnect:
+        # El bloque incompleto ya se descartó; el cliente reanuda desde GET /uploads/{id}
+        logger.info(f"Subida {upload_id}: conexión cerrada a mitad de bloque (offset {session.offset})")
+        raise HTTPException(status_code=400, detail="Conexión cerrada antes de recibir el bloque completo")
+    finally:
+        await shared_store.call(file_index.unpin, session.path)
+    record_upload(offset - previous, time.perf_counter() - start)
+    # Registrar la actividad: una sesión solo expira tras FILE_TTL_MINUTES sin recibir bloques
+    await shared_store.call(file_index.add, session.path, offset)
+    response.headers["Upload-Offset"] = str(offset)
+    return {"upload_id": session.id, "offset": offset, "size": session.size, "complete": session.complete}
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str, response: Response):
+    """Consulta cuántos bytes hay confirmados, para reanudar una subida interrumpida"""
+    session = await get_upload_session(upload_id)
+    response.headers["Upload-Offset"] = str(session.offset)
+    return session.to_dict()
+
+@app.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Cancela una subida y elimina lo recibido"""
+    session = await get_upload_session(upload_id)
+    await shared_store.call(upload_sessions.remove, upload_id)
+    await remove_temp_file(session.path)
+    return {"success": True, "upload_id": upload_id}
 
-async def convert_media(input_path: Path, output_path: Path, output_format: str):
-    """Convierte archivos de audio usando FFmpeg con optimizaciones"""
+@app.post("/uploads/{upload_id}/complete", status_code=202)
+async def complete_upload(
+    upload_id: str,
+    output_format: str = Form(...),
+    pages: Optional[str] = Form(None),
+    frames: Optional[str] = Form(None),
+    max_width: Optional[int] = Form(None),
+    max_height: Optional[int] = Form(None),
+    scale: Optional[float] = Form(None),
+    preset: Optional[str] = Form(None),
+    client: str = Depends(client_id)
+):
+    """Cierra una subida completa y encola su conversión (responde igual que POST /jobs).
+    
+    Si la cola está llena responde 429 sin tocar la sesión, así que se puede reintentar. Completar
+    es idempotente entre workers: si la sesión ya se completó (p. ej. un reintento tras un timeout,
+    o dos pedidos simultáneos) responde con el trabajo que se encoló la primera vez.
+    """
+    job_id = await upload_sessions.completed_job(upload_id)
+    if job_id is None:
+        session = await get_upload_session(upload_id)
+        await ffmpeg_ready()
+        file_type, output_format = validate_conversion_request(session.filename, output_format)
+        options = conversion_options(session.filename, pages, frames, max_width, max_height, scale, preset)
+        
+        async def start_job(digest: str) -> str:
+            if job_manager.is_full(file_type, client):
+                raise queue_full_error(file_type, job_manager.retry_after(file_type),
+                                       client_limit=not job_manager.is_full(file_type))
+            # Enlace y no rename: si el encolado falla, el archivo parcial sigue ahí para reintentar
+            input_path = UPLOAD_DIR / f"{session.id}_{session.filename}"
+            input_path.unlink(missing_ok=True)
+            os.link(session.path, input_path)
+            await shared_store.call(file_index.add, input_path, session.size, pinned=True)
+            job = await enqueue_saved_file(session.id, input_path, file_type, output_format, digest, options,
+                                           client=client)
+            return job.id
+        
+        try:
+            job_id = await upload_sessions.complete(session, start_job)
+        except UploadSessionError as e:
+            raise upload_session_error(e)
+        await shared_store.call(file_index.remove, session.path)
+    
+    job = job_manager.get(job_id)
+    if job is not None:
+        status = job.status
+    else:
+        # Lo encoló otro worker: su último estado está en el store compartido
+        data = await shared_store.call(shared_store.get_job, job_id) if shared_store.shared else None
+        status = data["status"] if data else JOB_QUEUED
+    return {
+        "success": True,
+        "job_id": job_id,
+        "status": status,
+        "status_url": f"/jobs/{job_id}"
+    }
+
+@app.post("/admin/ffmpeg/refresh", dependencies=[Depends(require_admin)])
+async def refresh_ffmpeg():
+    """Vuelve a detectar FFmpeg y sus encoders (p. ej. tras instalar codecs nuevos)"""
+    global ffmpeg_caps
+    ffmpeg_caps = await probe_ffmpeg()
+    return ffmpeg_caps.to_dict()
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Perfiles guardados, del más reciente al más antiguo"""
+    return {"slow_threshold_seconds": PROFILE_SLOW_SECONDS, "profiles": profile_store.summaries()}
+
+@app.get("/admin/profiles/{job_id}", dependencies=[Depends(require_admin)])
+async def get_profile(job_id: str, format: str = "json"):
+    """Perfil de un trabajo: etapas y pilas más frecuentes (JSON) o todas las pilas en formato
+    colapsado (`format=collapsed`) para flamegraph.pl o speedscope"""
+    profile = profile_store.get(job_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado. Puede no haberse pedido o haber expirado.")
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    return profile.to_dict()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Contadores de la caché de resultados (aciertos, fallos, desalojos, bytes)"""
+    return await shared_store.call(result_cache.stats)
+
+@app.get("/startup")
+async def startup_stats():
+    """Tiempos del arranque por fase (imports, detección de FFmpeg, calentamiento del pool, ...)"""
+    return startup_report.to_dict()
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    store_metrics.update(await shared_store.call(read_store_metrics))
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/janitor/stats")
+async def janitor_stats():
+    """Archivos temporales en disco y bytes liberados por la limpieza automática"""
+    return await shared_store.call(janitor.stats)
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    """Reparto de las colas entre clientes y límite de peticiones (de este worker)"""
+    return {
+        **job_manager.share.stats(),
+        "queue_depth": {file_type: job_manager.queue_depth(file_type) for file_type in job_manager.concurrency},
+        "max_queue": job_manager.max_queue,
+        "max_queue_per_client": job_manager.client_max_queue,
+        "rate_limit": rate_limiter.stats(),
+    }
+
+def ffmpeg_audio_args(output_format: str, preset: Optional[str] = None) -> list:
+    """Argumentos de codificación de FFmpeg para cada formato de audio según el preset (ver presets.py)"""
+    return ["-codec:a", AUDIO_ENCODERS[output_format], *audio_args(output_format, preset)]
+
+FFMPEG_BENCH_RE = re.compile(rb"bench: utime=([\d.]+)s stime=([\d.]+)s")
+
+def record_ffmpeg_usage(stderr: bytes, output_format: str, wall_seconds: float):
+    """Registra tiempo real y de CPU de FFmpeg a partir de la línea "bench:" de -benchmark"""
+    FFMPEG_WALL_SECONDS.inc(wall_seconds, output_format)
+    match = FFMPEG_BENCH_RE.search(stderr or b"")
+    if match:
+        FFMPEG_CPU_SECONDS.inc(float(match.group(1)), output_format, "user")
+        FFMPEG_CPU_SECONDS.inc(float(match.group(2)), output_format, "system")
+    profile = active_profile.get()
+    if profile is not None:
+        # FFmpeg es otro proceso: no se muestrea su pila, pero sí su tiempo real y de CPU
+        profile.add_stage("ffmpeg", wall_seconds, convert=True)
+        if match:
+            profile.details["ffmpeg_cpu_seconds"] = {"user": float(match.group(1)), "system": float(match.group(2))}
+
+def summarize_ffmpeg_error(stderr: bytes) -> str:
+    """Extrae las líneas de error relevantes de la salida de error de FFmpeg"""
+    error_msg = stderr.decode('utf-8', errors='ignore') if stderr else "Error desconocido"
+    # Filtrar mensajes informativos comunes de FFmpeg
+    error_lines = error_msg.split('\n')
+    # Buscar líneas de error reales (no información de versión o configuración)
+    real_errors = []
+    skip_patterns = ['ffmpeg version', 'Copyright', 'built with', 'configuration:', 'libav', '--enable-']
+    
+    for line in error_lines:
+        line_lower = line.lower()
+        # Si la línea contiene palabras clave de error real
+        if any(keyword in line_lower for keyword in ['error', 'failed', 'invalid', 'cannot', 'unable']):
+            real_errors.append(line)
+        # Si no es información de configuración/versión, puede ser un error
+        elif line.strip() and not any(skip in line_lower for skip in skip_patterns):
+            # Verificar si parece un mensaje de error
+            if ':' in line and ('error' in line_lower or 'failed' in line_lower):
+                real_errors.append(line)
+    
+    # Si encontramos errores reales, usarlos; sino usar el último mensaje significativo
+    if real_errors:
+        error_text = '\n'.join(real_errors[-5:])  # Últimos 5 errores
+    else:
+        # Si no hay errores claros, buscar las últimas líneas que no sean información de versión
+        last_lines = [line for line in error_lines[-10:] if line.strip() and not any(skip in line.lower() for skip in skip_patterns)]
+        error_text = '\n'.join(last_lines) if last_lines else error_msg[-500:]
+    
+    return error_text
+
+FFMPEG_DURATION_RE = re.compile(rb"Duration: (\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+
+async def read_ffmpeg_stderr(stream: asyncio.StreamReader, buffer: bytearray, duration: dict):
+    """Acumula stderr (para errores y -benchmark) y toma la duración de la entrada del encabezado"""
+    while True:
+        data = await stream.read(64 * 1024)
+        if not data:
+            return
+        buffer.extend(data)
+        if "seconds" not in duration:
+            match = FFMPEG_DURATION_RE.search(buffer)
+            if match:
+                hours, minutes, seconds = match.groups()
+                duration["seconds"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+async def read_ffmpeg_progress(stream: asyncio.StreamReader, duration: dict, events: Optional[EventChannel]):
+    """Interpreta las líneas clave=valor de `-progress pipe:1` a medida que llegan"""
+    block = {}
+    while True:
+        line = await stream.readline()
+        if not line:
+            return
+        key, _, value = line.decode("ascii", "replace").strip().partition("=")
+        if key != "progress":
+            block[key] = value
+            continue
+        # "progress=continue|end" cierra cada bloque de estadísticas
+        if events is not None:
+            out_seconds = None
+            if block.get("out_time_us", "N/A").isdigit():
+                out_seconds = int(block["out_time_us"]) / 1_000_000
+            total = duration.get("seconds")
+            percent = 100 * out_seconds / total if out_seconds is not None and total else None
+            if value == "end":
+                percent = 100.0
+            events.progress(percent, out_seconds=out_seconds, duration_seconds=total,
+                            speed=block.get("speed", "").strip() or None)
+        block = {}
+
+async def convert_media(input_path: Path, output_path: Path, output_format: str, preset: Optional[str] = None,
+                        events: Optional[EventChannel] = None):
+    """Convierte archivos de audio usando FFmpeg con optimizaciones.
+    
+    FFmpeg reporta su avance con `-progress pipe:1`; el porcentaje se calcula con la duración que
+    FFmpeg detecta al abrir la entrada y se publica en `events`.
+    """
     
     # Construir comando base con optimizaciones
     cmd = [
-        "ffmpeg",
+        ffmpeg_caps.path or "ffmpeg",
         "-i", str(input_path),
         "-y",  # Sobrescribir archivo de salida
+        "-progress", "pipe:1",
+        "-nostats",  # El avance sale por stdout; stderr queda para errores y -benchmark
     ]
     
     # Optimizaciones generales para velocidad (priorizar velocidad sobre calidad máxima)
@@ -269,92 +1424,44 @@ async def convert_media(input_path: Path, output_path: Path, output_format: str)
         "-threads", "0",  # Usar todos los cores disponibles
     ])
     
-    # Ajustes específicos para audio (optimizados para velocidad)
-    if output_format == "mp3":
-        cmd.extend([
-            "-codec:a", "libmp3lame",
-            "-b:a", "192k",
-            "-q:a", "4",  # Calidad buena pero más rápida (0-9, más alto = más rápido)
-        ])
-    elif output_format == "wav":
-        cmd.extend([
-            "-codec:a", "pcm_s16le",
-        ])
-    elif output_format == "aac":
-        cmd.extend([
-            "-codec:a", "aac",
-            "-b:a", "192k",
-            "-profile:a", "aac_low",  # Perfil más rápido
-        ])
-    elif output_format == "ogg":
-        cmd.extend([
-            "-codec:a", "libvorbis",
-            "-q:a", "4",  # Calidad buena pero más rápida
-        ])
-    elif output_format == "flac":
-        cmd.extend([
-            "-codec:a", "flac",
-            "-compression_level", "3",  # Nivel más bajo = más rápido
-        ])
-    elif output_format == "m4a":
-        cmd.extend([
-            "-codec:a", "aac",
-            "-b:a", "192k",
-            "-profile:a", "aac_low",
-        ])
-    elif output_format == "wma":
-        cmd.extend([
-            "-codec:a", "wmav2",
-            "-b:a", "192k",
-        ])
+    # Ajustes específicos para audio
+    cmd.extend(ffmpeg_audio_args(output_format, preset))
     
+    # -benchmark reporta el tiempo de CPU de FFmpeg al final de stderr (para /metrics)
+    cmd.append("-benchmark")
     cmd.append(str(output_path))
     
     # Ejecutar FFmpeg de forma asíncrona con timeout
     try:
         process = await asyncio.create_subprocess_exec(
             *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
         
         # Esperar con timeout (30 minutos máximo)
+        start = time.perf_counter()
+        stderr = bytearray()
+        duration = {}
         try:
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(),
+            await asyncio.wait_for(
+                asyncio.gather(
+                    read_ffmpeg_stderr(process.stderr, stderr, duration),
+                    read_ffmpeg_progress(process.stdout, duration, events),
+                    process.wait(),
+                ),
                 timeout=1800.0  # 30 minutos
             )
         except asyncio.TimeoutError:
             process.kill()
             await process.wait()
             raise Exception("La conversión excedió el tiempo máximo permitido (30 minutos)")
+        stderr = bytes(stderr)
+        record_ffmpeg_usage(stderr, output_format, time.perf_counter() - start)
         
         if process.returncode != 0:
-            error_msg = stderr.decode('utf-8', errors='ignore') if stderr else "Error desconocido"
-            # Filtrar mensajes informativos comunes de FFmpeg
-            error_lines = error_msg.split('\n')
-            # Buscar líneas de error reales (no información de versión o configuración)
-            real_errors = []
-            skip_patterns = ['ffmpeg version', 'Copyright', 'built with', 'configuration:', 'libav', '--enable-']
-            
-            for line in error_lines:
-                line_lower = line.lower()
-                # Si la línea contiene palabras clave de error real
-                if any(keyword in line_lower for keyword in ['error', 'failed', 'invalid', 'cannot', 'unable']):
-                    real_errors.append(line)
-                # Si no es información de configuración/versión, puede ser un error
-                elif line.strip() and not any(skip in line_lower for skip in skip_patterns):
-                    # Verificar si parece un mensaje de error
-                    if ':' in line and ('error' in line_lower or 'failed' in line_lower):
-                        real_errors.append(line)
-            
-            # Si encontramos errores reales, usarlos; sino usar el último mensaje significativo
-            if real_errors:
-                error_text = '\n'.join(real_errors[-5:])  # Últimos 5 errores
-            else:
-                # Si no hay errores claros, buscar las últimas líneas que no sean información de versión
-                last_lines = [line for line in error_lines[-10:] if line.strip() and not any(skip in line.lower() for skip in skip_patterns)]
-                error_text = '\n'.join(last_lines) if last_lines else error_msg[-500:]
+            error_text = summarize_ffmpeg_error(stderr)
             
             logger.error(f"FFmpeg error (returncode {process.returncode}): {error_text}")
             
@@ -372,576 +1479,353 @@ async def convert_media(input_path: Path, output_path: Path, output_format: str)
         logger.error(f"Error en convert_media: {str(e)}\n{traceback.format_exc()}")
         raise
 
-async def convert_image(input_path: Path, output_path: Path, output_format: str):
-    """Convierte imágenes usando Pillow"""
-    from PIL import Image
+# Formatos de audio que FFmpeg puede escribir en un pipe (formato de salida -> muxer)
+STREAMABLE_AUDIO_FORMATS = {"mp3": "mp3", "ogg": "ogg", "flac": "flac", "wav": "wav"}
+STREAM_CHUNK_SIZE = 64 * 1024
+# Conversiones por streaming simultáneas (no pasan por la cola de trabajos)
+stream_slots = asyncio.Semaphore(int(os.getenv("STREAM_CONCURRENCY", 2)))
+
+def fix_wav_stream_header(data: bytes) -> Optional[bytes]:
+    """Ajusta la cabecera WAV que FFmpeg escribe en un pipe (sin poder volver atrás a corregir tamaños).
     
+    Marca el tamaño RIFF y el del chunk "data" como 0xFFFFFFFF ("hasta el final del stream"), que es
+    lo que esperan los reproductores para WAV de longitud desconocida. Retorna None si todavía no llegó
+    la cabecera completa.
+    """
+    if len(data) < 12:
+        return None
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return data
+    patched = bytearray(data)
+    patched[4:8] = b"\xff\xff\xff\xff"
+    offset = 12
+    while offset + 8 <= len(patched):
+        chunk_id = bytes(patched[offset:offset + 4])
+        chunk_size = int.from_bytes(patched[offset + 4:offset + 8], "little")
+        if chunk_id == b"data":
+            patched[offset + 4:offset + 8] = b"\xff\xff\xff\xff"
+            return bytes(patched)
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+class StreamAborted(Exception):
+    """Fallo de una conversión por streaming después de enviar los encabezados.
     
-    try:
-        img = Image.open(input_path)
-        
-        # Manejar GIFs animados - tomar solo el primer frame
-        if img.format == "GIF":
-            try:
-                # Verificar si es animado
-                if hasattr(img, 'is_animated') and img.is_animated:
-                    # Ir al primer frame y copiarlo
-                    img.seek(0)
-                    # Crear una copia del primer frame
-                    first_frame = img.copy()
-                    img = first_frame
-            except Exception as e:
-                logger.warning(f"Error manejando GIF animado, usando frame actual: {str(e)}")
-                # Si hay error, simplemente usar la imagen tal como está
-                pass
-        
-        # Convertir modos de color problemáticos a RGB/RGBA según necesidad
-        # Esto debe hacerse antes de las conversiones específicas de formato
-        
-        # Convertir modos de color problemáticos
-        if img.mode in ["P", "LA", "PA"]:
-            # P = Palette, LA = Luminance + Alpha, PA = Palette + Alpha
-            if img.mode == "P":
-                # Verificar si tiene transparencia
-                if "transparency" in img.info:
-                    img = img.convert("RGBA")
-                else:
-                    img = img.convert("RGB")
-            elif img.mode in ["LA", "PA"]:
-                img = img.convert("RGBA")
-        
-        # Convertir RGBA a RGB si es necesario (para formatos que no soportan transparencia)
-        if output_format in ["jpg", "jpeg"]:
-            # JPG no soporta transparencia, siempre convertir a RGB
-            if img.mode == "RGBA":
-                # Crear fondo blanco y pegar la imagen con transparencia
-                rgb_img = Image.new("RGB", img.size, (255, 255, 255))
-                if img.mode == "RGBA":
-                    # Usar el canal alpha como máscara
-                    alpha = img.split()[3] if len(img.split()) > 3 else None
-                    rgb_img.paste(img, mask=alpha)
-                else:
-                    rgb_img.paste(img)
-                img = rgb_img
-            elif img.mode not in ["RGB", "L"]:
-                # Convertir otros modos a RGB
-                img = img.convert("RGB")
-        elif output_format in ["bmp", "webp"]:
-            # BMP y WEBP pueden manejar RGBA, pero mejor convertir a RGB si no hay transparencia
-            if img.mode == "RGBA" and output_format == "bmp":
-                # BMP no soporta transparencia bien, convertir a RGB
-                rgb_img = Image.new("RGB", img.size, (255, 255, 255))
-                rgb_img.paste(img, mask=img.split()[3] if len(img.split()) > 3 else None)
-                img = rgb_img
-        elif output_format == "png":
-            # PNG soporta transparencia, mantener RGBA si existe
-            if img.mode not in ["RGB", "RGBA", "L", "LA", "P"]:
-                img = img.convert("RGBA")
-        elif output_format == "gif":
-            # GIF puede tener transparencia
-            if img.mode not in ["RGB", "RGBA", "P", "L"]:
-                img = img.convert("RGB")
-        
-        # Determinar el formato para Pillow
-        format_map = {
-            "jpg": "JPEG",
-            "jpeg": "JPEG",
-            "png": "PNG",
-            "gif": "GIF",
-            "bmp": "BMP",
-            "webp": "WEBP",
-            "tiff": "TIFF",
-            "ico": "ICO"
-        }
-        
-        pillow_format = format_map.get(output_format.lower(), output_format.upper())
-        
-        # Opciones de guardado según el formato
-        save_kwargs = {}
-        if pillow_format == "JPEG":
-            save_kwargs["quality"] = 95
-            save_kwargs["optimize"] = True
-        elif pillow_format == "WEBP":
-            save_kwargs["quality"] = 90
-        elif pillow_format == "PNG":
-            save_kwargs["optimize"] = True
-        
-        # Guardar en el nuevo formato
-        img.save(output_path, format=pillow_format, **save_kwargs)
-        
-    except Exception as e:
-        logger.error(f"Error convirtiendo imagen: {str(e)}\n{traceback.format_exc()}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error al convertir imagen: {str(e)}"
-        )
+    Se propaga fuera del cuerpo de la respuesta para que el servidor corte la conexión sin el bloque
+    final: el cliente ve una respuesta incompleta en lugar de un 200 con el archivo truncado.
+    """
 
-def extract_text_from_pdf(pdf_path: Path) -> str:
-    """Extrae texto de un archivo PDF"""
+async def feed_ffmpeg_stdin(process, file: UploadFile):
+    """Copia el archivo subido al stdin de FFmpeg por bloques; mata a FFmpeg y lanza 413 si supera MAX_FILE_SIZE"""
+    total = 0
+    start = time.perf_counter()
     try:
-        import PyPDF2
-        text_content = []
-        
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            if len(pdf_reader.pages) == 0:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > MAX_FILE_SIZE:
+                logger.warning("Streaming abortado: el archivo supera el tamaño máximo")
+                process.kill()
                 raise HTTPException(
-                    status_code=400,
-                    detail="El archivo PDF está vacío o no tiene páginas"
+                    status_code=413,
+                    detail=f"El archivo es demasiado grande. Tamaño máximo permitido: {MAX_FILE_SIZE / (1024 * 1024):.0f} MB"
                 )
-            
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text = page.extract_text()
-                if text.strip():
-                    text_content.append(text)
-        
-        if not text_content:
-            raise HTTPException(
-                status_code=400,
-                detail="El archivo PDF no contiene texto extraíble. Puede ser un PDF escaneado (imagen) o estar protegido."
-            )
-        
-        return "\n\n".join(text_content)
+            process.stdin.write(chunk)
+            await process.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # FFmpeg terminó antes de leer toda la entrada (p. ej. archivo inválido)
+        pass
+    finally:
+        if not process.stdin.is_closing():
+            process.stdin.close()
+    # Con el formulario recibido por multipart_upload.py, el tiempo de subida es el de la recepción
+    record_upload(total, getattr(file, "upload_seconds", None) or time.perf_counter() - start)
+    return total
+
+@app.post("/convert/stream")
+async def convert_stream(
+    file: UploadFile = File(...),
+    output_format: str = Form(...),
+    preset: Optional[str] = Form(None)
+):
+    """Convierte audio con FFmpeg por pipes y transmite el resultado mientras se codifica.
     
-    except HTTPException:
-        raise
-    except ImportError:
+    La entrada llega ya recibida en UPLOAD_DIR (multipart_upload.py) y se borra al terminar la respuesta;
+    la salida no pasa por OUTPUT_DIR: los primeros bytes llegan al cliente en cuanto FFmpeg los produce.
+    Solo para formatos que no requieren volver atrás en el archivo.
+    """
+    await ffmpeg_ready()
+    file_type, output_format = validate_conversion_request(file.filename, output_format)
+    if file_type != "audio" or output_format not in STREAMABLE_AUDIO_FORMATS:
         raise HTTPException(
-            status_code=500,
-            detail="PyPDF2 no está instalado. Ejecuta: pip install PyPDF2"
+            status_code=400,
+            detail=f"El modo streaming solo está disponible para audio a: {', '.join(STREAMABLE_AUDIO_FORMATS)}. Usa /convert para otros formatos."
         )
-    except Exception as e:
-        logger.error(f"Error extrayendo texto de PDF: {str(e)}\n{traceback.format_exc()}")
+    preset = (conversion_options(file.filename, None, preset=preset) or {}).get("preset")
+    # El formulario ya se recibió (multipart_upload.py corta con 413 al pasar el máximo): el tamaño
+    # se conoce antes de responder y un archivo demasiado grande nunca llega a FFmpeg
+    known_size = getattr(file, "size", None)
+    if known_size is not None and known_size > MAX_FILE_SIZE:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error al leer archivo PDF: {str(e)}"
+            status_code=413,
+            detail=f"El archivo es demasiado grande. Tamaño máximo permitido: 50 MB. Tu archivo: {known_size / (1024 * 1024):.2f} MB"
         )
-
-async def convert_document(input_path: Path, output_path: Path, output_format: str):
-    """Convierte documentos con manejo robusto de errores"""
-    input_ext = input_path.suffix.lower()
+    if stream_slots.locked():
+        raise queue_full_error("audio", 5)
     
-    # Lista de encodings a probar
-    encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1', 'windows-1252']
+    await stream_slots.acquire()
+    cmd = [
+        ffmpeg_caps.path or "ffmpeg",
+        "-hide_banner",
+        "-i", "pipe:0",
+        "-vn",
+        "-threads", "0",
+        *ffmpeg_audio_args(output_format, preset),
+        "-map_metadata", "-1",
+        "-fflags", "+bitexact",  # Cabecera mínima (sin chunk LIST en WAV)
+        "-f", STREAMABLE_AUDIO_FORMATS[output_format],
+        "-benchmark",
+        "pipe:1",
+    ]
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except BaseException:
+        stream_slots.release()
+        raise
     
+    feeder = asyncio.create_task(feed_ffmpeg_stdin(process, file))
+    stderr_task = asyncio.create_task(process.stderr.read())
+    started = time.perf_counter()
+    deadline = asyncio.get_running_loop().time() + 1800.0  # 30 minutos, igual que convert_media
+    
+    async def cleanup():
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        feeder.cancel()
+        stderr_task.cancel()
+        stream_slots.release()
+    
+    async def read_chunk() -> bytes:
+        remaining = deadline - asyncio.get_running_loop().time()
+        return await asyncio.wait_for(process.stdout.read(STREAM_CHUNK_SIZE), timeout=max(remaining, 0.001))
+    
+    # Esperar el primer bloque antes de responder, para poder retornar un error HTTP si FFmpeg falla de inmediato
     try:
-        if output_format == "txt":
-            # Conversión a texto plano
-            if input_ext == ".pdf":
-                try:
-                    text_content = extract_text_from_pdf(input_path)
-                    async with aiofiles.open(output_path, 'w', encoding='utf-8') as f:
-                        await f.write(text_content)
-                except HTTPException:
-                    raise
-                except Exception as e:
-                    logger.error(f"Error convirtiendo PDF a TXT: {str(e)}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Error al convertir PDF a TXT: {str(e)}"
-                    )
-            elif input_ext in [".docx"]:
-                try:
-                    from docx import Document
-                    doc = Document(input_path)
-                    text = "\n".join([para.text for para in doc.paragraphs])
-                    async with aiofiles.open(output_path, 'w', encoding='utf-8') as f:
-                        await f.write(text)
-                except Exception as e:
-                    logger.error(f"Error leyendo DOCX: {str(e)}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Error al leer archivo DOCX: {str(e)}"
-                    )
-            elif input_ext in [".html", ".htm"]:
-                # Convertir HTML a texto plano (básico)
-                try:
-                    import html
-                    async with aiofiles.open(input_path, 'r', encoding='utf-8') as f:
-                        html_content = await f.read()
-                    # Remover tags HTML básicos
-                    text = html.unescape(html_content)
-                    # Remover tags HTML simples (muy básico)
-                    import re
-                    text = re.sub(r'<[^>]+>', '', text)
-                    async with aiofiles.open(output_path, 'w', encoding='utf-8') as f:
-                        await f.write(text)
-                except Exception as e:
-                    # Si falla, intentar como texto plano
-                    for encoding in encodings:
-                        try:
-                            async with aiofiles.open(input_path, 'r', encoding=encoding) as f:
-                                content = await f.read()
-                            async with aiofiles.open(output_path, 'w', encoding='utf-8') as f:
-                                await f.write(content)
-                            break
-                        except:
-                            continue
-                    else:
-                        raise HTTPException(status_code=500, detail="Error al leer el archivo")
-            else:
-                # Leer como texto plano con múltiples encodings
-                content = None
-                for encoding in encodings:
-                    try:
-                        async with aiofiles.open(input_path, 'r', encoding=encoding) as f:
-                            content = await f.read()
-                        break
-                    except (UnicodeDecodeError, UnicodeError):
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error leyendo archivo con encoding {encoding}: {str(e)}")
-                        continue
-                
-                if content is None:
-                    raise HTTPException(
-                        status_code=500,
-                        detail="No se pudo leer el archivo con ningún encoding compatible"
-                    )
-                
-                async with aiofiles.open(output_path, 'w', encoding='utf-8') as f:
-                    await f.write(content)
-        
-        elif output_format == "html":
-            # Conversión a HTML
-            if input_ext == ".pdf":
-                try:
-                    text_content = extract_text_from_pdf(input_path)
-                    # Escapar HTML
-                    import html
-                    escaped_text = html.escape(text_content)
-                    # Convertir saltos de línea a <br>
-                    escaped_text = escaped_text.replace('\n', '<br>\n')
-                    html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <title>Documento Convertido</title>
-</head>
-<body>
-    <pre>{escaped_text}</pre>
-</body>
-</html>"""
-                    async with aiofiles.open(output_path, 'w', encoding='utf-8') as f:
-                        await f.write(html_content)
-                except HTTPException:
-                    raise
-                except Exception as e:
-                    logger.error(f"Error convirtiendo PDF a HTML: {str(e)}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Error al convertir PDF a HTML: {str(e)}"
-                    )
-            elif input_ext in [".docx"]:
-                try:
-                    from docx import Document
-                    doc = Document(input_path)
-                    text = "\n".join([para.text for para in doc.paragraphs])
-                    # Escapar HTML
-                    import html
-                    text = html.escape(text)
-                    # Convertir saltos de línea a <br>
-                    text = text.replace('\n', '<br>\n')
-                    html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <title>Documento Convertido</title>
-</head>
-<body>
-    <pre>{text}</pre>
-</body>
-</html>"""
-                    async with aiofiles.open(output_path, 'w', encoding='utf-8') as f:
-                        await f.write(html_content)
-                except Exception as e:
-                    logger.error(f"Error convirtiendo DOCX a HTML: {str(e)}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Error al convertir DOCX a HTML: {str(e)}"
-                    )
-            else:
-                # Leer archivo y envolver en HTML
-                content = None
-                for encoding in encodings:
-                    try:
-                        async with aiofiles.open(input_path, 'r', encoding=encoding) as f:
-                            content = await f.read()
-                        break
-                    except (UnicodeDecodeError, UnicodeError):
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error leyendo archivo: {str(e)}")
-                        continue
-                
-                if content is None:
-                    raise HTTPException(
-                        status_code=500,
-                        detail="No se pudo leer el archivo con ningún encoding compatible"
-                    )
-                
-                # Escapar HTML
-                import html
-                escaped_content = html.escape(content)
-                html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <title>Documento Convertido</title>
-</head>
-<body>
-    <pre>{escaped_content}</pre>
-</body>
-</html>"""
-                async with aiofiles.open(output_path, 'w', encoding='utf-8') as f:
-                    await f.write(html_content)
-        
-        elif output_format == "md":
-            # Conversión a Markdown
-            if input_ext == ".pdf":
-                try:
-                    text_content = extract_text_from_pdf(input_path)
-                    async with aiofiles.open(output_path, 'w', encoding='utf-8') as f:
-                        await f.write(text_content)
-                except HTTPException:
-                    raise
-                except Exception as e:
-                    logger.error(f"Error convirtiendo PDF a MD: {str(e)}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Error al convertir PDF a Markdown: {str(e)}"
-                    )
-            elif input_ext in [".docx"]:
-                try:
-                    from docx import Document
-                    doc = Document(input_path)
-                    text = "\n".join([para.text for para in doc.paragraphs])
-                    async with aiofiles.open(output_path, 'w', encoding='utf-8') as f:
-                        await f.write(text)
-                except Exception as e:
-                    logger.error(f"Error convirtiendo DOCX a MD: {str(e)}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Error al convertir DOCX a Markdown: {str(e)}"
-                    )
-            else:
-                # Leer como texto y guardar como MD
-                content = None
-                for encoding in encodings:
-                    try:
-                        async with aiofiles.open(input_path, 'r', encoding=encoding) as f:
-                            content = await f.read()
-                        break
-                    except (UnicodeDecodeError, UnicodeError):
-                        continue
-                
-                if content is None:
-                    raise HTTPException(
-                        status_code=500,
-                        detail="No se pudo leer el archivo con ningún encoding compatible"
-                    )
-                
-                async with aiofiles.open(output_path, 'w', encoding='utf-8') as f:
-                    await f.write(content)
-        
-        elif output_format == "pdf":
-            # Conversión a PDF
-            try:
-                from reportlab.lib.pagesizes import letter, A4
-                from reportlab.pdfgen import canvas
-                from reportlab.lib.units import inch
-                
-                # Leer contenido del archivo
-                text_content = ""
-                
-                if input_ext in [".docx"]:
-                    try:
-                        from docx import Document
-                        doc = Document(input_path)
-                        text_content = "\n".join([para.text for para in doc.paragraphs])
-                    except Exception as e:
-                        logger.error(f"Error leyendo DOCX para PDF: {str(e)}")
-                        raise HTTPException(
-                            status_code=500,
-                            detail=f"Error al leer archivo DOCX: {str(e)}"
-                        )
-                elif input_ext == ".pdf":
-                    raise HTTPException(
-                        status_code=400,
-                        detail="El archivo ya es un PDF. No es necesario convertirlo."
-                    )
-                else:
-                    # Leer como texto
-                    content = None
-                    for encoding in encodings:
-                        try:
-                            async with aiofiles.open(input_path, 'r', encoding=encoding) as f:
-                                content = await f.read()
-                            break
-                        except (UnicodeDecodeError, UnicodeError):
-                            continue
-                    
-                    if content is None:
-                        raise HTTPException(
-                            status_code=500,
-                            detail="No se pudo leer el archivo con ningún encoding compatible"
-                        )
-                    text_content = content
-                
-                # Crear PDF
-                c = canvas.Canvas(str(output_path), pagesize=A4)
-                width, height = A4
-                
-                # Configuración de texto
-                y_position = height - 50
-                line_height = 14
-                margin = 50
-                max_width = width - (2 * margin)
-                
-                # Dividir texto en líneas que quepan en la página
-                lines = text_content.split('\n')
-                for line in lines:
-                    # Si la línea es muy larga, dividirla
-                    words = line.split(' ')
-                    current_line = ""
-                    
-                    for word in words:
-                        test_line = current_line + (" " if current_line else "") + word
-                        text_width = c.stringWidth(test_line, "Helvetica", 10)
-                        
-                        if text_width > max_width and current_line:
-                            # Dibujar línea actual
-                            c.drawString(margin, y_position, current_line)
-                            y_position -= line_height
-                            current_line = word
-                            
-                            # Nueva página si es necesario
-                            if y_position < margin:
-                                c.showPage()
-                                y_position = height - 50
-                        else:
-                            current_line = test_line
-                    
-                    # Dibujar última línea
-                    if current_line:
-                        c.drawString(margin, y_position, current_line)
-                        y_position -= line_height
-                    
-                    # Nueva página si es necesario
-                    if y_position < margin:
-                        c.showPage()
-                        y_position = height - 50
-                
-                c.save()
-                
-            except ImportError:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Librería reportlab no está instalada. Ejecuta: pip install reportlab"
-                )
-            except Exception as e:
-                logger.error(f"Error creando PDF: {str(e)}\n{traceback.format_exc()}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error al crear PDF: {str(e)}"
-                )
-        
-        elif output_format == "docx":
-            # Conversión a DOCX
+        first = b""
+        while True:
+            chunk = await read_chunk()
+            first += chunk
+            if not chunk or output_format != "wav":
+                break
+            fixed = fix_wav_stream_header(first)
+            if fixed is not None:
+                first = fixed
+                break
+            if len(first) > STREAM_CHUNK_SIZE:
+                break
+        # La entrada se rechazó (p. ej. 413) antes de que FFmpeg produjera algo: todavía se puede responder el error
+        if feeder.done() and not feeder.cancelled() and feeder.exception() is not None:
+            raise feeder.exception()
+        if not first:
+            await process.wait()
+            error_text = summarize_ffmpeg_error(await stderr_task)
+            logger.error(f"FFmpeg error en streaming (returncode {process.returncode}): {error_text}")
+            raise HTTPException(status_code=500, detail=f"Error en la conversión: Error en FFmpeg: {error_text[:300]}")
+    except asyncio.TimeoutError:
+        await cleanup()
+        raise HTTPException(status_code=500, detail="La conversión excedió el tiempo máximo permitido (30 minutos)")
+    except BaseException:
+        await cleanup()
+        raise
+    
+    async def body():
+        try:
+            yield first
+            while True:
+                chunk = await read_chunk()
+                if not chunk:
+                    break
+                yield chunk
+            returncode = await process.wait()
+            stderr = await stderr_task
+            record_ffmpeg_usage(stderr, output_format, time.perf_counter() - started)
             try:
-                from docx import Document
-                
-                # Leer contenido del archivo
-                text_content = ""
-                
-                if input_ext in [".docx"]:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="El archivo ya es un DOCX. No es necesario convertirlo."
-                    )
-                elif input_ext == ".pdf":
-                    try:
-                        text_content = extract_text_from_pdf(input_path)
-                    except HTTPException:
-                        raise
-                    except Exception as e:
-                        logger.error(f"Error leyendo PDF para DOCX: {str(e)}")
-                        raise HTTPException(
-                            status_code=500,
-                            detail=f"Error al leer archivo PDF: {str(e)}"
-                        )
-                else:
-                    # Leer como texto
-                    content = None
-                    for encoding in encodings:
-                        try:
-                            async with aiofiles.open(input_path, 'r', encoding=encoding) as f:
-                                content = await f.read()
-                            break
-                        except (UnicodeDecodeError, UnicodeError):
-                            continue
-                    
-                    if content is None:
-                        raise HTTPException(
-                            status_code=500,
-                            detail="No se pudo leer el archivo con ningún encoding compatible"
-                        )
-                    text_content = content
-                
-                # Crear documento DOCX
-                doc = Document()
-                
-                # Dividir en párrafos (por líneas vacías o saltos de línea)
-                paragraphs = text_content.split('\n\n')
-                for para_text in paragraphs:
-                    if para_text.strip():
-                        # Dividir líneas largas
-                        lines = para_text.split('\n')
-                        for line in lines:
-                            if line.strip():
-                                doc.add_paragraph(line.strip())
-                        # Agregar espacio entre párrafos
-                        if para_text != paragraphs[-1]:
-                            doc.add_paragraph()
-                
-                # Guardar documento
-                doc.save(str(output_path))
-                
-            except Exception as e:
-                logger.error(f"Error creando DOCX: {str(e)}\n{traceback.format_exc()}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error al crear DOCX: {str(e)}"
-                )
-        
-        else:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Conversión de documentos a {output_format} no está implementada aún. Formatos disponibles: txt, html, md, pdf, docx"
-            )
+                await feeder
+            except HTTPException as e:
+                logger.error(f"Streaming abortado: {e.detail}")
+                raise StreamAborted(e.detail)
+            if returncode != 0:
+                logger.error(f"FFmpeg terminó con returncode {returncode} durante el streaming: {summarize_ffmpeg_error(stderr)}")
+                raise StreamAborted(f"FFmpeg terminó con returncode {returncode}")
+        except asyncio.TimeoutError:
+            logger.error("Streaming abortado: la conversión excedió el tiempo máximo permitido")
+            raise StreamAborted("La conversión excedió el tiempo máximo permitido (30 minutos)")
+        finally:
+            await cleanup()
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error en convert_document: {str(e)}\n{traceback.format_exc()}")
+    output_name = f"{Path(file.filename).stem}.{output_format}"
+    return StreamingResponse(
+        body(),
+        media_type=MIME_TYPES.get(output_format, 'application/octet-stream'),
+        headers={
+            "Content-Disposition": f'attachment; filename="{output_name}"',
+            "Cache-Control": "no-cache, no-store, must-revalidate",
+        }
+    )
+
+async def run_in_pool(fn, *args):
+    """Ejecuta un conversor CPU intensivo en el pool de procesos y traduce sus errores a HTTPException"""
+    profile = active_profile.get()
+    try:
+        if profile is None:
+            return await process_pool.run(fn, *args)
+        result, report = await process_pool.run(profiled_call, fn, args, profile.sampling_delay())
+        profile.merge(report)
+        return result
+    except ConversionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except BrokenProcessPool:
+        logger.error("Un proceso del pool terminó inesperadamente durante la conversión")
         raise HTTPException(
             status_code=500,
-            detail=f"Error al convertir documento: {str(e)}"
+            detail="El proceso de conversión terminó inesperadamente. El archivo puede ser demasiado grande o estar dañado."
         )
 
+async def convert_image(input_path: Path, output_path: Path, output_format: str, frames: Optional[str] = None,
+                        resize: Optional[dict] = None, preset: Optional[str] = None):
+    """Convierte imágenes usando Pillow en el pool de procesos (`frames`: ver multiframe.py;
+    `resize`: max_width, max_height y scale; `preset`: ver presets.py)"""
+    await run_in_pool(converters.convert_image_sync, input_path, output_path, output_format, frames, resize, preset)
+
+# PDFs con al menos esta cantidad de páginas se extraen en paralelo, en tramos de PDF_PAGES_PER_TASK
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 100))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 50))
+
+async def convert_document(input_path: Path, output_path: Path, output_format: str, pages: Optional[str] = None,
+                           events: Optional[EventChannel] = None):
+    """Convierte documentos en el pool de procesos (`pages` limita las páginas extraídas de un PDF)"""
+    if input_path.suffix.lower() == ".pdf" and output_format in converters.PDF_TEXT_FORMATS:
+        await convert_pdf_text(input_path, output_path, output_format, pages, events)
+        return
+    await run_in_pool(converters.convert_document_sync, input_path, output_path, output_format, pages)
+
+async def convert_pdf_text(input_path: Path, output_path: Path, output_format: str, pages: Optional[str] = None,
+                           events: Optional[EventChannel] = None):
+    """Extrae el texto de un PDF página por página; los PDFs grandes se reparten en tramos entre los workers"""
+    page_numbers = await run_in_pool(converters.pdf_page_numbers, input_path, pages)
+    if process_pool.max_workers <= 1 or len(page_numbers) < PDF_PARALLEL_MIN_PAGES:
+        await run_in_pool(converters.convert_pdf_text_sync, input_path, output_path, output_format, page_numbers)
+        return
+    
+    chunks = [page_numbers[i:i + PDF_PAGES_PER_TASK] for i in range(0, len(page_numbers), PDF_PAGES_PER_TASK)]
+    parts = [output_path.with_name(f"{output_path.name}.part{i}") for i in range(len(chunks))]
+    done_pages = 0
+    
+    async def extract(part: Path, chunk: list):
+        nonlocal done_pages
+        await run_in_pool(converters.extract_pdf_text_to_file, input_path, part, chunk)
+        done_pages += len(chunk)
+        if events is not None:
+            events.progress(100 * done_pages / len(page_numbers), pages_done=done_pages, pages=len(page_numbers))
+    
+    try:
+        if events is not None:
+            events.stage("extracting", pages=len(page_numbers), tasks=len(chunks))
+        await asyncio.gather(*(extract(part, chunk) for part, chunk in zip(parts, chunks)))
+        if events is not None:
+            events.stage("merging")
+        await run_in_pool(converters.write_text_parts_sync, parts, output_path, output_format)
+    finally:
+        for part in parts:
+            part.unlink(missing_ok=True)
+
+# Cache-Control de /download (ver downloads.py): "no-store", "revalidate" o "immutable"
+DOWNLOAD_CACHE_MODE = os.getenv("DOWNLOAD_CACHE_MODE", "revalidate").lower()
+if DOWNLOAD_CACHE_MODE not in DOWNLOAD_CACHE_MODES:
+    DOWNLOAD_CACHE_MODE = "revalidate"
+download_etags = ETagStore()
+# Con OUTPUT_STORAGE=s3, /download redirige a una URL prefirmada del bucket (la descarga no pasa por
+# este proceso); DOWNLOAD_REDIRECT=0 la reenvía desde aquí, p. ej. si el bucket no es accesible
+DOWNLOAD_REDIRECT = os.getenv("DOWNLOAD_REDIRECT", "1").lower() in ("1", "true", "yes")
+
+async def download_stored(filename: str, request: Request):
+    """/download de una salida guardada en S3"""
+    media_type = MIME_TYPES.get(filename.rsplit(".", 1)[-1].lower(), "application/octet-stream")
+    not_found = HTTPException(status_code=404, detail="Archivo no encontrado. El archivo puede haber expirado. Por favor, convierte el archivo nuevamente.")
+    if DOWNLOAD_REDIRECT:
+        if await asyncio.to_thread(output_storage.head, filename) is None:
+            logger.warning(f"Intento de descargar archivo no encontrado: {filename}")
+            raise not_found
+        cache_control = cache_headers(DOWNLOAD_CACHE_MODE, CACHE_FILENAME_RE.match(filename) is not None)["Cache-Control"]
+        url = output_storage.presigned_url(filename, filename, media_type, cache_control)
+        # La URL vence (S3_PRESIGN_SECONDS): la redirección en sí no se guarda en caché
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": "no-store"})
+    
+    byte_range = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if byte_range and if_range:
+        # Reanudar solo si el archivo sigue siendo el mismo; si no, se envía completo
+        stored = await asyncio.to_thread(output_storage.head, filename)
+        if stored is None:
+            raise not_found
+        if stored.etag != if_range.strip():
+            byte_range = None
+    try:
+        result = await asyncio.to_thread(output_storage.read, filename, byte_range)
+    except RangeNotSatisfiable:
+        raise HTTPException(status_code=416, detail="Rango fuera del archivo")
+    if result is None:
+        logger.warning(f"Intento de descargar archivo no encontrado: {filename}")
+        raise not_found
+    headers = {"ETag": result.etag, **cache_headers(DOWNLOAD_CACHE_MODE, CACHE_FILENAME_RE.match(filename) is not None)}
+    if if_none_match(request.headers.get("if-none-match"), result.etag):
+        result.close()
+        return Response(status_code=304, headers=headers)
+    headers.update({
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Content-Length": str(result.size),
+        "Accept-Ranges": "bytes",
+    })
+    if result.content_range:
+        headers["Content-Range"] = result.content_range
+    
+    async def body():
+        try:
+            async for chunk in iter_in_thread(result.chunks):
+                yield chunk
+        finally:
+            result.close()
+    
+    return StreamingResponse(body(), status_code=result.status_code, media_type=media_type, headers=headers)
+
 @app.get("/download/{filename}")
-async def download_file(filename: str):
-    """Descarga el archivo convertido"""
+async def download_file(filename: str, request: Request):
+    """Descarga el archivo convertido.
+    
+    Responde con un ETag fuerte (SHA-256 del contenido): `If-None-Match` retorna 304 y `Range`
+    (con `If-Range` opcional) permite reanudar descargas o bajarlas en partes en paralelo. Con las
+    salidas en S3 redirige a una URL prefirmada (o reenvía el objeto con DOWNLOAD_REDIRECT=0).
+    """
+    if output_storage.remote:
+        return await download_stored(filename, request)
     file_path = OUTPUT_DIR / filename
     
-    if not file_path.exists():
+    try:
+        stat = file_path.stat()
+    except (FileNotFoundError, NotADirectoryError):
         logger.warning(f"Intento de descargar archivo no encontrado: {filename}")
         raise HTTPException(status_code=404, detail="Archivo no encontrado. El archivo puede haber expirado. Por favor, convierte el archivo nuevamente.")
     
     # Verificar que el archivo no esté vacío
-    if file_path.stat().st_size == 0:
+    if stat.st_size == 0:
         logger.error(f"Archivo vacío detectado: {filename}")
         raise HTTPException(status_code=500, detail="El archivo está vacío o corrupto")
     
@@ -950,43 +1834,26 @@ async def download_file(filename: str):
     try:
         # Intentar obtener el tipo MIME correcto
         extension = filename.split('.')[-1].lower()
-        mime_types = {
-            'mp3': 'audio/mpeg',
-            'wav': 'audio/wav',
-            'aac': 'audio/aac',
-            'ogg': 'audio/ogg',
-            'flac': 'audio/flac',
-            'm4a': 'audio/mp4',
-            'wma': 'audio/x-ms-wma',
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'png': 'image/png',
-            'gif': 'image/gif',
-            'webp': 'image/webp',
-            'bmp': 'image/bmp',
-            'ico': 'image/x-icon',
-            'tiff': 'image/tiff',
-            'pdf': 'application/pdf',
-            'txt': 'text/plain',
-            'html': 'text/html',
-            'md': 'text/markdown',
-            'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        }
-        media_type = mime_types.get(extension, 'application/octet-stream')
+        media_type = MIME_TYPES.get(extension, 'application/octet-stream')
     except:
         media_type = 'application/octet-stream'
     
-    logger.info(f"Descargando archivo: {filename} (tamaño: {file_path.stat().st_size} bytes)")
+    etag = await download_etags.get(file_path, stat)
+    headers = {"ETag": etag, **cache_headers(DOWNLOAD_CACHE_MODE, CACHE_FILENAME_RE.match(filename) is not None)}
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    if "range" not in request.headers:
+        logger.info(f"Descargando archivo: {filename} (tamaño: {stat.st_size} bytes)")
     
     return FileResponse(
         file_path,
         media_type=media_type,
         filename=filename,
+        stat_result=stat,
         headers={
             "Content-Disposition": f'attachment; filename="{filename}"',
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0"
+            **headers,
         }
     )
 
@@ -996,10 +1863,10 @@ async def cleanup_file(filename: str):
     upload_file = UPLOAD_DIR / filename
     output_file = OUTPUT_DIR / filename
     
-    if upload_file.exists():
-        upload_file.unlink()
-    if output_file.exists():
-        output_file.unlink()
+    await remove_temp_file(upload_file)
+    await storage_call(output_storage.delete, filename)
+    await shared_store.call(file_index.remove, output_file)
+    await shared_store.call(result_cache.discard, filename)
     
     return {"success": True, "message": "Archivos eliminados"}
 
@@ -1014,6 +1881,13 @@ if __name__ == "__main__":
     print(f"📍 Acceso local:    http://localhost:{port}")
     print(f"🌐 Acceso en red:    http://{local_ip}:{port}")
     print(f"📚 Documentación:    http://localhost:{port}/docs")
+    print(f"⚙️  Workers:          {WEB_CONCURRENCY} (estado: {shared_store.describe()})")
+    print(f"💾 Salidas:          {output_storage.describe()}")
     print("="*60 + "\n")
-    uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
+    if WEB_CONCURRENCY > 1:
+        # Varios procesos: uvicorn necesita importar la app por nombre en cada uno
+        uvicorn.run("main:app", host="0.0.0.0", port=port, log_level="info", workers=WEB_CONCURRENCY,
+                    app_dir=str(Path(__file__).resolve().parent))
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
 
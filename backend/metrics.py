@@ -0,0 +1,181 @@
+"""Métricas en formato de texto de Prometheus sin dependencias externas.
+
+Los contadores e histogramas solo hacen sumas en memoria (el servidor corre en un único event loop),
+así que instrumentar el camino de las conversiones no agrega latencia medible. Todo el trabajo de
+formateo ocurre al consultar /metrics.
+"""
+import bisect
+import time
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+# Buckets por defecto (segundos) pensados para conversiones: desde milisegundos hasta 30 minutos
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        return []
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Contador monótono: inc(cantidad, *valores_de_labels).
+
+    Con `callback` el valor se lee al consultar /metrics (para contadores que ya lleva otro componente).
+    """
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[tuple, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[tuple, float] = {}
+        self.callback = callback
+
+    def inc(self, amount: float = 1, *labels):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        values = self.callback() if self.callback is not None else self.values
+        for labels, value in values.items():
+            yield "", _format_labels(self.labelnames, labels), value
+
+
+class Gauge(Metric):
+    """Valor instantáneo. Con `callback` se calcula al consultar /metrics (retorna {labels: valor})."""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[tuple, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[tuple, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, *labels):
+        self.values[labels] = value
+
+    def samples(self):
+        values = self.callback() if self.callback is not None else self.values
+        for labels, value in values.items():
+            yield "", _format_labels(self.labelnames, labels), value
+
+
+class Histogram(Metric):
+    """Histograma acumulativo con buckets fijos: observe(valor, *valores_de_labels)"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[tuple, list] = {}  # labels -> [conteos por bucket..., suma, total]
+
+    def observe(self, value: float, *labels):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [0] * (len(self.buckets) + 2)
+        # Se guarda el conteo del bucket exacto; los acumulados se calculan al renderizar
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            entry[index] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    def time(self, *labels):
+        """Context manager que observa la duración del bloque"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        for labels, entry in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                yield "_bucket", _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"'), cumulative
+            yield "_bucket", _format_labels(self.labelnames, labels, 'le="+Inf"'), entry[-1]
+            yield "_sum", _format_labels(self.labelnames, labels), entry[-2]
+            yield "_count", _format_labels(self.labelnames, labels), entry[-1]
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que cuenta peticiones y mide su duración por ruta (plantilla, no URL concreta)"""
+
+    def __init__(self, app, requests_total: Counter, request_seconds: Histogram):
+        self.app = app
+        self.requests_total = requests_total
+        self.request_seconds = request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "sin_ruta"
+            self.requests_total.inc(1, scope["method"], path, status[0])
+            self.request_seconds.observe(time.perf_counter() - start, path)
@@ -0,0 +1,292 @@
+"""Conversión de imágenes con varios frames (GIF/WebP animados, TIFF de varias páginas).
+
+Los frames se decodifican de a uno (seek sobre la imagen de origen) y nunca se cargan todos a la vez:
+  - WebP, TIFF y PDF: Pillow los escribe frame por frame a medida que recorre el origen
+  - GIF: Pillow guarda todos los frames antes de escribir, por eso cada frame se cuantiza y codifica
+    como un GIF de una imagen y sus bloques se copian al archivo final con la paleta como tabla local
+  - Formatos de una sola imagen (png, jpg, ...): un ZIP con un archivo por frame
+
+La cuantización y la codificación de GIF y de los frames del ZIP corren en varios hilos (Pillow
+libera el GIL), con una cantidad de frames en vuelo acotada por FRAME_MEMORY_LIMIT_MB.
+"""
+import logging
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from converters import ConversionError, pillow_save_args, prepare_image_mode, scale_image, target_size
+
+logger = logging.getLogger(__name__)
+
+# "auto": conserva la animación si el formato de salida la soporta; "first": solo el primer frame
+# (comportamiento anterior); "all": todos los frames, en un ZIP si el formato es de una sola imagen
+FRAME_MODES = ("auto", "first", "all")
+
+# Formatos de salida que guardan varios frames o páginas en un único archivo
+MULTI_FRAME_FORMATS = ("gif", "webp", "tiff", "pdf")
+
+# Formatos que ya vienen comprimidos: se guardan en el ZIP sin volver a comprimir
+COMPRESSED_FORMATS = ("jpg", "jpeg", "png", "gif", "webp")
+
+# Memoria máxima para frames decodificados por conversión (el frame actual del decodificador,
+# el anterior que guarda GIF para el disposal y los que se están codificando en los hilos)
+FRAME_MEMORY_LIMIT_MB = int(os.getenv("FRAME_MEMORY_LIMIT_MB", 512))
+MAX_FRAMES = int(os.getenv("MAX_FRAMES", 1000))
+FRAME_THREADS = int(os.getenv("FRAME_THREADS", min(4, os.cpu_count() or 1)))
+# Duración de cada frame cuando el origen no la define (p. ej. TIFF → GIF/WebP)
+DEFAULT_FRAME_DURATION_MS = int(os.getenv("DEFAULT_FRAME_DURATION_MS", 100))
+
+# Frames que retiene el decodificador mientras se recorre el origen
+DECODER_FRAMES = 2
+
+
+def output_extension(output_format: str, frames: Optional[str]) -> str:
+    """Extensión del archivo de salida: "zip" cuando se piden todos los frames en un formato de una imagen"""
+    if frames == "all" and output_format not in MULTI_FRAME_FORMATS:
+        return "zip"
+    return output_format
+
+
+def wants_all_frames(img, output_format: str, frames: Optional[str]) -> bool:
+    if frames == "all":
+        return True
+    if frames == "first":
+        return False
+    return getattr(img, "n_frames", 1) > 1 and output_format in MULTI_FRAME_FORMATS
+
+
+def frame_budget(img, extra_frames: int) -> int:
+    """Frames que se pueden tener en vuelo además de los del decodificador sin pasar el límite de memoria"""
+    frame_bytes = img.size[0] * img.size[1] * 4
+    limit = FRAME_MEMORY_LIMIT_MB * 1024 * 1024
+    budget = limit // max(frame_bytes, 1) - DECODER_FRAMES
+    if budget < extra_frames:
+        raise ConversionError(
+            status_code=413,
+            detail=f"La imagen es demasiado grande para convertir sus frames: cada frame ocupa "
+                   f"{frame_bytes / (1024 * 1024):.1f} MB decodificado y el límite por conversión es de "
+                   f"{FRAME_MEMORY_LIMIT_MB} MB"
+        )
+    return budget
+
+
+def frame_concurrency(img):
+    """Hilos de codificación y frames en vuelo: dos por hilo, sin pasar el límite de memoria"""
+    budget = frame_budget(img, extra_frames=1)
+    threads = max(1, min(FRAME_THREADS, budget))
+    return threads, min(budget, threads * 2)
+
+
+def iter_frames(img) -> Iterator[Tuple[int, object]]:
+    """Recorre los frames con seek; el objeto retornado es el mismo y cambia en cada iteración"""
+    for index in range(getattr(img, "n_frames", 1)):
+        img.seek(index)
+        yield index, img
+
+
+def map_in_order(fn: Callable, items: Iterable, threads: int, max_in_flight: int) -> Iterator:
+    """Aplica `fn` en varios hilos y retorna los resultados en orden, con a lo sumo `max_in_flight` pendientes"""
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="frames") as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def frame_copy(img, output_format: str, resize: Optional[dict] = None):
+    """Copia independiente del frame actual, ya en el modo de color y tamaño que necesita la salida"""
+    frame = scale_image(prepare_image_mode(img, output_format), target_size(img.size, resize))
+    return img.copy() if frame is img else frame
+
+
+def scaled_frames(img, output_format: str, resize: dict):
+    """Vista de `img` cuyos frames se escalan al hacer seek, para los writers de Pillow que recorren el origen"""
+    from PIL import Image
+
+    class ScaledFrames(Image.Image):
+        def __init__(self):
+            super().__init__()
+            self.n_frames = getattr(img, "n_frames", 1)
+            self.seek(0)
+
+        def seek(self, frame: int):
+            img.seek(frame)
+            # Toma el estado (píxeles, modo, tamaño) del frame escalado; solo vive un frame a la vez
+            self.__dict__.update(frame_copy(img, output_format, resize).__dict__)
+            self.info = dict(img.info)
+            self._frame = frame
+
+        def tell(self) -> int:
+            return self._frame
+
+    return ScaledFrames()
+
+
+def frame_duration(img) -> int:
+    return int(img.info.get("duration") or DEFAULT_FRAME_DURATION_MS)
+
+
+# --------------------------------------------------------------------
+# Bloques de GIF
+
+def _skip_sub_blocks(data: bytes, pos: int) -> int:
+    """Posición siguiente a una secuencia de sub-bloques (termina en un bloque de tamaño 0)"""
+    while pos < len(data) and data[pos] != 0:
+        pos += data[pos] + 1
+    return pos + 1
+
+
+def _color_table_size(flags: int) -> int:
+    return 3 << ((flags & 7) + 1) if flags & 0x80 else 0
+
+
+def gif_durations(path: Path) -> List[int]:
+    """Duración en ms de cada frame leyendo solo las cabeceras del GIF, sin decodificar imágenes"""
+    data = Path(path).read_bytes()
+    pos = 13 + _color_table_size(data[10])
+    durations: List[int] = []
+    delay = None
+    while pos < len(data):
+        block = data[pos]
+        if block == 0x21:  # extensión
+            if data[pos + 1] == 0xF9 and pos + 6 <= len(data):  # Graphic Control Extension
+                delay = int.from_bytes(data[pos + 4:pos + 6], "little") * 10
+            pos = _skip_sub_blocks(data, pos + 2)
+        elif block == 0x2C:  # imagen: descriptor, tabla local, tamaño de código LZW y datos
+            pos += 10 + _color_table_size(data[pos + 9]) + 1
+            pos = _skip_sub_blocks(data, pos)
+            durations.append(delay if delay is not None else DEFAULT_FRAME_DURATION_MS)
+        else:  # 0x3B (fin) o archivo truncado
+            break
+    return durations
+
+
+def _gif_frame_blocks(single: bytes) -> bytes:
+    """Extrae de un GIF de una imagen su Graphic Control Extension y la imagen con la paleta como tabla local"""
+    flags = single[10]
+    global_table = single[13:13 + _color_table_size(flags)]
+    pos = 13 + len(global_table)
+    blocks = []
+    while pos < len(single):
+        block = single[pos]
+        if block == 0x21:
+            end = _skip_sub_blocks(single, pos + 2)
+            if single[pos + 1] == 0xF9:
+                blocks.append(single[pos:end])
+            pos = end
+        elif block == 0x2C:
+            descriptor = bytearray(single[pos:pos + 10])
+            local_table = _color_table_size(descriptor[9])
+            if not local_table and global_table:
+                descriptor[9] |= 0x80 | (flags & 7)
+                blocks += [bytes(descriptor), global_table]
+            else:
+                blocks.append(bytes(descriptor))
+            data_start = pos + 10
+            end = _skip_sub_blocks(single, data_start + local_table + 1)
+            blocks.append(single[data_start:end])
+            break
+        else:
+            break
+    return b"".join(blocks)
+
+
+def _encode_gif_frame(item: Tuple[object, int]) -> bytes:
+    from PIL import Image
+
+    frame, duration = item
+    transparency = None
+    if frame.mode == "RGBA":
+        alpha = frame.getchannel("A")
+        if alpha.getextrema()[0] < 128:
+            transparency = 255
+            mask = alpha.point(lambda a: 255 if a < 128 else 0)
+        frame = frame.convert("RGB")
+    elif frame.mode != "RGB":
+        frame = frame.convert("RGB")
+    palette = frame.quantize(255 if transparency is not None else 256, method=Image.Quantize.FASTOCTREE)
+    params = {"duration": duration, "disposal": 1}
+    if transparency is not None:
+        # Índice reservado para los píxeles transparentes; cada frame borra el anterior (disposal 2)
+        palette.paste(transparency, mask=mask)
+        params.update(transparency=transparency, disposal=2)
+    palette.info = {}
+    buffer = BytesIO()
+    palette.save(buffer, format="GIF", **params)
+    return _gif_frame_blocks(buffer.getvalue())
+
+
+def write_gif(img, output_path: Path, loop: int = 0, resize: Optional[dict] = None):
+    """Escribe un GIF animado frame por frame"""
+    threads, in_flight = frame_concurrency(img)
+    width, height = target_size(img.size, resize)
+    items = ((frame_copy(frame, "gif", resize), frame_duration(frame)) for _, frame in iter_frames(img))
+    with open(output_path, "wb") as out:
+        # Cabecera sin tabla global (cada frame trae su paleta) y bucle NETSCAPE
+        out.write(b"GIF89a" + width.to_bytes(2, "little") + height.to_bytes(2, "little") + b"\x00\x00\x00")
+        out.write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + int(loop).to_bytes(2, "little") + b"\x00")
+        for blocks in map_in_order(_encode_gif_frame, items, threads, in_flight):
+            out.write(blocks)
+        out.write(b";")
+
+
+# --------------------------------------------------------------------
+# Salidas
+
+def write_zip(img, output_path: Path, output_format: str, resize: Optional[dict] = None,
+              preset: Optional[str] = None):
+    """Un archivo por frame dentro de un ZIP (frame_0001.png, ...)"""
+    threads, in_flight = frame_concurrency(img)
+    pillow_format, save_kwargs = pillow_save_args(output_format, preset)
+
+    def encode(frame) -> bytes:
+        buffer = BytesIO()
+        frame.save(buffer, format=pillow_format, **save_kwargs)
+        return buffer.getvalue()
+
+    compression = zipfile.ZIP_STORED if output_format in COMPRESSED_FORMATS else zipfile.ZIP_DEFLATED
+    frames = (frame_copy(frame, output_format, resize) for _, frame in iter_frames(img))
+    with zipfile.ZipFile(output_path, "w", compression=compression) as archive:
+        for index, data in enumerate(map_in_order(encode, frames, threads, in_flight), start=1):
+            archive.writestr(f"frame_{index:04d}.{output_format}", data)
+
+
+def write_multi_frame(img, input_path: Path, output_path: Path, output_format: str,
+                      resize: Optional[dict] = None, preset: Optional[str] = None):
+    """WebP, TIFF y PDF: Pillow recorre los frames del origen y los escribe de a uno"""
+    frame_budget(img, extra_frames=1)
+    pillow_format, save_kwargs = pillow_save_args(output_format, preset)
+    if output_format == "webp":
+        save_kwargs["loop"] = img.info.get("loop", 0)
+        save_kwargs["duration"] = (gif_durations(input_path) if img.format == "GIF"
+                                   else frame_duration(img))
+    elif output_format == "pdf":
+        save_kwargs["resolution"] = 72.0
+    img.seek(0)
+    source = scaled_frames(img, output_format, resize) if target_size(img.size, resize) != img.size else img
+    source.save(output_path, format=pillow_format, save_all=True, **save_kwargs)
+
+
+def convert_frames(img, input_path: Path, output_path: Path, output_format: str, resize: Optional[dict] = None,
+                   preset: Optional[str] = None):
+    """Convierte todos los frames de `img` (ya abierta) al formato de salida"""
+    frame_count = getattr(img, "n_frames", 1)
+    if frame_count > MAX_FRAMES:
+        raise ConversionError(
+            status_code=413,
+            detail=f"La imagen tiene {frame_count} frames. Máximo permitido: {MAX_FRAMES}"
+        )
+    logger.info(f"Convirtiendo {frame_count} frames de {img.format} {img.size[0]}x{img.size[1]} a {output_format}")
+    if output_format == "gif":
+        write_gif(img, output_path, loop=img.info.get("loop", 0), resize=resize)
+    elif output_format in MULTI_FRAME_FORMATS:
+        write_multi_frame(img, input_path, output_path, output_format, resize, preset)
+    else:
+        write_zip(img, output_path, output_format, resize, preset)
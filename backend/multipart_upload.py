@@ -0,0 +1,233 @@
+"""Recepción de formularios multipart directamente en UPLOAD_DIR, sin pasar por el spool de Starlette.
+
+Starlette parsea el formulario completo (archivos a un SpooledTemporaryFile) antes de ejecutar el
+endpoint: un archivo demasiado grande se rechazaba recién después de recibirlo entero, y cada subida
+se escribía dos veces en disco (spool → UPLOAD_DIR). `streamed_upload_route` es una clase de ruta que
+parsea `request.stream()` a medida que llega: cada archivo se escribe una sola vez en UPLOAD_DIR
+mientras se calcula su SHA-256, y la petición se corta con 413 antes de leer el cuerpo si
+Content-Length ya supera el máximo, o en cuanto un archivo lo supera.
+
+El formulario resultante se deja en `request._form`, así FastAPI lo reutiliza y los endpoints siguen
+recibiendo `UploadFile` (en realidad `ReceivedUpload`) como siempre.
+"""
+import hashlib
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import FormData, Headers, UploadFile
+from starlette.requests import Request
+
+try:
+    import python_multipart as multipart
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import parse_options_header
+
+# Tamaño máximo de un campo de texto y holgura para encabezados y campos del formulario al
+# comparar Content-Length con el máximo de los archivos
+MAX_FIELD_SIZE = 64 * 1024
+MAX_FIELDS = 100
+FORM_OVERHEAD = 1024 * 1024
+
+
+class ReceivedUpload(UploadFile):
+    """Archivo del formulario ya escrito en UPLOAD_DIR, con su SHA-256 y el tiempo que tardó en llegar.
+
+    `move_to` lo adopta en su destino definitivo sin copiarlo; si nadie lo adopta, `close` (que
+    FastAPI llama al terminar la respuesta) lo borra.
+    """
+
+    def __init__(self, path: Path, filename: str, headers: Headers):
+        super().__init__(file=open(path, "w+b"), size=0, filename=filename, headers=headers)
+        self.path = path
+        self.hasher = hashlib.sha256()
+        self.upload_seconds = 0.0
+        self._adopted = False
+
+    @property
+    def sha256(self) -> str:
+        return self.hasher.hexdigest()
+
+    def move_to(self, destination: Path):
+        """Mueve el archivo recibido a `destination` (mismo sistema de archivos: un rename)"""
+        self.file.close()
+        os.replace(self.path, destination)
+        self._adopted = True
+
+    def discard(self):
+        self.file.close()
+        if not self._adopted:
+            self.path.unlink(missing_ok=True)
+
+    async def close(self):
+        self.discard()
+
+
+class _FormReceiver:
+    """Callbacks de python-multipart: escribe cada archivo en disco a medida que llega"""
+
+    def __init__(self, directory: Path, max_file_size: int, max_files: int, charset: str):
+        self.directory = directory
+        self.max_file_size = max_file_size
+        self.max_files = max_files
+        self.charset = charset
+        self.items: List[Tuple[str, Union[str, UploadFile]]] = []
+        self.uploads: List[ReceivedUpload] = []
+        self.pending: List[Tuple[ReceivedUpload, bytes]] = []  # datos de archivos del último bloque leído
+        self.fields = 0
+        self._reset()
+
+    def _reset(self):
+        self.header_name = b""
+        self.header_value = b""
+        self.headers: List[Tuple[bytes, bytes]] = []
+        self.disposition = b""
+        self.name = ""
+        self.data = bytearray()
+        self.upload: Optional[ReceivedUpload] = None
+        self.started = 0.0
+
+    def _decode(self, value: bytes) -> str:
+        try:
+            return value.decode(self.charset)
+        except (UnicodeDecodeError, LookupError):
+            return value.decode("latin-1")
+
+    def on_part_begin(self):
+        self._reset()
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        name = self.header_name.lower()
+        if name == b"content-disposition":
+            self.disposition = self.header_value
+        self.headers.append((name, self.header_value))
+        self.header_name = b""
+        self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.disposition)
+        if b"name" not in options:
+            raise HTTPException(status_code=400, detail="Formulario multipart inválido: parte sin nombre")
+        self.name = self._decode(options[b"name"])
+        if b"filename" in options:
+            if len(self.uploads) >= self.max_files:
+                raise HTTPException(status_code=400, detail=f"Demasiados archivos. Máximo por petición: {self.max_files}")
+            path = self.directory / f"{uuid.uuid4()}.recv"
+            self.upload = ReceivedUpload(path, self._decode(options[b"filename"]), Headers(raw=self.headers))
+            self.uploads.append(self.upload)
+            self.started = time.perf_counter()
+        else:
+            self.fields += 1
+            if self.fields > MAX_FIELDS:
+                raise HTTPException(status_code=400, detail=f"Demasiados campos. Máximo por petición: {MAX_FIELDS}")
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        chunk = data[start:end]
+        if self.upload is None:
+            if len(self.data) + len(chunk) > MAX_FIELD_SIZE:
+                raise HTTPException(status_code=413, detail=f"El campo {self.name} es demasiado grande")
+            self.data.extend(chunk)
+            return
+        # Cortar en cuanto el archivo supera el máximo, sin esperar al resto del cuerpo
+        self.upload.size += len(chunk)
+        if self.upload.size > self.max_file_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"El archivo es demasiado grande. Tamaño máximo permitido: {self.max_file_size / (1024 * 1024):.0f} MB"
+            )
+        self.upload.hasher.update(chunk)
+        self.pending.append((self.upload, chunk))
+
+    def on_part_end(self):
+        if self.upload is None:
+            self.items.append((self.name, self._decode(bytes(self.data))))
+        else:
+            self.upload.upload_seconds = time.perf_counter() - self.started
+            self.items.append((self.name, self.upload))
+
+
+async def receive_form(request: Request, directory: Path, max_file_size: int, max_files: int = 1) -> FormData:
+    """Parsea el cuerpo multipart de `request` escribiendo los archivos en `directory` a medida que llegan.
+
+    Lanza HTTPException 413 si Content-Length o algún archivo supera el máximo y 400 si el formulario
+    es inválido; en ambos casos borra lo que ya se había escrito.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_files * max_file_size + FORM_OVERHEAD:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El archivo es demasiado grande. Tamaño máximo permitido: {max_file_size / (1024 * 1024):.0f} MB"
+        )
+
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Formulario multipart inválido: falta el boundary")
+    charset = params.get(b"charset", b"utf-8")
+    receiver = _FormReceiver(directory, max_file_size, max_files,
+                             charset.decode("latin-1") if isinstance(charset, bytes) else charset)
+    parser = multipart.MultipartParser(boundary, {
+        "on_part_begin": receiver.on_part_begin,
+        "on_part_data": receiver.on_part_data,
+        "on_part_end": receiver.on_part_end,
+        "on_header_field": receiver.on_header_field,
+        "on_header_value": receiver.on_header_value,
+        "on_header_end": receiver.on_header_end,
+        "on_headers_finished": receiver.on_headers_finished,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            # Los callbacks son síncronos: la escritura en disco se hace acá, en el threadpool
+            for upload, data in receiver.pending:
+                await run_in_threadpool(upload.file.write, data)
+            receiver.pending.clear()
+        parser.finalize()
+    except BaseException as e:
+        for upload in receiver.uploads:
+            upload.discard()
+        if isinstance(e, FormParserError):
+            raise HTTPException(status_code=400, detail="Formulario multipart inválido")
+        raise
+    for upload in receiver.uploads:
+        upload.file.seek(0)
+    return FormData(receiver.items)
+
+
+def streamed_upload_route(directory: Path, max_file_size: int, max_files: Optional[Dict[str, int]] = None):
+    """Clase de ruta que recibe los formularios multipart con `receive_form` antes de llamar al endpoint.
+
+    `max_files` da, por path, cuántos archivos acepta cada petición (1 si no figura).
+    """
+    max_files = max_files or {}
+
+    class StreamedUploadRoute(APIRoute):
+        def get_route_handler(self):
+            handler = super().get_route_handler()
+            if self.body_field is None:
+                return handler
+            files_allowed = max_files.get(self.path, 1)
+
+            async def route_handler(request: Request):
+                if request.headers.get("content-type", "").startswith("multipart/form-data"):
+                    request._form = await receive_form(request, directory, max_file_size, files_allowed)
+                return await handler(request)
+
+            return route_handler
+
+    return StreamedUploadRoute
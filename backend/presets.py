@@ -0,0 +1,89 @@
+"""Presets de codificación: velocidad vs tamaño del archivo de salida.
+
+Cada petición puede elegir `preset` ("fast", "balanced" o "small"); si no lo hace se usa
+ENCODING_PRESET del despliegue. "balanced" mantiene los parámetros que se usaban antes de los
+presets, salvo PNG: `optimize=True` (nivel 9 + búsqueda de filtros) pasó a "small" porque tarda
+varias veces más que el nivel 6 para ahorrar pocos bytes (ver benchmarks/bench_presets.py).
+"""
+import logging
+import os
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+ENCODING_PRESETS = ("fast", "balanced", "small")
+
+DEFAULT_ENCODING_PRESET = os.getenv("ENCODING_PRESET", "balanced").lower()
+if DEFAULT_ENCODING_PRESET not in ENCODING_PRESETS:
+    logger.warning(f"ENCODING_PRESET inválido ({DEFAULT_ENCODING_PRESET}), se usa balanced")
+    DEFAULT_ENCODING_PRESET = "balanced"
+
+# Opciones de Image.save por formato de Pillow (los formatos que no aparecen no tienen opciones)
+IMAGE_SAVE_OPTIONS = {
+    "JPEG": {
+        "fast": {"quality": 85},
+        "balanced": {"quality": 95, "optimize": True},
+        "small": {"quality": 80, "optimize": True, "progressive": True},
+    },
+    "PNG": {
+        "fast": {"compress_level": 1},
+        "balanced": {"compress_level": 6},
+        "small": {"optimize": True},
+    },
+    "WEBP": {
+        # method: 0 = más rápido, 6 = más lento y más chico
+        "fast": {"quality": 80, "method": 0},
+        "balanced": {"quality": 90, "method": 4},
+        "small": {"quality": 75, "method": 6},
+    },
+    "TIFF": {
+        "fast": {},
+        "balanced": {},
+        "small": {"compression": "tiff_adobe_deflate"},
+    },
+}
+
+# Argumentos de FFmpeg por formato de audio (después de -codec:a)
+AUDIO_ARGS = {
+    "mp3": {
+        # -q:a activa VBR (0-9, más alto = más chico); compression_level es el algoritmo de LAME (9 = más rápido)
+        "fast": ["-b:a", "192k", "-q:a", "4", "-compression_level", "9"],
+        "balanced": ["-b:a", "192k", "-q:a", "4"],
+        "small": ["-q:a", "6", "-compression_level", "2"],
+    },
+    "aac": {
+        "fast": ["-b:a", "192k", "-profile:a", "aac_low"],
+        "balanced": ["-b:a", "192k", "-profile:a", "aac_low"],
+        "small": ["-b:a", "128k", "-profile:a", "aac_low"],
+    },
+    "ogg": {
+        "fast": ["-q:a", "4"],
+        "balanced": ["-q:a", "4"],
+        "small": ["-q:a", "2"],
+    },
+    "flac": {
+        # Sin pérdida: solo cambia el tiempo de compresión y el tamaño
+        "fast": ["-compression_level", "0"],
+        "balanced": ["-compression_level", "3"],
+        "small": ["-compression_level", "8"],
+    },
+    "wma": {
+        "fast": ["-b:a", "192k"],
+        "balanced": ["-b:a", "192k"],
+        "small": ["-b:a", "128k"],
+    },
+}
+AUDIO_ARGS["m4a"] = AUDIO_ARGS["aac"]
+
+
+def resolve_preset(preset: Optional[str]) -> str:
+    """Preset de la petición o el del despliegue"""
+    return preset if preset in ENCODING_PRESETS else DEFAULT_ENCODING_PRESET
+
+
+def image_save_options(pillow_format: str, preset: Optional[str] = None) -> dict:
+    return dict(IMAGE_SAVE_OPTIONS.get(pillow_format, {}).get(resolve_preset(preset), {}))
+
+
+def audio_args(output_format: str, preset: Optional[str] = None) -> List[str]:
+    return list(AUDIO_ARGS.get(output_format, {}).get(resolve_preset(preset), []))
@@ -0,0 +1,112 @@
+"""Pool de procesos para conversiones CPU intensivas (Pillow, python-docx, PyPDF2, ReportLab)"""
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker(preload: Sequence[str] = ()):
+    """Inicializa el logging en cada proceso del pool e importa las librerías de `preload`"""
+    logging.basicConfig(level=logging.INFO)
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logging.getLogger(__name__).warning(f"No se pudo precargar {module} en el worker: {str(e)}")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class RecyclingProcessPool:
+    """ProcessPoolExecutor que se recrea cada `max_tasks_per_worker * max_workers` tareas.
+
+    Pillow y ReportLab tienden a retener memoria en procesos de larga vida; reciclar los procesos
+    periódicamente la devuelve al sistema. Las tareas en curso del pool anterior terminan con normalidad.
+    Con max_workers=0 las tareas se ejecutan en un hilo (útil para depurar o en entornos sin fork).
+    """
+
+    def __init__(self, max_workers: int, max_tasks_per_worker: int = 50, start_method: Optional[str] = None):
+        self.max_workers = max_workers
+        self.preload: Sequence[str] = ()
+        self.max_tasks_per_worker = max_tasks_per_worker
+        if start_method is None:
+            # forkserver evita heredar hilos del event loop; spawn como alternativa portable (Windows)
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks_in_generation = 0
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            limit = self.max_tasks_per_worker * self.max_workers
+            if self._executor is not None and limit > 0 and self._tasks_in_generation >= limit:
+                logger.info(f"Reciclando pool de procesos tras {self._tasks_in_generation} tareas")
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                if self.preload and self.start_method == "forkserver":
+                    # El forkserver importa las librerías una sola vez y cada worker las hereda al hacer fork
+                    context.set_forkserver_preload(list(self.preload))
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(tuple(self.preload),),
+                )
+                self._tasks_in_generation = 0
+                self.generation += 1
+            self._tasks_in_generation += 1
+            return self._executor
+
+    async def run(self, fn: Callable, *args):
+        """Ejecuta fn(*args) en el pool sin bloquear el event loop"""
+        loop = asyncio.get_running_loop()
+        if self.max_workers <= 0:
+            return await loop.run_in_executor(None, fn, *args)
+        executor = self._get_executor()
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # Un proceso murió (p. ej. sin memoria): descartar el pool para que la próxima tarea cree uno nuevo
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+
+    async def warm_up(self, preload: Sequence[str] = ()) -> int:
+        """Levanta todos los procesos del pool ahora (con `preload` ya importado) en lugar de en la primera tarea.
+
+        Retorna cuántos procesos quedaron listos.
+        """
+        self.preload = tuple(preload)
+        if self.max_workers <= 0:
+            # Sin procesos: las tareas corren en hilos de este mismo proceso
+            for module in self.preload:
+                await asyncio.to_thread(importlib.import_module, module)
+            return 0
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        with self._lock:
+            # Las tareas de calentamiento no cuentan para el reciclaje
+            self._tasks_in_generation -= 1
+        # Cada submit sin workers ociosos crea un proceso nuevo: N pings simultáneos levantan N workers
+        pids = await asyncio.gather(*(loop.run_in_executor(executor, _ping) for _ in range(self.max_workers)))
+        return len(set(pids))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,173 @@
+"""Perfilado de conversiones: tiempos por etapa y muestreo de pilas en el proceso que convierte.
+
+Una conversión perfilada tiene un ConversionProfile activo en `active_profile` (ContextVar). Los
+conversores marcan sus etapas con `with stage("decode"):`, que no hace nada si no hay perfil
+activo. Las tareas del pool se envuelven en `profiled_call`, que dentro del worker activa un
+perfil propio y un hilo que muestrea la pila del hilo que convierte cada PROFILE_INTERVAL_MS; al
+terminar, sus etapas y pilas se suman al perfil del proceso principal.
+
+El muestreo puede armarse con retraso (`sample_after`): así el disparador por lentitud no cuesta
+nada en las conversiones rápidas y solo toma muestras de las que superan el umbral.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_DEPTH = 64
+
+
+class ConversionProfile:
+    """Tiempos por etapa, pilas muestreadas (formato "colapsado") y datos extra de una conversión"""
+
+    def __init__(self, job_id: Optional[str] = None, reason: str = "requested", sample_after: float = 0.0):
+        self.job_id = job_id
+        self.reason = reason
+        self.sample_after = sample_after
+        self.created_at = time.time()
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        # Desglose de la etapa "convert": lo que miden los conversores (decode, encode, ffmpeg...)
+        self.convert_stages: Dict[str, float] = {}
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.details: dict = {}
+        self.total_seconds: Optional[float] = None
+
+    def sampling_delay(self) -> float:
+        """Segundos que faltan para empezar a muestrear (0 si ya se superó `sample_after`)"""
+        return max(0.0, self.sample_after - (time.perf_counter() - self.started))
+
+    def add_stage(self, name: str, seconds: float, convert: bool = False):
+        stages = self.convert_stages if convert else self.stages
+        stages[name] = stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def merge(self, report: dict):
+        """Suma el reporte de `profiled_call` (etapas y pilas de un worker)"""
+        for name, seconds in report.get("stages", {}).items():
+            self.add_stage(name, seconds, convert=True)
+        self.stacks.update(report.get("stacks", {}))
+        self.samples += report.get("samples", 0)
+
+    def collapsed(self) -> str:
+        """Pilas en el formato de flamegraph.pl / speedscope: "raíz;...;hoja cantidad" por línea"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def to_dict(self, top: int = 20) -> dict:
+        return {
+            "job_id": self.job_id,
+            "reason": self.reason,
+            "created_at": self.created_at,
+            "total_seconds": self.total_seconds,
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "convert_stages": {name: round(seconds, 4) for name, seconds in self.convert_stages.items()},
+            "samples": self.samples,
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "top_stacks": [{"stack": stack, "samples": count} for stack, count in self.stacks.most_common(top)],
+            "details": self.details,
+        }
+
+
+active_profile: ContextVar[Optional[ConversionProfile]] = ContextVar("active_profile", default=None)
+
+
+def stage(name: str):
+    """Mide una etapa en el perfil activo (sin perfil activo no hace nada)"""
+    profile = active_profile.get()
+    return profile.stage(name) if profile is not None else nullcontext()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler(threading.Thread):
+    """Hilo que toma la pila de `thread_id` cada `interval` segundos a partir de `delay`"""
+
+    def __init__(self, thread_id: int, interval: float, delay: float = 0.0, root=None):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.delay = delay
+        self.root = root  # code object donde se cortan las pilas (lo de más arriba es del pool)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        if self.delay > 0 and self._stop_event.wait(self.delay):
+            return
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels: List[str] = []
+            while frame is not None and frame.f_code is not self.root and len(labels) < PROFILE_MAX_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def profiled_call(fn: Callable, args: tuple, sample_after: float = 0.0):
+    """Ejecuta fn(*args) con etapas y muestreo activos; retorna (resultado, reporte).
+
+    Se ejecuta dentro del proceso del pool; el reporte es un dict serializable. Si fn falla la
+    excepción se propaga sin reporte.
+    """
+    profile = ConversionProfile()
+    sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000, sample_after,
+                           root=profiled_call.__code__)
+    token = active_profile.set(profile)
+    sampler.start()
+    try:
+        result = fn(*args)
+    finally:
+        sampler.stop()
+        active_profile.reset(token)
+    return result, {"stages": profile.stages, "stacks": dict(sampler.stacks), "samples": sampler.samples}
+
+
+class ProfileStore:
+    """Últimos perfiles guardados, por id de trabajo"""
+
+    def __init__(self, max_entries: int = 100):
+        self.max_entries = max_entries
+        self.profiles: "OrderedDict[str, ConversionProfile]" = OrderedDict()
+
+    def add(self, profile: ConversionProfile):
+        self.profiles[profile.job_id] = profile
+        self.profiles.move_to_end(profile.job_id)
+        while len(self.profiles) > self.max_entries:
+            self.profiles.popitem(last=False)
+
+    def get(self, job_id: str) -> Optional[ConversionProfile]:
+        return self.profiles.get(job_id)
+
+    def summaries(self) -> List[dict]:
+        return [
+            {"job_id": p.job_id, "reason": p.reason, "created_at": p.created_at,
+             "total_seconds": p.total_seconds, "samples": p.samples}
+            for p in reversed(self.profiles.values())
+        ]
@@ -0,0 +1,127 @@
+"""Límite de peticiones de conversión por cliente (token bucket).
+
+Cada cliente tiene un balde de `burst` tokens que se recarga a `per_minute` por minuto; cada
+petición de conversión toma uno (un lote, uno por archivo; una subida reanudable, uno al
+iniciarla). El middleware rechaza con 429 y `Retry-After` antes de leer el cuerpo, así un cliente
+que insiste no consume ancho de banda ni disco. El cliente es su API key, si está entre las
+configuradas (las desconocidas no cuentan, para que no sirvan para saltarse el límite), o su IP:
+la del socket o la del header que agrega un proxy de confianza (p. ej. `Fly-Client-IP` en Fly.io).
+
+Los baldes viven en el store de shared_state.py: en memoria, o en SQLite para que todos los
+workers compartan el mismo límite.
+"""
+import hashlib
+import logging
+import math
+import re
+from typing import Iterable, Mapping, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from shared_state import MemoryStore
+
+logger = logging.getLogger(__name__)
+
+# POST que inician una conversión. Una subida reanudable se cobra una sola vez, al iniciarla
+# (POST /uploads): cada sesión admite un solo /uploads/{id}/complete
+RATE_LIMITED_PATHS = re.compile(r"^/(convert(/batch|/stream)?|jobs|uploads)$")
+
+
+class RateLimiter:
+    """Token bucket por cliente; `per_minute=0` lo desactiva"""
+
+    def __init__(self, per_minute: float, burst: int, api_keys: Iterable[str] = (),
+                 client_ip_header: Optional[str] = None, store: Optional[MemoryStore] = None):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60
+        self.burst = max(1, burst)
+        # Solo se guarda un resumen de la clave, nunca la clave
+        self.api_keys = {key: "key:" + hashlib.sha256(key.encode()).hexdigest()[:16] for key in api_keys}
+        self.client_ip_header = client_ip_header.lower() if client_ip_header else None
+        self.store = store or MemoryStore()
+        self.allowed = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def client_key(self, headers: Mapping[str, str], peer: Optional[str]) -> str:
+        """Identidad del cliente: API key configurada, IP del proxy de confianza o IP del socket"""
+        api_key = headers.get("x-api-key")
+        if api_key and api_key in self.api_keys:
+            return self.api_keys[api_key]
+        if self.client_ip_header:
+            forwarded = headers.get(self.client_ip_header)
+            if forwarded:
+                return "ip:" + forwarded.split(",")[0].strip()
+        return "ip:" + (peer or "desconocido")
+
+    def take(self, client: str, tokens: float = 1) -> Tuple[bool, float, float]:
+        """Toma tokens del balde del cliente; retorna (permitido, restantes, segundos de espera)"""
+        if not self.enabled:
+            return True, float(self.burst), 0.0
+        # Un lote más grande que el balde cuesta el balde completo (si no, nunca pasaría)
+        allowed, remaining, wait = self.store.bucket_take(client, self.rate, self.burst, min(tokens, self.burst))
+        if allowed:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return allowed, remaining, wait
+
+    def headers(self, remaining: float, wait: float = 0) -> dict:
+        headers = {
+            "X-RateLimit-Limit": f"{self.per_minute:g}",
+            "X-RateLimit-Remaining": str(int(remaining)),
+        }
+        if wait > 0:
+            headers["Retry-After"] = str(max(1, math.ceil(wait)))
+        return headers
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "per_minute": self.per_minute,
+            "burst": self.burst,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+def rate_limit_response(limiter: RateLimiter, remaining: float, wait: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"Demasiadas conversiones seguidas. Intenta de nuevo en {max(1, math.ceil(wait))} segundos."},
+        headers=limiter.headers(remaining, wait),
+    )
+
+
+class RateLimitMiddleware:
+    """Middleware ASGI que aplica `limiter` a los POST de conversión antes de leer el cuerpo"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST" or not self.limiter.enabled
+                or not RATE_LIMITED_PATHS.match(scope["path"])):
+            await self.app(scope, receive, send)
+            return
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        client = self.limiter.client_key(headers, (scope.get("client") or (None,))[0])
+        # Con el store SQLite la consulta corre en su hilo (puede esperar el lock de otro worker)
+        allowed, remaining, wait = await self.limiter.store.call(self.limiter.take, client)
+        if not allowed:
+            logger.info(f"Límite de peticiones alcanzado por {client} en {scope['path']}")
+            await rate_limit_response(self.limiter, remaining, wait)(scope, receive, send)
+            return
+        extra = [(name.encode("latin-1"), value.encode("latin-1"))
+                 for name, value in self.limiter.headers(remaining).items()]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + extra
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
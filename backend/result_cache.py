@@ -0,0 +1,131 @@
+"""Caché de resultados de conversión direccionada por contenido, con desalojo LRU acotado en bytes"""
+import hashlib
+import json
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from shared_state import MemoryStore
+from storage import LocalStorage
+
+logger = logging.getLogger(__name__)
+
+# Los archivos de la caché se llaman {clave sha256}.{formato}
+CACHE_FILENAME_RE = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]+)$")
+
+
+class ResultCache:
+    """Reutiliza salidas ya convertidas en `storage` para (hash y extensión de entrada, formato, opciones).
+
+    El índice vive en el store de shared_state.py (en memoria, o en SQLite compartido entre
+    workers) y se reconstruye al arrancar a partir de los nombres de los archivos guardados. Cuando
+    el total supera `max_bytes` se eliminan del almacenamiento las entradas menos usadas
+    recientemente. Con almacenamiento remoto (S3) los métodos hacen peticiones de red: el llamador
+    los ejecuta fuera del event loop.
+    """
+
+    def __init__(self, storage: LocalStorage, max_bytes: int, on_evict: Optional[Callable[[str], None]] = None,
+                 store: Optional[MemoryStore] = None):
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.store = store or MemoryStore()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self.store.cache_totals()[1]
+
+    @staticmethod
+    def make_key(input_sha256: str, input_extension: str, output_format: str, options: Optional[dict] = None) -> str:
+        """Clave de caché: sha256 de (hash del archivo de entrada, su extensión, formato de salida, opciones).
+
+        La extensión elige el lector (p. ej. .html quita las etiquetas y .txt las conserva): los mismos
+        bytes con otra extensión pueden dar otra salida.
+        """
+        material = json.dumps(
+            [input_sha256, input_extension.lower().lstrip("."), output_format, options or {}],
+            sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def load(self):
+        """Reconstruye el índice con las salidas cacheadas que quedaron guardadas (más antiguas primero)"""
+        if not self.enabled:
+            return
+        found = []
+        for entry in self.storage.list():
+            match = CACHE_FILENAME_RE.match(entry.name)
+            if match:
+                found.append((entry.modified or 0, match.group(1), entry.name, entry.size))
+        found.sort()
+        for mtime, key, filename, size in found:
+            self.store.cache_put(key, filename, size, used_at=mtime)
+        self._evict()
+        entries, total = self.store.cache_totals()
+        logger.info(f"Caché de resultados: {entries} entradas ({total} bytes) recuperadas")
+
+    def get(self, key: str) -> Optional[str]:
+        """Retorna el nombre del archivo cacheado o None; cuenta aciertos y fallos"""
+        if not self.enabled:
+            return None
+        filename = self.store.cache_get(key)
+        if filename is not None and not self.storage.exists(filename):
+            # El archivo fue eliminado por fuera de la caché (p. ej. /cleanup)
+            self.store.cache_remove(key, filename)
+            filename = None
+        with self._lock:
+            if filename is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return filename
+
+    def put(self, key: str, source: Path, output_format: str, content_type: Optional[str] = None) -> str:
+        """Guarda `source` con su nombre direccionado por contenido y lo registra; retorna el nombre final"""
+        filename = f"{key}.{output_format}"
+        size = self.storage.save(source, filename, content_type)
+        self.store.cache_put(key, filename, size)
+        self._evict(keep=key)
+        return filename
+
+    def discard(self, filename: str):
+        """Olvida una entrada cuyo archivo fue eliminado por fuera de la caché"""
+        match = CACHE_FILENAME_RE.match(filename)
+        if match:
+            self.store.cache_remove(match.group(1), filename)
+
+    def _evict(self, keep: Optional[str] = None):
+        """Elimina las entradas menos usadas hasta quedar bajo max_bytes.
+
+        La salida recién creada (`keep`) se conserva aunque sola supere el límite.
+        """
+        for filename, _ in self.store.cache_evict(self.max_bytes, keep):
+            with self._lock:
+                self.evictions += 1
+            self.storage.delete(filename)
+            if self.on_evict is not None:
+                self.on_evict(filename)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        entries, total = self.store.cache_totals()
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
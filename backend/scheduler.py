@@ -0,0 +1,223 @@
+"""Reparto justo de la capacidad de conversión entre clientes.
+
+Cada tipo de archivo tiene su cola (`FairQueue`), pero en lugar de atender por orden de llegada
+entrega primero el trabajo con menor tiempo virtual de inicio (start-time fair queuing): cada
+cliente acumula el costo estimado de lo que encoló y un trabajo empieza, en tiempo virtual, cuando
+terminan los anteriores del mismo cliente o ahora si no tiene nada pendiente. Así el que encola 20
+WAV largos no retrasa el JPG de otro cliente: ese entra en la cola detrás de, como mucho, un trabajo
+de cada cliente. El costo acumulado es uno solo para todos los tipos (`FairShare`), por lo que quien
+ocupa el pool de audio también queda detrás en el de imágenes cuando hay otros esperando.
+
+El costo de un trabajo son segundos de conversión estimados a partir de unidades de trabajo
+(`estimate_units`): segundos de audio, megapíxeles por frame y páginas. Los segundos por unidad de
+cada tipo parten de valores conservadores y se ajustan con las duraciones reales (media móvil).
+El estado vive en la memoria de cada worker: cada proceso reparte sus propios conversores.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import wave
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Segundos de conversión por unidad de trabajo (valores iniciales; se ajustan con lo observado)
+DEFAULT_SECONDS_PER_UNIT = {
+    "audio": 0.02,  # por segundo de audio
+    "image": 0.15,  # por megapíxel
+    "document": 0.02,  # por página
+}
+# Costo fijo de cualquier trabajo (procesos, E/S), para que los archivos mínimos no cuesten cero
+JOB_OVERHEAD_SECONDS = 0.05
+# Peso de la última observación en la media móvil de segundos por unidad
+COST_SMOOTHING = 0.2
+
+# Bitrate típico (bits/s) para estimar la duración de un audio comprimido por su tamaño
+TYPICAL_BITRATES = {
+    "mp3": 128_000, "aac": 128_000, "m4a": 128_000, "ogg": 112_000, "opus": 96_000,
+    "wma": 128_000, "flac": 800_000, "wav": 1_411_200, "aiff": 1_411_200,
+}
+# Bytes por página de los documentos que no son PDF
+TEXT_BYTES_PER_PAGE = 3000
+DOCX_BYTES_PER_PAGE = 8000
+
+SCHEDULING_MODES = ("fair", "fifo")
+
+
+def audio_seconds(path: Path) -> float:
+    """Duración exacta de un WAV PCM por su cabecera; el resto por tamaño y bitrate típico"""
+    extension = path.suffix.lstrip(".").lower()
+    if extension == "wav":
+        try:
+            with wave.open(str(path), "rb") as f:
+                return f.getnframes() / float(f.getframerate())
+        except (wave.Error, EOFError, OSError, ZeroDivisionError):
+            pass
+    return path.stat().st_size * 8 / TYPICAL_BITRATES.get(extension, 192_000)
+
+
+def image_megapixels(path: Path) -> float:
+    """Megapíxeles por frame leyendo solo la cabecera de la imagen"""
+    try:
+        from PIL import Image
+        with Image.open(path) as image:
+            frames = getattr(image, "n_frames", 1) or 1
+            return image.width * image.height * frames / 1e6
+    except Exception:
+        # Sin cabecera legible: ~3 bytes por píxel
+        return path.stat().st_size / 3e6
+
+
+def document_pages(path: Path, pages: Optional[str] = None) -> float:
+    """Páginas a convertir: las pedidas de un PDF o una estimación por tamaño"""
+    extension = path.suffix.lstrip(".").lower()
+    if extension == "pdf":
+        try:
+            from converters import pdf_page_numbers
+            return len(pdf_page_numbers(path, pages))
+        except Exception:
+            pass
+    bytes_per_page = DOCX_BYTES_PER_PAGE if extension in ("docx", "odt") else TEXT_BYTES_PER_PAGE
+    return path.stat().st_size / bytes_per_page
+
+
+def estimate_units(file_type: str, path: Path, options: Optional[dict] = None) -> float:
+    """Unidades de trabajo de una conversión (lee solo cabeceras: llamar en un hilo)"""
+    try:
+        if file_type == "audio":
+            return audio_seconds(path)
+        if file_type == "image":
+            return image_megapixels(path)
+        if file_type == "document":
+            return document_pages(path, (options or {}).get("pages"))
+    except OSError:
+        pass
+    return 1.0
+
+
+class FairShare:
+    """Tiempo virtual y costo acumulado por cliente, compartido por las colas de todos los tipos.
+
+    Con `mode="fifo"` los trabajos se atienden por orden de llegada (comportamiento anterior).
+    """
+
+    def __init__(self, mode: str = "fair", seconds_per_unit: Optional[Dict[str, float]] = None):
+        self.mode = mode
+        self.seconds_per_unit = dict(DEFAULT_SECONDS_PER_UNIT)
+        self.seconds_per_unit.update(seconds_per_unit or {})
+        self.virtual_time = 0.0
+        # Tiempo virtual en que terminan los trabajos ya encolados de cada cliente
+        self.finish: Dict[str, float] = {}
+        self._arrivals = itertools.count()
+
+    def estimate(self, file_type: str, units: float) -> float:
+        """Segundos de conversión estimados para `units` unidades de trabajo"""
+        return JOB_OVERHEAD_SECONDS + max(units, 0.0) * self.seconds_per_unit.get(file_type, 1.0)
+
+    def observe(self, file_type: str, units: float, seconds: float):
+        """Ajusta los segundos por unidad del tipo con la duración real de un trabajo"""
+        if units <= 0 or file_type not in self.seconds_per_unit:
+            return
+        sample = max(seconds - JOB_OVERHEAD_SECONDS, 0.0) / units
+        current = self.seconds_per_unit[file_type]
+        self.seconds_per_unit[file_type] = current + COST_SMOOTHING * (sample - current)
+
+    def tag(self, client: str, cost: float) -> float:
+        """Tiempo virtual de inicio de un trabajo nuevo del cliente (menor = antes)"""
+        if self.mode == "fifo":
+            return float(next(self._arrivals))
+        start = max(self.virtual_time, self.finish.get(client, 0.0))
+        self.finish[client] = start + cost
+        return start
+
+    def started(self, tag: float):
+        """Avanza el tiempo virtual al empezar un trabajo y olvida a los clientes ya al día"""
+        if self.mode == "fifo" or tag <= self.virtual_time:
+            return
+        self.virtual_time = tag
+        caught_up = [client for client, finish in self.finish.items() if finish <= tag]
+        for client in caught_up:
+            del self.finish[client]
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "clients_with_backlog": len(self.finish),
+            "seconds_per_unit": {t: round(v, 5) for t, v in self.seconds_per_unit.items()},
+        }
+
+
+class FairQueue:
+    """Cola acotada de un tipo de archivo, ordenada por el tiempo virtual de `FairShare`.
+
+    Además del máximo total (`maxsize`) limita los trabajos en espera de cada cliente
+    (`client_maxsize`, 0 = sin límite) para que nadie pueda llenar la cola de los demás.
+    """
+
+    def __init__(self, share: FairShare, maxsize: int = 0, client_maxsize: int = 0):
+        self.share = share
+        self.maxsize = maxsize
+        self.client_maxsize = client_maxsize
+        self._heap = []
+        self._sequence = itertools.count()
+        self._per_client: Dict[str, int] = {}
+        self._waiters: Set[asyncio.Future] = set()
+
+    def qsize(self) -> int:
+        return len(self._heap)
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= len(self._heap)
+
+    def client_full(self, client: str) -> bool:
+        return 0 < self.client_maxsize <= self._per_client.get(client, 0)
+
+    def client_depth(self, client: str) -> int:
+        return self._per_client.get(client, 0)
+
+    def put_nowait(self, job, client: str, cost: float):
+        """Encola `job`; lanza asyncio.QueueFull si no hay espacio para el cliente"""
+        if self.full() or self.client_full(client):
+            raise asyncio.QueueFull()
+        self._push(job, client, cost)
+
+    async def put(self, job, client: str, cost: float):
+        """Encola `job` esperando a que haya espacio (total y del cliente)"""
+        while self.full() or self.client_full(client):
+            await self._wait()
+        self._push(job, client, cost)
+
+    async def get(self):
+        """Retorna el trabajo con menor tiempo virtual de inicio"""
+        while not self._heap:
+            await self._wait()
+        tag, _, client, job = heapq.heappop(self._heap)
+        remaining = self._per_client[client] - 1
+        if remaining:
+            self._per_client[client] = remaining
+        else:
+            del self._per_client[client]
+        self.share.started(tag)
+        self._wake()
+        return job
+
+    def _push(self, job, client: str, cost: float):
+        heapq.heappush(self._heap, (self.share.tag(client, cost), next(self._sequence), client, job))
+        self._per_client[client] = self._per_client.get(client, 0) + 1
+        self._wake()
+
+    async def _wait(self):
+        # Cualquier cambio despierta a todos y cada uno vuelve a comprobar su condición
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            await waiter
+        finally:
+            self._waiters.discard(waiter)
+
+    def _wake(self):
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
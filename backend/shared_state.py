@@ -0,0 +1,515 @@
+"""Estado compartido entre los procesos del servidor: trabajos, índice de la caché de resultados,
+archivos temporales, sesiones de subida reanudable y baldes del límite de peticiones.
+
+`MemoryStore` (por defecto) guarda todo en la memoria del proceso, como siempre. `SQLiteStore`
+usa un archivo SQLite en modo WAL que comparten todos los workers de uvicorn/gunicorn de la misma
+máquina: un GET /jobs/{id}, un /download o un PUT /uploads/{id} que llega a un worker distinto
+del que recibió la subida encuentra el mismo estado. Se elige con SHARED_STORE ("memory" o
+"sqlite:///ruta/estado.db"). Para repartir entre varias máquinas hace falta un store de red con
+la misma interfaz y un disco compartido para UPLOAD_DIR y OUTPUT_DIR.
+
+Los métodos son síncronos y cada uno es atómico por sí mismo; ninguna transacción queda abierta
+entre llamadas. Con SQLite una escritura puede esperar el lock de otro worker (hasta 30 s), así que
+desde el event loop no se llaman directo sino con `await store.call(fn, ...)`, que las ejecuta en un
+hilo propio del proceso y en orden (`defer` hace lo mismo sin esperar el resultado). En memoria se
+llaman directo: el store y los callbacks que corren en otros hilos (la limpieza) usan locks.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Un archivo fijado por un worker que murió deja de protegerse pasado este tiempo
+PIN_TTL_SECONDS = 3600
+# SQLiteStore poda los trabajos viejos cada tantas escrituras
+JOB_PRUNE_EVERY = 100
+# Los baldes del límite de peticiones que ya se llenaron se olvidan cada tantas consultas
+BUCKET_PRUNE_EVERY = 1000
+
+FileEntry = Tuple[str, int, float]  # (ruta, tamaño, timestamp)
+
+
+def take_tokens(level: float, updated: float, now: float, rate: float, burst: float,
+                tokens: float) -> Tuple[bool, float, float]:
+    """Recarga el balde desde `updated` y toma `tokens` si alcanzan.
+
+    Retorna (permitido, tokens que quedan, segundos hasta que haya `tokens` disponibles).
+    """
+    level = min(burst, level + max(now - updated, 0.0) * rate)
+    if level >= tokens:
+        return True, level - tokens, 0.0
+    return False, level, (tokens - level) / rate
+
+
+class MemoryStore:
+    """Estado en la memoria de este proceso (un solo worker)"""
+
+    shared = False
+
+    def __init__(self):
+        self.jobs: Dict[str, dict] = {}
+        self.cache: "OrderedDict[str, tuple]" = OrderedDict()  # clave -> (nombre de archivo, tamaño)
+        self.cache_bytes = 0
+        self.files: "OrderedDict[str, tuple]" = OrderedDict()  # ruta -> (tamaño, timestamp)
+        self.files_bytes = 0
+        self.pinned = set()
+        self.sessions: Dict[str, dict] = {}
+        self.buckets: Dict[str, Tuple[float, float]] = {}  # cliente -> (tokens, timestamp)
+        self._bucket_calls = 0
+        self._lock = threading.Lock()
+
+    def describe(self) -> str:
+        return "memory"
+
+    async def call(self, fn: Callable, *args, **kwargs):
+        """Ejecuta `fn` (que usa el store) desde el event loop; en memoria no hay esperas: se llama directo"""
+        return fn(*args, **kwargs)
+
+    def defer(self, fn: Callable, *args, **kwargs):
+        """Como `call`, sin esperar el resultado (p. ej. publicar el estado de un trabajo)"""
+        fn(*args, **kwargs)
+
+    async def flush(self):
+        """Espera a que se apliquen las escrituras pendientes de `defer`"""
+
+    # --- Trabajos ---
+
+    def put_job(self, job_id: str, data: dict):
+        self.jobs[job_id] = data
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        return self.jobs.get(job_id)
+
+    def prune_jobs(self, finished_before: float):
+        expired = [job_id for job_id, data in self.jobs.items()
+                   if data.get("finished_at") is not None and data["finished_at"] < finished_before]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    # --- Caché de resultados (LRU) ---
+
+    def cache_get(self, key: str) -> Optional[str]:
+        """Nombre del archivo de la entrada, marcándola como usada recientemente"""
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            self.cache.move_to_end(key)
+            return entry[0]
+
+    def cache_put(self, key: str, filename: str, size: int, used_at: Optional[float] = None):
+        with self._lock:
+            previous = self.cache.pop(key, None)
+            if previous is not None:
+                self.cache_bytes -= previous[1]
+            self.cache[key] = (filename, size)
+            self.cache_bytes += size
+
+    def cache_remove(self, key: str, filename: Optional[str] = None) -> bool:
+        """Olvida la entrada (solo si apunta a `filename`, cuando se indica)"""
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None or (filename is not None and entry[0] != filename):
+                return False
+            del self.cache[key]
+            self.cache_bytes -= entry[1]
+            return True
+
+    def cache_evict(self, max_bytes: int, keep: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Quita las entradas menos usadas hasta quedar bajo `max_bytes`; retorna (archivo, tamaño)"""
+        evicted = []
+        with self._lock:
+            while self.cache_bytes > max_bytes and self.cache:
+                key, (filename, size) = next(iter(self.cache.items()))
+                if key == keep:
+                    break
+                del self.cache[key]
+                self.cache_bytes -= size
+                evicted.append((filename, size))
+        return evicted
+
+    def cache_totals(self) -> Tuple[int, int]:
+        return len(self.cache), self.cache_bytes
+
+    # --- Archivos temporales (del más antiguo al más reciente) ---
+
+    def file_add(self, path: str, size: int, created: float, if_missing: bool = False, pinned: bool = False):
+        with self._lock:
+            previous = self.files.get(path)
+            if previous is not None:
+                if if_missing:
+                    return
+                del self.files[path]
+                self.files_bytes -= previous[0]
+            self.files[path] = (size, created)
+            self.files_bytes += size
+            if pinned:
+                self.pinned.add(path)
+
+    def file_touch(self, path: str, now: float):
+        with self._lock:
+            entry = self.files.pop(path, None)
+            if entry is not None:
+                self.files[path] = (entry[0], now)
+
+    def file_remove(self, path: str) -> Optional[int]:
+        """Quita el archivo del índice; retorna su tamaño o None si no estaba"""
+        with self._lock:
+            entry = self.files.pop(path, None)
+            self.pinned.discard(path)
+            if entry is None:
+                return None
+            self.files_bytes -= entry[0]
+            return entry[0]
+
+    def file_pin(self, path: str):
+        with self._lock:
+            self.pinned.add(path)
+
+    def file_unpin(self, path: str):
+        with self._lock:
+            self.pinned.discard(path)
+
+    def file_bytes(self, prefix: str) -> int:
+        with self._lock:
+            return sum(size for path, (size, _) in self.files.items() if path.startswith(prefix))
+
+    def file_totals(self) -> Tuple[int, int]:
+        return len(self.files), self.files_bytes
+
+    def file_oldest(self) -> List[FileEntry]:
+        """Archivos no fijados, del más antiguo al más reciente"""
+        with self._lock:
+            return [(path, size, created) for path, (size, created) in self.files.items()
+                    if path not in self.pinned]
+
+    # --- Sesiones de subida ---
+
+    def session_put(self, session_id: str, data: dict):
+        with self._lock:
+            self.sessions[session_id] = data
+
+    def session_get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            return self.sessions.get(session_id)
+
+    def session_remove(self, session_id: str):
+        # La limpieza lo llama desde su hilo al borrar un archivo parcial
+        with self._lock:
+            self.sessions.pop(session_id, None)
+
+    def session_list(self) -> List[dict]:
+        with self._lock:
+            return list(self.sessions.values())
+
+    # --- Límite de peticiones (token bucket) ---
+
+    def bucket_take(self, key: str, rate: float, burst: float, tokens: float = 1.0) -> Tuple[bool, float, float]:
+        """Toma `tokens` del balde de `key`, que se recarga `rate` por segundo hasta `burst`.
+
+        Retorna (permitido, tokens que quedan, segundos hasta que alcancen).
+        """
+        now = time.time()
+        with self._lock:
+            level, updated = self.buckets.get(key, (burst, now))
+            allowed, level, wait = take_tokens(level, updated, now, rate, burst, tokens)
+            self.buckets[key] = (level, now)
+            self._bucket_calls += 1
+            if self._bucket_calls >= BUCKET_PRUNE_EVERY:
+                # Un balde que ya se llenó equivale a uno nuevo
+                self._bucket_calls = 0
+                full_since = now - burst / rate
+                for stale in [k for k, (_, t) in self.buckets.items() if t < full_since]:
+                    del self.buckets[stale]
+        return allowed, level, wait
+
+    # --- Tareas de mantenimiento ---
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Con un solo proceso siempre se obtiene"""
+        return True
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_used_at ON cache (used_at);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    pinned_at REAL
+);
+CREATE INDEX IF NOT EXISTS files_created ON files (created);
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteStore(MemoryStore):
+    """Estado en un archivo SQLite compartido por los procesos de la máquina (modo WAL)"""
+
+    shared = True
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid = None
+        self._job_writes = 0
+        self._bucket_calls = 0
+        with self._lock:
+            # executescript confirma por su cuenta (no va dentro de _transaction)
+            self._connection().executescript(SCHEMA)
+
+    def describe(self) -> str:
+        return f"sqlite:///{self.path}"
+
+    def _thread(self) -> ThreadPoolExecutor:
+        # Un solo hilo: las operaciones se serializan igual en `_lock` y así se aplican en orden.
+        # Como la conexión, se crea de nuevo en el proceso hijo tras un fork.
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-store")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    async def call(self, fn: Callable, *args, **kwargs):
+        """Ejecuta `fn` en el hilo del store: esperar el lock de SQLite no frena el event loop"""
+        return await asyncio.get_running_loop().run_in_executor(self._thread(), functools.partial(fn, *args, **kwargs))
+
+    def defer(self, fn: Callable, *args, **kwargs):
+        future = self._thread().submit(fn, *args, **kwargs)
+        future.add_done_callback(_log_deferred_error)
+
+    async def flush(self):
+        # El hilo ejecuta en orden: cuando termina esta llamada vacía ya se aplicó todo lo anterior
+        await self.call(lambda: None)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión por proceso: si gunicorn hace fork después de importar, el hijo abre la suya
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        """Transacción de escritura (BEGIN IMMEDIATE: toma el lock de escritura desde el inicio)"""
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    # --- Trabajos ---
+
+    def put_job(self, job_id: str, data: dict):
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO jobs (id, data, finished_at) VALUES (?, ?, ?)",
+                       (job_id, json.dumps(data), data.get("finished_at")))
+        self._job_writes += 1
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        rows = self._query("SELECT data FROM jobs WHERE id = ?", (job_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def prune_jobs(self, finished_before: float):
+        if self._job_writes < JOB_PRUNE_EVERY:
+            return
+        self._job_writes = 0
+        with self._transaction() as db:
+            db.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (finished_before,))
+
+    # --- Caché de resultados ---
+
+    def cache_get(self, key: str) -> Optional[str]:
+        with self._transaction() as db:
+            row = db.execute("SELECT filename FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE cache SET used_at = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def cache_put(self, key: str, filename: str, size: int, used_at: Optional[float] = None):
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO cache (key, filename, size, used_at) VALUES (?, ?, ?, ?)",
+                       (key, filename, size, used_at if used_at is not None else time.time()))
+
+    def cache_remove(self, key: str, filename: Optional[str] = None) -> bool:
+        with self._transaction() as db:
+            if filename is None:
+                cursor = db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            else:
+                cursor = db.execute("DELETE FROM cache WHERE key = ? AND filename = ?", (key, filename))
+            return cursor.rowcount > 0
+
+    def cache_evict(self, max_bytes: int, keep: Optional[str] = None) -> List[Tuple[str, int]]:
+        evicted = []
+        with self._transaction() as db:
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total <= max_bytes:
+                return evicted
+            for key, filename, size in db.execute("SELECT key, filename, size FROM cache ORDER BY used_at").fetchall():
+                if total <= max_bytes or key == keep:
+                    break
+                db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                total -= size
+                evicted.append((filename, size))
+        return evicted
+
+    def cache_totals(self) -> Tuple[int, int]:
+        return tuple(self._query("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache")[0])
+
+    # --- Archivos temporales ---
+
+    def file_add(self, path: str, size: int, created: float, if_missing: bool = False, pinned: bool = False):
+        verb = "INSERT OR IGNORE" if if_missing else "INSERT OR REPLACE"
+        with self._transaction() as db:
+            if pinned:
+                pinned_at = time.time()
+            else:
+                # REPLACE borra la fila: el pin de un archivo que se renueva (bloque de subida) se conserva
+                row = db.execute("SELECT pinned_at FROM files WHERE path = ?", (path,)).fetchone()
+                pinned_at = row[0] if row else None
+            db.execute(f"{verb} INTO files (path, size, created, pinned_at) VALUES (?, ?, ?, ?)",
+                       (path, size, created, pinned_at))
+
+    def file_touch(self, path: str, now: float):
+        with self._transaction() as db:
+            db.execute("UPDATE files SET created = ? WHERE path = ?", (now, path))
+
+    def file_remove(self, path: str) -> Optional[int]:
+        with self._transaction() as db:
+            row = db.execute("SELECT size FROM files WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                return None
+            db.execute("DELETE FROM files WHERE path = ?", (path,))
+            return row[0]
+
+    def file_pin(self, path: str):
+        with self._transaction() as db:
+            db.execute("UPDATE files SET pinned_at = ? WHERE path = ?", (time.time(), path))
+
+    def file_unpin(self, path: str):
+        with self._transaction() as db:
+            db.execute("UPDATE files SET pinned_at = NULL WHERE path = ?", (path,))
+
+    def file_bytes(self, prefix: str) -> int:
+        # substr en lugar de LIKE: las rutas pueden contener % o _
+        return self._query("SELECT COALESCE(SUM(size), 0) FROM files WHERE substr(path, 1, ?) = ?",
+                           (len(prefix), prefix))[0][0]
+
+    def file_totals(self) -> Tuple[int, int]:
+        return tuple(self._query("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files")[0])
+
+    def file_oldest(self) -> List[FileEntry]:
+        return [tuple(row) for row in self._query(
+            "SELECT path, size, created FROM files WHERE pinned_at IS NULL OR pinned_at < ? ORDER BY created",
+            (time.time() - PIN_TTL_SECONDS,))]
+
+    # --- Sesiones de subida ---
+
+    def session_put(self, session_id: str, data: dict):
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO upload_sessions (id, data) VALUES (?, ?)", (session_id, json.dumps(data)))
+
+    def session_get(self, session_id: str) -> Optional[dict]:
+        rows = self._query("SELECT data FROM upload_sessions WHERE id = ?", (session_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def session_remove(self, session_id: str):
+        with self._transaction() as db:
+            db.execute("DELETE FROM upload_sessions WHERE id = ?", (session_id,))
+
+    def session_list(self) -> List[dict]:
+        return [json.loads(row[0]) for row in self._query("SELECT data FROM upload_sessions")]
+
+    # --- Límite de peticiones ---
+
+    def bucket_take(self, key: str, rate: float, burst: float, tokens: float = 1.0) -> Tuple[bool, float, float]:
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            level, updated = row if row is not None else (burst, now)
+            allowed, level, wait = take_tokens(level, updated, now, rate, burst, tokens)
+            db.execute("INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                       (key, level, now))
+            self._bucket_calls += 1
+            if self._bucket_calls >= BUCKET_PRUNE_EVERY:
+                self._bucket_calls = 0
+                db.execute("DELETE FROM rate_buckets WHERE updated_at < ?", (now - burst / rate,))
+        return allowed, level, wait
+
+    # --- Tareas de mantenimiento ---
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Obtiene o renueva el turno de `owner` para una tarea que debe correr en un solo proceso"""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            db.execute("INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                       (name, owner, now + ttl))
+            return True
+
+
+def _log_deferred_error(future):
+    if future.exception() is not None:
+        logger.error(f"Error en una escritura diferida del estado compartido: {future.exception()}")
+
+
+def open_store(url: str) -> MemoryStore:
+    """Store según SHARED_STORE: "memory" o "sqlite:///ruta/al/archivo.db" (ruta relativa o absoluta)"""
+    if not url or url == "memory":
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        store = SQLiteStore(Path(url[len("sqlite:///"):]))
+        logger.info(f"Estado compartido en {store.path}")
+        return store
+    raise ValueError(f"SHARED_STORE no soportado: {url} (usa 'memory' o 'sqlite:///ruta.db')")
@@ -0,0 +1,93 @@
+"""Secuencia de arranque: fases cronometradas y reporte de tiempos.
+
+En modo "full" el lifespan precarga las librerías de conversión, levanta los procesos del pool y
+detecta FFmpeg antes de aceptar peticiones, así la primera conversión no paga esos costos. En modo
+"minimal" (máquinas que escalan a cero) solo se hace lo imprescindible y el resto queda en segundo
+plano o para la primera petición que lo necesite.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+STARTUP_MODES = ("full", "minimal")
+
+# Librerías que usan los conversores (se importan dentro de las funciones de converters.py)
+DEFAULT_WARMUP_IMPORTS = ("converters", "documents", "multiframe", "pdf_layout", "PIL.Image", "docx", "PyPDF2", "reportlab.pdfgen.canvas")
+
+
+def process_uptime() -> Optional[float]:
+    """Segundos desde que arrancó el proceso (incluye intérprete e imports). Solo Linux."""
+    try:
+        with open("/proc/self/stat") as f:
+            # El campo 22 (starttime) va después del nombre entre paréntesis, que puede tener espacios
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/uptime") as f:
+            system_uptime = float(f.read().split()[0])
+        return system_uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupReport:
+    """Registra la duración de cada fase del arranque"""
+
+    def __init__(self, mode: str, target_seconds: float = 0):
+        self.mode = mode
+        self.target_seconds = target_seconds
+        self.phases: List[dict] = []
+        self.started = time.perf_counter()
+        self.ready_seconds: Optional[float] = None
+        self.process_uptime_at_ready: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str, background: bool = False):
+        """Cronometra un bloque; los errores se registran y se propagan"""
+        start = time.perf_counter()
+        entry = {"name": name, "seconds": None, "background": background, "error": None}
+        self.phases.append(entry)
+        try:
+            yield entry
+        except Exception as e:
+            entry["error"] = str(e)
+            raise
+        finally:
+            entry["seconds"] = round(time.perf_counter() - start, 4)
+
+    def record(self, name: str, seconds: float):
+        """Agrega una fase medida por fuera (p. ej. el import del módulo principal)"""
+        self.phases.append({"name": name, "seconds": round(seconds, 4), "background": False, "error": None})
+
+    def skip(self, name: str, reason: str):
+        self.phases.append({"name": name, "seconds": 0.0, "background": False, "skipped": reason, "error": None})
+
+    def ready(self):
+        """Marca el momento en que el servidor empieza a aceptar peticiones y registra el reporte"""
+        self.ready_seconds = round(time.perf_counter() - self.started, 4)
+        uptime = process_uptime()
+        self.process_uptime_at_ready = round(uptime, 3) if uptime is not None else None
+        timings = ", ".join(f"{p['name']}={p['seconds']}s" for p in self.phases
+                            if not p["background"] and not p.get("skipped"))
+        logger.info(
+            f"Arranque ({self.mode}) listo en {self.ready_seconds}s"
+            + (f", {self.process_uptime_at_ready}s desde el inicio del proceso" if self.process_uptime_at_ready else "")
+            + (f": {timings}" if timings else "")
+        )
+        total = self.process_uptime_at_ready or self.ready_seconds
+        if self.target_seconds and total > self.target_seconds:
+            logger.warning(f"El arranque tardó {total}s, por encima del objetivo de {self.target_seconds}s")
+
+    def to_dict(self) -> dict:
+        total = self.process_uptime_at_ready or self.ready_seconds
+        return {
+            "mode": self.mode,
+            "ready_seconds": self.ready_seconds,
+            "process_uptime_at_ready": self.process_uptime_at_ready,
+            "target_seconds": self.target_seconds or None,
+            "within_target": (total <= self.target_seconds) if self.target_seconds and total is not None else None,
+            "phases": self.phases,
+        }
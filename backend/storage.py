@@ -0,0 +1,246 @@
+"""Almacenamiento de las salidas de conversión: disco local o un bucket compatible con S3.
+
+Los conversores (FFmpeg, Pillow, ReportLab) necesitan rutas locales, así que la entrada y la
+salida en curso siempre se escriben en UPLOAD_DIR y OUTPUT_DIR. Al terminar, la salida se
+publica en el almacenamiento configurado con OUTPUT_STORAGE:
+
+- `local` (por defecto): la salida se queda en OUTPUT_DIR y /download la sirve desde el disco.
+- `s3://bucket/prefijo`: la salida se sube por partes (multipart, leyendo el archivo por bloques)
+  y se borra del disco local. /download redirige a una URL prefirmada, así la descarga va directo
+  del bucket al cliente sin pasar por este proceso. Funciona con AWS S3, MinIO, R2 o Tigris
+  (S3_ENDPOINT_URL); las credenciales se toman como siempre en boto3 (AWS_ACCESS_KEY_ID, ...).
+
+boto3 solo se importa con el backend S3. Todos los métodos son bloqueantes: con `remote` el
+llamador los ejecuta fuera del event loop.
+"""
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RangeNotSatisfiable(Exception):
+    """El rango pedido queda fuera del objeto (HTTP 416)"""
+
+
+@dataclass
+class StoredObject:
+    """Salida guardada: tamaño, ETag (entre comillas) y fecha de modificación"""
+    name: str
+    size: int
+    etag: Optional[str] = None
+    modified: Optional[float] = None
+
+
+@dataclass
+class ObjectRead:
+    """Lectura de un objeto (completo o un rango) para reenviarla al cliente"""
+    status_code: int  # 200 o 206
+    size: int  # bytes de esta respuesta
+    etag: Optional[str]
+    content_range: Optional[str]
+    chunks: Iterator[bytes]
+    close: Callable[[], None]
+
+
+class LocalStorage:
+    """Salidas en un directorio local (comportamiento de siempre)"""
+
+    remote = False
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def describe(self) -> str:
+        return "local"
+
+    def path(self, name: str) -> Path:
+        return self.directory / name
+
+    def save(self, source: Path, name: str, content_type: Optional[str] = None) -> int:
+        """Publica `source` con el nombre `name`; retorna su tamaño"""
+        target = self.path(name)
+        if source != target:
+            os.replace(source, target)
+        return target.stat().st_size
+
+    def exists(self, name: str) -> bool:
+        return self.path(name).exists()
+
+    def head(self, name: str) -> Optional[StoredObject]:
+        try:
+            stat = self.path(name).stat()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return StoredObject(name, stat.st_size, modified=stat.st_mtime)
+
+    def delete(self, name: str):
+        self.path(name).unlink(missing_ok=True)
+
+    def iter_chunks(self, name: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        with open(self.path(name), "rb") as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                yield block
+
+    def list(self) -> Iterator[StoredObject]:
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file():
+                    stat = entry.stat()
+                    yield StoredObject(entry.name, stat.st_size, modified=stat.st_mtime)
+
+
+class S3Storage:
+    """Salidas en un bucket S3 (o compatible) bajo `prefix`"""
+
+    remote = True
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None, part_size: int = 8 * 1024 * 1024, max_concurrency: int = 4,
+                 presign_seconds: int = 3600):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise RuntimeError("OUTPUT_STORAGE=s3 requiere boto3 (pip install boto3)")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.endpoint_url = endpoint_url
+        self.presign_seconds = presign_seconds
+        self._client_error = ClientError
+        # MinIO y la mayoría de los compatibles esperan el bucket en la ruta, no en el subdominio
+        config = Config(
+            signature_version="s3v4",
+            s3={"addressing_style": "path"} if endpoint_url else {},
+            max_pool_connections=max(10, max_concurrency * 2),
+            retries={"max_attempts": 3, "mode": "standard"},
+        )
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region, config=config)
+        # upload_file lee el archivo por partes de `part_size` y sube `max_concurrency` a la vez
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=max_concurrency,
+            use_threads=max_concurrency > 1,
+        )
+
+    def describe(self) -> str:
+        endpoint = f" ({self.endpoint_url})" if self.endpoint_url else ""
+        return f"s3://{self.bucket}/{self.prefix}{endpoint}"
+
+    def key(self, name: str) -> str:
+        return self.prefix + name
+
+    def _missing(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def save(self, source: Path, name: str, content_type: Optional[str] = None) -> int:
+        """Sube `source` (multipart por encima de `part_size`) y lo borra del disco; retorna su tamaño"""
+        size = source.stat().st_size
+        extra = {"ContentType": content_type} if content_type else None
+        start = time.perf_counter()
+        self.client.upload_file(str(source), self.bucket, self.key(name), ExtraArgs=extra,
+                                Config=self.transfer_config)
+        source.unlink(missing_ok=True)
+        logger.info(f"Salida subida a {self.bucket}/{self.key(name)}: {size} bytes en {time.perf_counter() - start:.2f}s")
+        return size
+
+    def exists(self, name: str) -> bool:
+        return self.head(name) is not None
+
+    def head(self, name: str) -> Optional[StoredObject]:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+        except self._client_error as e:
+            if self._missing(e):
+                return None
+            raise
+        return StoredObject(name, response["ContentLength"], etag=response.get("ETag"),
+                            modified=response["LastModified"].timestamp())
+
+    def delete(self, name: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(name))
+
+    def read(self, name: str, byte_range: Optional[str] = None, chunk_size: int = 64 * 1024) -> Optional[ObjectRead]:
+        """Abre el objeto (o el rango `bytes=...` pedido); None si no existe"""
+        params = {"Bucket": self.bucket, "Key": self.key(name)}
+        if byte_range:
+            params["Range"] = byte_range
+        try:
+            response = self.client.get_object(**params)
+        except self._client_error as e:
+            if self._missing(e):
+                return None
+            if e.response.get("Error", {}).get("Code") == "InvalidRange":
+                raise RangeNotSatisfiable(byte_range)
+            raise
+        content_range = response.get("ContentRange")
+        return ObjectRead(
+            status_code=206 if content_range else 200,
+            size=response["ContentLength"],
+            etag=response.get("ETag"),
+            content_range=content_range,
+            chunks=response["Body"].iter_chunks(chunk_size),
+            close=response["Body"].close,
+        )
+
+    def iter_chunks(self, name: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        result = self.read(name, chunk_size=chunk_size)
+        if result is None:
+            raise FileNotFoundError(name)
+        return result.chunks
+
+    def presigned_url(self, name: str, filename: str, media_type: str, cache_control: Optional[str] = None) -> str:
+        """URL temporal de descarga directa desde el bucket, con los headers que debe llevar la respuesta"""
+        params = {
+            "Bucket": self.bucket,
+            "Key": self.key(name),
+            "ResponseContentDisposition": f'attachment; filename="{filename}"',
+            "ResponseContentType": media_type,
+        }
+        if cache_control:
+            params["ResponseCacheControl"] = cache_control
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=self.presign_seconds)
+
+    def list(self) -> Iterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                name = item["Key"][len(self.prefix):]
+                if name and "/" not in name:
+                    yield StoredObject(name, item["Size"], etag=item.get("ETag"),
+                                       modified=item["LastModified"].timestamp())
+
+
+def parse_s3_url(url: str) -> Tuple[str, str]:
+    """("bucket", "prefijo") de "s3://bucket/prefijo" """
+    bucket, _, prefix = url[len("s3://"):].partition("/")
+    if not bucket:
+        raise ValueError(f"OUTPUT_STORAGE inválido: {url} (usa 's3://bucket/prefijo')")
+    return bucket, prefix
+
+
+def open_storage(url: str, directory: Path):
+    """Almacenamiento según OUTPUT_STORAGE: "local" o "s3://bucket/prefijo" (ver S3_* en el README)"""
+    if not url or url == "local":
+        return LocalStorage(directory)
+    if url.startswith("s3://"):
+        bucket, prefix = parse_s3_url(url)
+        storage = S3Storage(
+            bucket,
+            prefix,
+            endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+            region=os.getenv("S3_REGION") or None,
+            part_size=int(float(os.getenv("S3_PART_SIZE_MB", 8)) * 1024 * 1024),
+            max_concurrency=int(os.getenv("S3_MAX_CONCURRENCY", 4)),
+            presign_seconds=int(os.getenv("S3_PRESIGN_SECONDS", 3600)),
+        )
+        logger.info(f"Salidas en {storage.describe()}")
+        return storage
+    raise ValueError(f"OUTPUT_STORAGE no soportado: {url} (usa 'local' o 's3://bucket/prefijo')")
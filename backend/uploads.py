@@ -0,0 +1,312 @@
+"""Subidas reanudables por bloques: iniciar → PUT de bloques con offset → completar → convertir.
+
+Cada sesión escribe directamente en un archivo `{id}.part` de UPLOAD_DIR: los bloques se agregan al
+final a medida que llegan del socket y nunca se cargan completos en memoria. Cada bloque trae su
+SHA-256; si no coincide, el archivo se trunca al último offset confirmado y el cliente reenvía solo
+ese bloque. Las sesiones abandonadas las elimina el janitor como cualquier archivo temporal
+(el archivo parcial se renueva en el índice con cada bloque recibido).
+
+El estado de cada sesión (offset confirmado, tamaño, hash declarado) vive en el store de
+shared_state.py, así un bloque puede llegar a cualquier worker. Mientras se escribe un bloque el
+archivo parcial queda bloqueado con flock, y un worker que retoma una sesión avanzada por otro
+recalcula el SHA-256 acumulado leyendo lo ya confirmado. Completar una sesión toma el mismo flock
+y deja registrado el id del trabajo en el store: un segundo POST .../complete (en cualquier worker)
+recibe ese trabajo en lugar de encolar otro.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import aiofiles
+
+from shared_state import MemoryStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos (un solo worker)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class UploadSessionError(Exception):
+    """Error de una sesión de subida con código HTTP, mensaje y el offset confirmado (si aplica)"""
+
+    def __init__(self, status_code: int, detail: str, offset: Optional[int] = None):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.offset = offset
+
+    def __str__(self):
+        return self.detail
+
+
+@dataclass
+class UploadSession:
+    """Estado de una subida reanudable"""
+    id: str
+    filename: str
+    size: int
+    path: Path
+    sha256: Optional[str] = None  # hash del archivo completo declarado al iniciar (opcional)
+    offset: int = 0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    # None si otro worker avanzó la sesión: se recalcula antes del próximo bloque o al completar
+    hasher: Optional["hashlib._Hash"] = field(default_factory=hashlib.sha256)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def complete(self) -> bool:
+        return self.offset == self.size
+
+    def to_dict(self) -> dict:
+        return {
+            "upload_id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "offset": self.offset,
+            "complete": self.complete,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    def state(self) -> dict:
+        """Lo que se guarda en el store compartido"""
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "sha256": self.sha256,
+            "offset": self.offset,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class UploadSessionStore:
+    """Sesiones de subida; su estado vive en `store` y los datos en `directory`"""
+
+    def __init__(self, directory: Path, max_chunk_size: int, store: Optional[MemoryStore] = None,
+                 completed_retention: float = 3600):
+        self.directory = directory
+        self.max_chunk_size = max_chunk_size
+        self.store = store or MemoryStore()
+        # Segundos que se recuerda el trabajo de una sesión completada (para repetir POST .../complete)
+        self.completed_retention = completed_retention
+        # Sesiones usadas por este proceso (con su lock y el hash acumulado). La limpieza las olvida
+        # desde su hilo (`discard_path`), así que el diccionario se toca siempre con `_lock`
+        self.sessions: Dict[str, UploadSession] = {}
+        self._lock = threading.Lock()
+
+    async def create(self, filename: str, size: int, sha256: Optional[str] = None) -> UploadSession:
+        upload_id = uuid.uuid4().hex
+        path = self.directory / f"{upload_id}.part"
+        path.touch()
+        session = UploadSession(id=upload_id, filename=filename, size=size, path=path,
+                                sha256=sha256.lower() if sha256 else None)
+        with self._lock:
+            self.sessions[upload_id] = session
+        await self.store.call(self.store.session_put, upload_id, session.state())
+        await self.store.call(self._prune_completed)
+        return session
+
+    def _prune_completed(self):
+        """Olvida las sesiones completadas hace más de `completed_retention` segundos"""
+        cutoff = time.time() - self.completed_retention
+        for state in self.store.session_list():
+            if state.get("job_id") and state["completed_at"] < cutoff:
+                self.store.session_remove(state["id"])
+
+    async def completed_job(self, upload_id: str) -> Optional[str]:
+        """Id del trabajo de una sesión ya completada (None si sigue abierta o no existe)"""
+        state = await self.store.call(self.store.session_get, upload_id)
+        return state.get("job_id") if state else None
+
+    async def get(self, upload_id: str) -> UploadSession:
+        state = await self.store.call(self.store.session_get, upload_id)
+        with self._lock:
+            if state is None or not (self.directory / f"{upload_id}.part").exists():
+                self.sessions.pop(upload_id, None)
+                raise UploadSessionError(
+                    status_code=404,
+                    detail="Sesión de subida no encontrada. Puede haber expirado: inicia la subida nuevamente."
+                )
+            session = self.sessions.get(upload_id)
+            if session is None:
+                session = UploadSession(id=upload_id, filename=state["filename"], size=state["size"],
+                                        path=self.directory / f"{upload_id}.part", sha256=state["sha256"],
+                                        created_at=state["created_at"], hasher=None)
+                self.sessions[upload_id] = session
+        self._sync(session, state)
+        return session
+
+    def _sync(self, session: UploadSession, state: dict):
+        """Toma el offset confirmado del store (otro worker pudo haber recibido bloques)"""
+        if state["offset"] != session.offset:
+            session.offset = state["offset"]
+            session.hasher = None
+        session.updated_at = state["updated_at"]
+
+    def remove(self, upload_id: str) -> Optional[UploadSession]:
+        """Olvida la sesión (síncrono: desde el event loop, con `store.call`)"""
+        self.store.session_remove(upload_id)
+        with self._lock:
+            return self.sessions.pop(upload_id, None)
+
+    def discard_path(self, path: Path):
+        """Olvida la sesión cuyo archivo parcial se eliminó (la limpieza lo llama desde su hilo)"""
+        if path.suffix == ".part":
+            self.remove(path.stem)
+
+    async def _ensure_hasher(self, session: UploadSession):
+        """Recalcula el SHA-256 de lo confirmado si la sesión se retomó de otro worker"""
+        if session.hasher is not None:
+            return
+
+        def hash_prefix():
+            hasher = hashlib.sha256()
+            remaining = session.offset
+            with open(session.path, "rb") as f:
+                while remaining > 0:
+                    block = f.read(min(remaining, 1024 * 1024))
+                    if not block:
+                        break
+                    hasher.update(block)
+                    remaining -= len(block)
+            return hasher
+
+        session.hasher = await asyncio.to_thread(hash_prefix)
+
+    async def _lock_file(self, f):
+        """flock exclusivo del archivo parcial (sin bloquear el event loop)"""
+        if fcntl is None:
+            return
+        while True:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                await asyncio.sleep(0.05)
+
+    async def append(self, session: UploadSession, offset: int, checksum: str,
+                     chunks: AsyncIterator[bytes]) -> int:
+        """Agrega un bloque en `offset` verificando su SHA-256; retorna el nuevo offset confirmado"""
+        async with session.lock:
+            async with aiofiles.open(session.path, "r+b") as f:
+                # Se libera al cerrar el archivo
+                await self._lock_file(f)
+                state = await self.store.call(self.store.session_get, session.id)
+                if state is None:
+                    raise UploadSessionError(status_code=404, detail="La sesión de subida ya no existe")
+                self._sync(session, state)
+                if offset != session.offset:
+                    raise UploadSessionError(
+                        status_code=409,
+                        detail=f"Offset incorrecto: el servidor tiene {session.offset} bytes confirmados",
+                        offset=session.offset
+                    )
+                await self._ensure_hasher(session)
+                chunk_hasher = hashlib.sha256()
+                file_hasher = session.hasher.copy()
+                written = 0
+                await f.seek(offset)
+                try:
+                    async for data in chunks:
+                        written += len(data)
+                        if written > self.max_chunk_size or offset + written > session.size:
+                            raise UploadSessionError(
+                                status_code=413,
+                                detail=f"El bloque supera el máximo de {self.max_chunk_size // (1024 * 1024)} MB "
+                                       f"o el tamaño declarado del archivo ({session.size} bytes)",
+                                offset=session.offset
+                            )
+                        chunk_hasher.update(data)
+                        file_hasher.update(data)
+                        await f.write(data)
+                    if chunk_hasher.hexdigest() != checksum.lower():
+                        raise UploadSessionError(
+                            status_code=422,
+                            detail="El checksum del bloque no coincide; reenvía el bloque desde el offset confirmado",
+                            offset=session.offset
+                        )
+                    await f.flush()
+                except BaseException:
+                    # Descartar lo escrito de este bloque (incluye desconexiones del cliente)
+                    await f.truncate(session.offset)
+                    raise
+                session.offset = offset + written
+                session.hasher = file_hasher
+                session.updated_at = time.time()
+                await self.store.call(self.store.session_put, session.id, session.state())
+            return session.offset
+
+    async def verify(self, session: UploadSession) -> str:
+        """Comprueba que la subida esté completa (y su hash, si se declaró); retorna el SHA-256 del archivo"""
+        if not session.complete:
+            raise UploadSessionError(
+                status_code=409,
+                detail=f"La subida está incompleta: {session.offset} de {session.size} bytes",
+                offset=session.offset
+            )
+        await self._ensure_hasher(session)
+        digest = session.hasher.hexdigest()
+        if session.sha256 and session.sha256 != digest:
+            raise UploadSessionError(
+                status_code=422,
+                detail="El SHA-256 del archivo completo no coincide con el declarado al iniciar la subida",
+                offset=session.offset
+            )
+        return digest
+
+    async def complete(self, session: UploadSession, start_job: Callable[[str], Awaitable[str]]) -> str:
+        """Completa la sesión una sola vez aunque lleguen varios POST .../complete a distintos workers.
+
+        Con el archivo parcial bloqueado (el mismo flock que `append`) verifica la subida y llama a
+        `start_job(digest)`, que enlaza el archivo a su nombre definitivo, encola la conversión y
+        retorna el id del trabajo. Ese id queda en el store antes de borrar el archivo parcial: un
+        pedido que esperaba el lock, o que llega después, recibe el mismo trabajo sin encolar otro.
+        Si `start_job` falla la sesión queda intacta y se puede reintentar.
+        """
+        async with session.lock:
+            try:
+                f = await aiofiles.open(session.path, "rb")
+            except FileNotFoundError:
+                job_id = await self.completed_job(session.id)
+                if job_id is None:
+                    raise UploadSessionError(status_code=404, detail="La sesión de subida ya no existe")
+                return job_id
+            try:
+                # Se libera al cerrar el archivo
+                await self._lock_file(f)
+                state = await self.store.call(self.store.session_get, session.id)
+                if state is None:
+                    raise UploadSessionError(status_code=404, detail="La sesión de subida ya no existe")
+                if state.get("job_id"):
+                    return state["job_id"]
+                self._sync(session, state)
+                digest = await self.verify(session)
+                job_id = await start_job(digest)
+                state = session.state()
+                state.update(job_id=job_id, completed_at=time.time())
+                await self.store.call(self.store.session_put, session.id, state)
+                with self._lock:
+                    self.sessions.pop(session.id, None)
+                session.path.unlink(missing_ok=True)
+            finally:
+                await f.close()
+            return job_id
+
+    def stats(self) -> dict:
+        sessions = [s for s in self.store.session_list() if not s.get("job_id")]
+        return {
+            "sessions": len(sessions),
+            "bytes_pending": sum(s["size"] - s["offset"] for s in sessions),
+        }
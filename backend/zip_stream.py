@@ -0,0 +1,97 @@
+"""Construcción incremental de archivos ZIP para respuestas en streaming"""
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator
+
+# Formatos de salida que ya están comprimidos: guardarlos sin deflate ahorra CPU sin perder tamaño
+COMPRESSED_FORMATS = {"mp3", "aac", "ogg", "flac", "m4a", "wma", "jpg", "jpeg", "png", "webp", "gif", "docx", "pdf"}
+
+
+class _Buffer:
+    """Destino de escritura no seekable: zipfile usa data descriptors y nunca vuelve atrás"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        if data:
+            self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ZipStreamWriter:
+    """Genera un ZIP por partes: cada método retorna los bytes listos para enviar al cliente.
+
+    Solo se mantiene en memoria el bloque que se está escribiendo, nunca el archivo completo.
+    """
+
+    def __init__(self, chunk_size: int = 64 * 1024):
+        self.chunk_size = chunk_size
+        self._buffer = _Buffer()
+        self._zip = zipfile.ZipFile(self._buffer, mode="w", allowZip64=True)
+        self._names = set()
+        self._entry = None
+
+    def unique_name(self, name: str) -> str:
+        """Evita nombres repetidos dentro del ZIP agregando un sufijo (_2, _3, ...)"""
+        candidate = name
+        stem, dot, ext = name.rpartition(".")
+        if not dot:
+            stem, ext = name, ""
+        counter = 2
+        while candidate in self._names:
+            candidate = f"{stem}_{counter}.{ext}" if dot else f"{stem}_{counter}"
+            counter += 1
+        self._names.add(candidate)
+        return candidate
+
+    def add_file(self, name: str, path: Path) -> Iterator[bytes]:
+        """Agrega un archivo del disco leyéndolo por bloques"""
+        with open(path, "rb") as source:
+            yield from self.add_stream(name, iter(lambda: source.read(self.chunk_size), b""))
+
+    def add_stream(self, name: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Agrega un archivo cuyo contenido llega por bloques (p. ej. leído de S3)"""
+        self.begin_file(name)
+        for chunk in chunks:
+            data = self.write(chunk)
+            if data:
+                yield data
+        data = self.end_file()
+        if data:
+            yield data
+
+    def begin_file(self, name: str) -> bytes:
+        """Abre una entrada nueva; su contenido se pasa con write() y se cierra con end_file()"""
+        extension = name.rsplit(".", 1)[-1].lower()
+        info = zipfile.ZipInfo(name)
+        info.compress_type = zipfile.ZIP_STORED if extension in COMPRESSED_FORMATS else zipfile.ZIP_DEFLATED
+        self._entry = self._zip.open(info, mode="w", force_zip64=True)
+        return self._buffer.drain()
+
+    def write(self, chunk: bytes) -> bytes:
+        self._entry.write(chunk)
+        return self._buffer.drain()
+
+    def end_file(self) -> bytes:
+        self._entry.close()
+        self._entry = None
+        return self._buffer.drain()
+
+    def add_bytes(self, name: str, content: bytes) -> bytes:
+        """Agrega un archivo pequeño generado en memoria (p. ej. mensajes de error)"""
+        self._zip.writestr(name, content, compress_type=zipfile.ZIP_DEFLATED)
+        return self._buffer.drain()
+
+    def close(self) -> bytes:
+        """Escribe el directorio central y retorna los últimos bytes"""
+        self._zip.close()
+        return self._buffer.drain()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: detección de codificación en una pasada (charsets.py) vs el bucle de reintentos anterior.
+
+El bucle anterior abría el archivo con 'utf-8', 'latin-1', 'cp1252'... y lo leía completo con cada
+codificación hasta que una no fallaba: un archivo que no es UTF-8 se leía dos veces y, como Latin-1
+nunca falla, los cp1252 (comillas “”, €, guiones largos) quedaban mal decodificados. Para archivos
+de --size-mb en UTF-8, UTF-8 con BOM, UTF-16, cp1252, Latin-1 y uno ASCII con un único carácter
+cp1252 al final, mide con cada método el tiempo, los bytes leídos (rchar de /proc/self/io) y si el
+texto decodificado coincide con el original. La memoria de la tubería completa la mide
+bench_documents.py.
+
+Termina con código 1 si charsets.py decodifica mal algún archivo o lee más bytes que el tamaño del archivo.
+
+Uso:
+    python benchmarks/bench_charsets.py --size-mb 20
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import BACKEND_DIR
+from fixtures import paragraphs
+
+sys.path.insert(0, str(BACKEND_DIR))
+from charsets import iter_decoded  # noqa: E402
+
+LEGACY_ENCODINGS = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1', 'windows-1252']
+# Texto con los caracteres que separan cp1252 de Latin-1
+CP1252_LINE = "Dijo “hola” – cuesta 5 € … ‘¿seguro?’ — sí. "
+
+
+def legacy_decode(path: Path) -> str:
+    """Copia del bucle de convert_document_sync anterior a charsets.py (referencia del benchmark)"""
+    for encoding in LEGACY_ENCODINGS:
+        try:
+            with open(path, 'r', encoding=encoding, newline='') as f:
+                return f.read()
+        except (UnicodeDecodeError, UnicodeError):
+            continue
+    raise ValueError("ninguna codificación sirvió")
+
+
+def streaming_decode(path: Path) -> str:
+    return "".join(iter_decoded(path))
+
+
+def bytes_read() -> int:
+    with open("/proc/self/io") as f:
+        for line in f:
+            if line.startswith("rchar:"):
+                return int(line.split()[1])
+    return 0
+
+
+def make_text(size_mb: float, extra: str = "") -> str:
+    target = int(size_mb * 1024 * 1024)
+    parts, size = [], 0
+    for paragraph in paragraphs(10 ** 9):
+        parts.append(paragraph + extra + "\n\n")
+        size += len(parts[-1])
+        if size >= target:
+            return "".join(parts)
+
+
+def make_inputs(directory: Path, size_mb: float) -> dict:
+    """nombre -> (archivo, texto original)"""
+    text = make_text(size_mb)
+    typographic = make_text(size_mb, " " + CP1252_LINE)
+    ascii_text = make_text(size_mb).encode("ascii", "ignore").decode() + CP1252_LINE.strip()[:8]
+    cases = {
+        "utf-8": (typographic, "utf-8"),
+        "utf-8-bom": (typographic, "utf-8-sig"),
+        "utf-16": (typographic, "utf-16"),
+        "cp1252": (typographic, "cp1252"),
+        "latin-1": (text, "latin-1"),
+        "ascii+cp1252-al-final": (ascii_text, "cp1252"),
+    }
+    inputs = {}
+    for name, (content, encoding) in cases.items():
+        path = directory / f"{name}.txt"
+        path.write_bytes(content.encode(encoding))
+        inputs[name] = (path, content)
+    return inputs
+
+
+def measure(fn, path: Path, expected: str) -> dict:
+    read_before = bytes_read()
+    start = time.perf_counter()
+    text = fn(path)
+    seconds = time.perf_counter() - start
+    size = path.stat().st_size
+    return {
+        "seconds": round(seconds, 3),
+        "read_ratio": round((bytes_read() - read_before) / size, 2),
+        "correct": text == expected,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=20)
+    args = parser.parse_args()
+
+    report = {"size_mb": args.size_mb, "results": {}}
+    failed = []
+    with tempfile.TemporaryDirectory(prefix="bench_charsets_") as tmp:
+        for name, (path, content) in make_inputs(Path(tmp), args.size_mb).items():
+            legacy = measure(legacy_decode, path, content)
+            streaming = measure(streaming_decode, path, content)
+            report["results"][name] = {"legacy": legacy, "charsets": streaming}
+            if not streaming["correct"] or streaming["read_ratio"] > 1.01:
+                failed.append(name)
+
+    report["failed"] = failed
+    report["ok"] = not failed
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
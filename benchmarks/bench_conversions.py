@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: latencia, throughput y pico de memoria de cada par entrada→salida de /formats.
+
+Genera fixtures sintéticos (ver fixtures.py) y mide cada conversión de dos formas:
+  - in_process: llama directamente a convert_media / convert_image / convert_document de main.py
+    (con PROCESS_POOL_WORKERS=0 para que Pillow y los documentos corran en este mismo proceso)
+  - end_to_end: sube el archivo a POST /convert de un servidor uvicorn real (caché desactivada)
+
+El reporte JSON se puede guardar por commit y comparar con --baseline para detectar regresiones
+(p50 o pico de memoria que empeoran más que --threshold). El pico de memoria en in_process no incluye
+a FFmpeg, que corre como proceso aparte; en end_to_end incluye al servidor y a los workers del pool.
+
+Uso:
+    python benchmarks/bench_conversions.py --size small --repeat 3 --output reporte.json
+    python benchmarks/bench_conversions.py --only image --baseline reporte.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import BACKEND_DIR, ROOT_DIR, multipart_upload, percentile, peak_rss_mb, process_tree, request, \
+    reset_peak_rss, run_server, tree_peak_rss_mb
+from fixtures import FixtureSet
+
+
+def conversion_pairs(formats: dict, only: str = None):
+    """Pares (tipo, entrada, salida) de /formats; `only` filtra por tipo ("image") o par ("png->jpg")"""
+    for file_type, extensions in formats.items():
+        for input_format in extensions:
+            for output_format in extensions:
+                if input_format == output_format:
+                    continue
+                name = f"{input_format}->{output_format}"
+                if only and only not in (file_type, name, input_format):
+                    continue
+                yield file_type, input_format, output_format
+
+
+def summarize(latencies: list, input_bytes: int, peak_mb: float, error: str = None) -> dict:
+    if not latencies:
+        return {"runs": 0, "error": error}
+    median = percentile(latencies, 50)
+    return {
+        "runs": len(latencies),
+        "input_bytes": input_bytes,
+        "p50_ms": round(median * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "throughput_mb_s": round(input_bytes / (1024 * 1024) / median, 3) if median > 0 else None,
+        "peak_rss_mb": round(peak_mb, 1),
+        "error": error,
+    }
+
+
+async def bench_in_process(fixtures: FixtureSet, repeat: int, only: str, workdir: Path) -> dict:
+    os.environ.setdefault("PROCESS_POOL_WORKERS", "0")
+    sys.path.insert(0, str(BACKEND_DIR))
+    import main
+
+    main.ffmpeg_caps = await main.probe_ffmpeg()
+    converters = {"audio": main.convert_media, "image": main.convert_image, "document": main.convert_document}
+    formats = await main.get_formats()
+    results = {}
+    pid = os.getpid()
+    try:
+        for file_type, input_format, output_format in conversion_pairs(formats, only):
+            name = f"{input_format}->{output_format}"
+            source = fixtures.get(input_format)
+            if source is None:
+                results[name] = {"runs": 0, "error": "sin fixture para este formato"}
+                continue
+            latencies, error = [], None
+            reset_peak_rss(pid)
+            for i in range(repeat):
+                output = workdir / f"salida_{i}.{output_format}"
+                start = time.perf_counter()
+                try:
+                    await converters[file_type](source, output, output_format)
+                except Exception as e:
+                    error = getattr(e, "detail", None) or str(e)
+                    break
+                latencies.append(time.perf_counter() - start)
+                output.unlink(missing_ok=True)
+            results[name] = summarize(latencies, source.stat().st_size, peak_rss_mb(pid), error)
+            print(f"[in_process] {name}: {results[name].get('p50_ms', error)}", file=sys.stderr)
+    finally:
+        main.process_pool.shutdown()
+    return results
+
+
+def bench_end_to_end(fixtures: FixtureSet, repeat: int, only: str) -> dict:
+    results = {}
+    with run_server({"CACHE_MAX_MB": "0"}) as (host, port, process):
+        status, body = request(host, port, "GET", "/formats")
+        formats = json.loads(body)
+        for file_type, input_format, output_format in conversion_pairs(formats, only):
+            name = f"{input_format}->{output_format}"
+            source = fixtures.get(input_format)
+            if source is None:
+                results[name] = {"runs": 0, "error": "sin fixture para este formato"}
+                continue
+            content = source.read_bytes()
+            latencies, error = [], None
+            for pid in process_tree(process.pid):
+                reset_peak_rss(pid)
+            for _ in range(repeat):
+                status, data, elapsed = multipart_upload(host, port, "/convert", source.name, 0,
+                                                         {"output_format": output_format}, content=content)
+                if status != 200:
+                    error = f"HTTP {status}: {data.get('detail') if isinstance(data, dict) else data[:200]}"
+                    break
+                latencies.append(elapsed)
+                request(host, port, "DELETE", f"/cleanup/{data['filename']}")
+            results[name] = summarize(latencies, len(content), tree_peak_rss_mb(process.pid), error)
+            print(f"[end_to_end] {name}: {results[name].get('p50_ms', error)}", file=sys.stderr)
+    return results
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """Lista de regresiones respecto a un reporte anterior"""
+    regressions = []
+    for mode in ("in_process", "end_to_end"):
+        for name, current in report.get(mode, {}).items():
+            previous = baseline.get(mode, {}).get(name)
+            if not previous:
+                continue
+            if previous.get("runs") and not current.get("runs"):
+                regressions.append(f"{mode} {name}: ahora falla ({current.get('error')})")
+                continue
+            for metric in ("p50_ms", "peak_rss_mb"):
+                old, new = previous.get(metric), current.get(metric)
+                if old and new and new > old * (1 + threshold):
+                    regressions.append(f"{mode} {name}: {metric} {old} → {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=sorted(FixtureSet.SIZES), default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mode", choices=["both", "in_process", "end_to_end"], default="both")
+    parser.add_argument("--only", help='Tipo ("image"), formato de entrada ("png") o par ("png->jpg")')
+    parser.add_argument("--output", help="Archivo donde guardar el reporte JSON (por defecto stdout)")
+    parser.add_argument("--baseline", help="Reporte anterior contra el que comparar")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Empeoramiento tolerado (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "size": args.size,
+            "repeat": args.repeat,
+        },
+    }
+    with tempfile.TemporaryDirectory(prefix="bench_conversions_") as tmp:
+        fixtures = FixtureSet(Path(tmp) / "fixtures", args.size)
+        if args.mode in ("both", "end_to_end"):
+            report["end_to_end"] = bench_end_to_end(fixtures, args.repeat, args.only)
+        if args.mode in ("both", "in_process"):
+            workdir = Path(tmp) / "salidas"
+            workdir.mkdir()
+            report["in_process"] = asyncio.run(bench_in_process(fixtures, args.repeat, args.only, workdir))
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")), args.threshold)
+        for line in regressions:
+            print(f"REGRESIÓN {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
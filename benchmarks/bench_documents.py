@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: memoria y tiempo de la tubería lector → escritor de documents.py con archivos grandes.
+
+Genera un TXT (UTF-8 y Latin-1), un HTML y un Markdown de --size-mb y los convierte a cada formato
+de salida en este mismo proceso, midiendo el tiempo, el pico de memoria por encima del inicial y
+cuántas veces se abrió la entrada. Verifica que:
+  - cada par lector × escritor termine sin error y genere una salida no vacía
+  - la entrada se lea una sola vez
+  - las salidas de texto (txt, md, html) no acumulen el documento: el pico de memoria queda por
+    debajo de --max-growth-ratio veces el tamaño de la entrada
+
+DOCX se carga completo (python-docx) y PDF acumula por página, así que no entran en la verificación
+de memoria. Las entradas DOCX y PDF ya están cubiertas por bench_conversions.py.
+
+Uso:
+    python benchmarks/bench_documents.py --size-mb 50
+"""
+import argparse
+import builtins
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import BACKEND_DIR, peak_rss_mb, reset_peak_rss
+from fixtures import write_html, write_text
+
+sys.path.insert(0, str(BACKEND_DIR))
+import documents  # noqa: E402
+
+STREAMING_FORMATS = ("txt", "md", "html")
+
+
+def make_inputs(directory: Path, size_mb: float) -> dict:
+    inputs = {}
+    utf8 = directory / "texto.txt"
+    write_text(utf8, size_mb)
+    inputs["txt"] = utf8
+
+    latin1 = directory / "latin1.txt"
+    with open(utf8, encoding="utf-8") as src, open(latin1, "w", encoding="latin-1", newline="\r\n") as dst:
+        for line in src:
+            dst.write(line)
+    inputs["txt-latin1-crlf"] = latin1
+
+    page = directory / "pagina.html"
+    # Cada párrafo de fixtures.py ocupa ~500 bytes
+    write_html(page, int(size_mb * 1024 * 1024 / 500))
+    inputs["html"] = page
+
+    markdown = directory / "notas.md"
+    markdown.write_bytes(utf8.read_bytes())
+    inputs["md"] = markdown
+    return inputs
+
+
+def count_opens(path: Path):
+    """Envuelve open() para contar cuántas veces se abre `path`; retorna (contador, restaurar)"""
+    original = builtins.open
+    counter = {"opens": 0}
+
+    def counting_open(file, *args, **kwargs):
+        if str(file) == str(path):
+            counter["opens"] += 1
+        return original(file, *args, **kwargs)
+
+    builtins.open = counting_open
+    return counter, lambda: setattr(builtins, "open", original)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=50)
+    parser.add_argument("--max-growth-ratio", type=float, default=0.25)
+    parser.add_argument("--formats", default="txt,md,html,docx,pdf", help="Formatos de salida separados por coma")
+    args = parser.parse_args()
+
+    pid = os.getpid()
+    results = {}
+    checks = {}
+    with tempfile.TemporaryDirectory(prefix="bench_documents_") as tmp:
+        inputs = make_inputs(Path(tmp), args.size_mb)
+        for name, source in inputs.items():
+            input_mb = source.stat().st_size / (1024 * 1024)
+            for output_format in args.formats.split(","):
+                if source.suffix.lstrip(".") == output_format:
+                    continue
+                pair = f"{name}->{output_format}"
+                output = Path(tmp) / f"salida.{output_format}"
+                counter, restore = count_opens(source)
+                reset_peak_rss(pid)
+                baseline = peak_rss_mb(pid)
+                start = time.perf_counter()
+                try:
+                    documents.convert_document(source, output, output_format)
+                    error = None
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+                finally:
+                    restore()
+                growth = peak_rss_mb(pid) - baseline
+                results[pair] = {
+                    "input_mb": round(input_mb, 1),
+                    "seconds": round(time.perf_counter() - start, 2),
+                    "peak_growth_mb": round(growth, 1),
+                    "input_opens": counter["opens"],
+                    "output_mb": round(output.stat().st_size / (1024 * 1024), 2) if output.exists() else 0,
+                    "error": error,
+                }
+                checks[f"{pair}_ok"] = error is None and results[pair]["output_mb"] > 0
+                checks[f"{pair}_single_read"] = counter["opens"] == 1
+                if output_format in STREAMING_FORMATS:
+                    checks[f"{pair}_bounded_memory"] = growth < args.max_growth_ratio * input_mb
+                output.unlink(missing_ok=True)
+
+    report = {"size_mb": args.size_mb, "results": results,
+              "failed_checks": [name for name, passed in checks.items() if not passed]}
+    report["ok"] = not report["failed_checks"]
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
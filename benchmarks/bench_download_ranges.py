@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: descargas por rangos en paralelo y peticiones condicionales contra /download.
+
+Convierte una imagen grande a BMP (salida de decenas de MB) y luego:
+  - la descarga completa y toma su ETag
+  - verifica que If-None-Match responde 304 sin cuerpo
+  - la descarga en --parts rangos simultáneos, reensambla y compara el SHA-256 con la completa
+  - simula reanudar: Range desde la mitad con If-Range = ETag (206) y con un ETag viejo (200 completo)
+
+Imprime un JSON con los tiempos y el resultado de cada verificación; termina con código 1 si alguna falla.
+
+Uso:
+    python benchmarks/bench_download_ranges.py --megapixels 12 --parts 8
+"""
+import argparse
+import hashlib
+import http.client
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import multipart_upload, run_server
+from fixtures import make_image
+
+
+def get(host: str, port: int, path: str, headers: dict = None):
+    """GET que retorna (status, headers en minúsculas, cuerpo)"""
+    conn = http.client.HTTPConnection(host, port, timeout=600)
+    try:
+        conn.request("GET", path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, {k.lower(): v for k, v in response.getheaders()}, response.read()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--parts", type=int, default=8)
+    args = parser.parse_args()
+
+    buffer = io.BytesIO()
+    make_image(args.megapixels).save(buffer, format="PNG", compress_level=1)
+    checks = {}
+    report = {"megapixels": args.megapixels, "parts": args.parts, "checks": checks}
+    with run_server({"CACHE_MAX_MB": "0"}) as (host, port, process):
+        status, data, _ = multipart_upload(host, port, "/convert", "fuente.png", 0,
+                                           {"output_format": "bmp", "preset": "fast"}, content=buffer.getvalue())
+        if status != 200:
+            print(f"La conversión falló: HTTP {status} {data}", file=sys.stderr)
+            return 1
+        path = data["download_url"]
+
+        start = time.perf_counter()
+        status, headers, full = get(host, port, path)
+        report["full_seconds"] = round(time.perf_counter() - start, 3)
+        report["size_mb"] = round(len(full) / (1024 * 1024), 1)
+        etag = headers.get("etag")
+        digest = hashlib.sha256(full).hexdigest()
+        checks["etag_is_content_sha256"] = etag == f'"{digest}"'
+        checks["accept_ranges"] = headers.get("accept-ranges") == "bytes"
+
+        status, headers, body = get(host, port, path, {"If-None-Match": etag})
+        checks["if_none_match_304"] = status == 304 and body == b""
+        status, _, _ = get(host, port, path, {"If-None-Match": '"otro"'})
+        checks["if_none_match_other_200"] = status == 200
+
+        size = len(full)
+        step = -(-size // args.parts)
+        ranges = [(offset, min(offset + step, size) - 1) for offset in range(0, size, step)]
+
+        def fetch(byte_range):
+            first, last = byte_range
+            return get(host, port, path, {"Range": f"bytes={first}-{last}"})
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.parts) as executor:
+            responses = list(executor.map(fetch, ranges))
+        report["parallel_seconds"] = round(time.perf_counter() - start, 3)
+        checks["parallel_all_206"] = all(status == 206 for status, _, _ in responses)
+        checks["parallel_content_range"] = all(
+            headers.get("content-range") == f"bytes {first}-{last}/{size}"
+            for (first, last), (_, headers, _) in zip(ranges, responses)
+        )
+        checks["parallel_reassembled_sha256"] = hashlib.sha256(b"".join(b for _, _, b in responses)).hexdigest() == digest
+
+        middle = size // 2
+        status, headers, body = get(host, port, path, {"Range": f"bytes={middle}-", "If-Range": etag})
+        checks["resume_if_range_206"] = status == 206 and body == full[middle:]
+        status, _, body = get(host, port, path, {"Range": f"bytes={middle}-", "If-Range": '"viejo"'})
+        checks["resume_stale_if_range_200"] = status == 200 and len(body) == size
+        status, headers, _ = get(host, port, path, {"Range": f"bytes={size}-"})
+        checks["unsatisfiable_416"] = status == 416 and headers.get("content-range") == f"bytes */{size}"
+
+    report["ok"] = all(checks.values())
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
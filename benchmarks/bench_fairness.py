@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: reparto justo de las colas entre clientes y límite de peticiones por cliente.
+
+Simula clientes distintos con X-Forwarded-For (CLIENT_IP_HEADER). Un cliente "pesado" encola
+--heavy conversiones WAV→MP3 de --heavy-seconds cada una y, justo después, un cliente "liviano"
+manda --light conversiones cortas (audio de 2 s y una imagen chica, alternados). Se mide la
+latencia del liviano con JOB_SCHEDULING=fifo (orden de llegada) y con fair: con fifo su audio
+espera todo lo que encoló el pesado; con fair, como mucho el trabajo que está en curso.
+
+Además verifica que:
+  - con JOB_QUEUE_MAX_PER_CLIENT el pesado recibe 429 mientras el liviano sigue entrando
+  - con RATE_LIMIT_PER_MINUTE el cliente que agota su balde recibe 429 con Retry-After antes de
+    subir el archivo, sin afectar a otra IP ni a una API key configurada
+  - un lote cuesta un token por archivo y una subida reanudable uno solo (al iniciarla)
+
+Imprime un JSON con p50/p99 del cliente liviano por modo y el resultado de cada verificación;
+termina con código 1 si alguna falla.
+
+Uso:
+    python benchmarks/bench_fairness.py --heavy 8 --heavy-seconds 120 --light 8
+"""
+import argparse
+import hashlib
+import http.client
+import io
+import json
+import sys
+import tempfile
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from common import multipart_upload, percentile, request, run_server
+from fixtures import make_image, write_sine_wav
+
+HEAVY = {"X-Forwarded-For": "203.0.113.10"}
+LIGHT = {"X-Forwarded-For": "203.0.113.20"}
+
+
+def unique() -> bytes:
+    """Bytes al final del archivo: cambian el hash (sin aciertos de caché, tampoco entre corridas)
+    sin romper el WAV ni el PNG"""
+    return uuid.uuid4().bytes
+
+
+def post_empty(host: str, port: int, path: str, headers: dict):
+    """POST sin cuerpo: alcanza para pasar (o no) por el límite; retorna (status, headers)"""
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        conn.request("POST", path, body=b"", headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status, {k.lower(): v for k, v in response.getheaders()}
+    finally:
+        conn.close()
+
+
+def post_form(host: str, port: int, path: str, fields: dict, headers: dict):
+    body = urllib.parse.urlencode(fields).encode()
+    status, data = request(host, port, "POST", path, body=body,
+                           headers={**headers, "Content-Type": "application/x-www-form-urlencoded"})
+    return status, json.loads(data)
+
+
+def resumable_upload(host: str, port: int, content: bytes, headers: dict):
+    """Sube `content` por /uploads en un solo bloque y lo completa; retorna los status de inicio y cierre"""
+    status, session = post_form(host, port, "/uploads", {"filename": "reanudable.png", "size": len(content)},
+                                headers)
+    if status != 201:
+        return status, None
+    request(host, port, "PUT", session["upload_url"], body=content, headers={
+        **headers,
+        "Upload-Offset": "0",
+        "X-Chunk-Sha256": hashlib.sha256(content).hexdigest(),
+        "Content-Type": "application/octet-stream",
+    })
+    status_complete, _ = post_form(host, port, f"{session['upload_url']}/complete", {"output_format": "webp"}, headers)
+    return status, status_complete
+
+
+def batch(host: str, port: int, content: bytes, count: int, headers: dict):
+    """POST /convert/batch con `count` copias (distintas) de una imagen; retorna el status"""
+    boundary = uuid.uuid4().hex
+    body = f"--{boundary}\r\nContent-Disposition: form-data; name=\"output_format\"\r\n\r\nwebp\r\n".encode()
+    for i in range(count):
+        body += (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"lote_{i}.png\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + content + unique() + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    status, _ = request(host, port, "POST", "/convert/batch", body=body,
+                        headers={**headers, "Content-Type": f"multipart/form-data; boundary={boundary}"})
+    return status
+
+
+def wait_job(host: str, port: int, job_id: str, timeout: float = 900) -> str:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status, body = request(host, port, "GET", f"/jobs/{job_id}")
+        if status != 200:
+            return f"HTTP {status}"
+        job = json.loads(body)
+        if job["status"] in ("done", "failed"):
+            return job["status"]
+        time.sleep(0.2)
+    return "timeout"
+
+
+def contention_run(mode: str, heavy: bytes, light_audio: bytes, light_image: bytes, args) -> dict:
+    """Pesado y liviano a la vez con JOB_SCHEDULING=`mode`; latencias del liviano"""
+    env = {
+        "JOB_SCHEDULING": mode,
+        "CLIENT_IP_HEADER": "X-Forwarded-For",
+        "JOB_CONCURRENCY_AUDIO": "1",
+        "JOB_QUEUE_MAX": str(args.heavy + args.light + 4),
+    }
+    with run_server(env) as (host, port, _), ThreadPoolExecutor(max_workers=args.heavy + args.light) as pool:
+        start = time.perf_counter()
+
+        def submit_heavy(i):
+            status, data, _ = multipart_upload(host, port, "/jobs", f"largo_{i}.wav", 0, {"output_format": "mp3"},
+                                               content=heavy + unique(), headers=HEAVY)
+            return data["job_id"] if status == 202 else None
+
+        heavy_jobs = list(pool.map(submit_heavy, range(args.heavy)))
+
+        def light(i):
+            audio = i % 2 == 0
+            name, content, fmt = ("corto", light_audio, "mp3") if audio else ("chica", light_image, "webp")
+            extension = "wav" if audio else "png"
+            status, _, elapsed = multipart_upload(host, port, "/convert", f"{name}_{i}.{extension}", 0,
+                                                  {"output_format": fmt}, content=content + unique(), headers=LIGHT)
+            return "audio" if audio else "image", status, elapsed
+
+        light_results = list(pool.map(light, range(args.light)))
+        _, stats = request(host, port, "GET", "/scheduler/stats")
+        heavy_status = list(pool.map(lambda job_id: wait_job(host, port, job_id) if job_id else "rechazado", heavy_jobs))
+        makespan = time.perf_counter() - start
+
+    latencies = [elapsed for _, status, elapsed in light_results if status == 200]
+    audio = [elapsed for kind, status, elapsed in light_results if kind == "audio" and status == 200]
+    return {
+        "light_ok": len(latencies) == args.light,
+        "heavy_ok": all(status == "done" for status in heavy_status),
+        "light_p50_seconds": round(percentile(latencies, 50), 2),
+        "light_p99_seconds": round(percentile(latencies, 99), 2),
+        "light_audio_p50_seconds": round(percentile(audio, 50), 2),
+        "makespan_seconds": round(makespan, 2),
+        "seconds_per_unit": json.loads(stats).get("seconds_per_unit"),
+    }
+
+
+def client_cap_checks(heavy: bytes, light_audio: bytes, checks: dict):
+    """Con JOB_QUEUE_MAX_PER_CLIENT=2 el pesado llena su parte y el liviano sigue entrando"""
+    env = {
+        "CLIENT_IP_HEADER": "X-Forwarded-For",
+        "JOB_CONCURRENCY_AUDIO": "1",
+        "JOB_QUEUE_MAX": "10",
+        "JOB_QUEUE_MAX_PER_CLIENT": "2",
+    }
+    with run_server(env) as (host, port, _):
+        rejected = None
+        for i in range(6):
+            status, data, _ = multipart_upload(host, port, "/jobs", f"largo_{i}.wav", 0, {"output_format": "mp3"},
+                                               content=heavy + unique(), headers=HEAVY)
+            if status == 429:
+                rejected = data
+                break
+        checks["client_cap_rejects_heavy_client"] = (
+            isinstance(rejected, dict) and "en espera" in rejected.get("detail", ""))
+        status, _, _ = multipart_upload(host, port, "/jobs", "corto.wav", 0, {"output_format": "mp3"},
+                                        content=light_audio + unique(), headers=LIGHT)
+        checks["client_cap_admits_other_client"] = status == 202
+        _, stats = request(host, port, "GET", "/scheduler/stats")
+        checks["scheduler_stats"] = json.loads(stats).get("max_queue_per_client") == 2
+
+
+def rate_limit_checks(light_image: bytes, checks: dict):
+    """Balde de 3 peticiones (6 por minuto): la cuarta seguida recibe 429 con Retry-After"""
+    env = {
+        "CLIENT_IP_HEADER": "X-Forwarded-For",
+        "RATE_LIMIT_PER_MINUTE": "6",
+        "RATE_LIMIT_BURST": "3",
+        "RATE_LIMIT_API_KEYS": "clave-bench",
+    }
+    greedy = {"X-Forwarded-For": "198.51.100.1"}
+    with run_server(env) as (host, port, _):
+        first = [post_empty(host, port, "/convert", greedy) for _ in range(3)]
+        checks["rate_limit_allows_burst"] = (
+            all(status != 429 for status, _ in first)
+            and [h.get("x-ratelimit-remaining") for _, h in first] == ["2", "1", "0"])
+        status, headers = post_empty(host, port, "/convert", greedy)
+        checks["rate_limit_rejects_with_retry_after"] = status == 429 and int(headers.get("retry-after", 0)) >= 1
+        status, _ = post_empty(host, port, "/jobs", {"X-Forwarded-For": "198.51.100.2"})
+        checks["rate_limit_other_ip_unaffected"] = status != 429
+        status, _ = post_empty(host, port, "/jobs", {**greedy, "X-API-Key": "clave-bench"})
+        checks["rate_limit_api_key_own_bucket"] = status != 429
+        status, _ = request(host, port, "GET", "/formats", headers=greedy)
+        checks["rate_limit_only_conversions"] = status == 200
+
+        batcher = {"X-Forwarded-For": "198.51.100.3"}
+        status = batch(host, port, light_image, 3, batcher)
+        after, _ = post_empty(host, port, "/convert", batcher)
+        checks["batch_costs_one_token_per_file"] = status == 200 and after == 429
+
+        # Inicio (1 token) + cierre (gratis) + 2 conversiones = balde de 3; la siguiente ya no entra
+        uploader = {"X-Forwarded-For": "198.51.100.4"}
+        started, completed = resumable_upload(host, port, light_image + unique(), uploader)
+        more = [post_empty(host, port, "/convert", uploader)[0] for _ in range(3)]
+        checks["resumable_upload_costs_one_token"] = (started == 201 and completed == 202
+                                                      and more[0] != 429 and more[1] != 429 and more[2] == 429)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--heavy", type=int, default=8, help="conversiones largas del cliente pesado")
+    parser.add_argument("--heavy-seconds", type=float, default=120, help="duración de cada WAV largo")
+    parser.add_argument("--light", type=int, default=8, help="conversiones cortas del cliente liviano")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_sine_wav(Path(tmp) / "largo.wav", args.heavy_seconds)
+        write_sine_wav(Path(tmp) / "corto.wav", 2, frequency=880)
+        heavy = (Path(tmp) / "largo.wav").read_bytes()
+        light_audio = (Path(tmp) / "corto.wav").read_bytes()
+    buffer = io.BytesIO()
+    make_image(0.25).save(buffer, format="PNG")
+    light_image = buffer.getvalue()
+
+    checks = {}
+    report = {"heavy": args.heavy, "heavy_seconds": args.heavy_seconds, "light": args.light, "checks": checks}
+    for mode in ("fifo", "fair"):
+        report[mode] = contention_run(mode, heavy, light_audio, light_image, args)
+        checks[f"{mode}_all_jobs_done"] = report[mode]["light_ok"] and report[mode]["heavy_ok"]
+    checks["fair_lowers_light_p50"] = report["fair"]["light_audio_p50_seconds"] < report["fifo"]["light_audio_p50_seconds"] / 2
+    client_cap_checks(heavy, light_audio, checks)
+    rate_limit_checks(light_image, checks)
+
+    report["ok"] = all(checks.values())
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: la limpieza por cuota de disco no borra las entradas de trabajos en cola.
+
+Levanta el servidor con una cuota mínima (DISK_QUOTA_MB), la limpieza cada --interval segundos y
+un solo worker de audio, y encola --jobs conversiones WAV→MP3 de --seconds cada una: mientras la
+primera corre, las demás esperan con su archivo subido en disco y el total queda por encima de la
+cuota en cada barrido. Verifica que:
+  - todos los trabajos terminan bien (ninguna entrada en cola se borró)
+  - al terminar, la limpieza vuelve a dejar el disco bajo la cuota
+
+Imprime un JSON con el estado de cada trabajo y el resultado de cada verificación; termina con
+código 1 si alguna falla.
+
+Uso:
+    python benchmarks/bench_janitor_quota.py --jobs 4 --seconds 60
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from common import multipart_upload, request, run_server
+from fixtures import write_sine_wav
+
+
+def get_json(host: str, port: int, path: str):
+    status, body = request(host, port, "GET", path)
+    return status, json.loads(body) if body else None
+
+
+def wait_job(host: str, port: int, job_id: str, timeout: float = 600) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status, job = get_json(host, port, f"/jobs/{job_id}")
+        if status != 200:
+            return {"status": f"HTTP {status}"}
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.2)
+    return {"status": "timeout"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=60, help="duración de cada WAV")
+    parser.add_argument("--interval", type=float, default=0.2, help="segundos entre barridos de la limpieza")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_sine_wav(Path(tmp) / "tono.wav", args.seconds)
+        content = (Path(tmp) / "tono.wav").read_bytes()
+
+    env = {
+        "DISK_QUOTA_MB": "0.05",
+        "JANITOR_INTERVAL_SECONDS": str(args.interval),
+        "JOB_CONCURRENCY_AUDIO": "1",
+        "CACHE_MAX_MB": "0",
+    }
+    checks = {}
+    report = {"jobs": args.jobs, "input_bytes": len(content), "checks": checks}
+    with run_server(env) as (host, port, _):
+        job_ids = []
+        for i in range(args.jobs):
+            # Bytes distintos al final: entradas distintas que no comparten trabajo
+            status, data, _ = multipart_upload(host, port, "/jobs", f"tono_{i}.wav", 0, {"output_format": "mp3"},
+                                               content=content + uuid.uuid4().bytes)
+            job_ids.append(data["job_id"] if status == 202 else None)
+        results = [wait_job(host, port, job_id) if job_id else {"status": "rechazado"} for job_id in job_ids]
+        report["results"] = [{"status": r["status"], "error": r.get("error")} for r in results]
+        checks["queued_inputs_survive_quota"] = all(r["status"] == "done" for r in results)
+
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            _, stats = get_json(host, port, "/janitor/stats")
+            if stats["bytes"] <= stats["quota_bytes"]:
+                break
+            time.sleep(args.interval)
+        report["janitor"] = stats
+        checks["quota_enforced_after_jobs"] = stats["bytes"] <= stats["quota_bytes"]
+
+    report["ok"] = all(checks.values())
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: costo de N suscriptores SSE inactivos en /jobs/{id}/events y avance en vivo.
+
+Encola varias conversiones WAV→MP3 para ocupar el worker de audio y abre --subscribers conexiones
+SSE al último trabajo, que queda en espera. Mide cuánta memoria y CPU usa el servidor mientras
+esas conexiones esperan, y luego lee todas hasta el final verificando que cada una recibió el
+evento `done`. Además registra en qué momento llega cada evento de progreso a un suscriptor.
+
+Uso:
+    python benchmarks/bench_job_events.py --subscribers 1000 --audio-seconds 240 --blockers 4
+"""
+import argparse
+import json
+import os
+import selectors
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import current_rss_mb, multipart_upload, run_server
+from fixtures import write_sine_wav
+
+
+def cpu_seconds(pid: int) -> float:
+    """utime + stime del proceso en segundos. Solo Linux."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def open_subscriber(host: str, port: int, path: str) -> socket.socket:
+    s = socket.create_connection((host, port))
+    s.sendall(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    s.setblocking(False)
+    return s
+
+
+def read_all(sockets: list, timeout: float) -> dict:
+    """Lee cada socket hasta que el servidor termina el stream; retorna socket -> bytes"""
+    selector = selectors.DefaultSelector()
+    received = {}
+    for s in sockets:
+        selector.register(s, selectors.EVENT_READ)
+        received[s] = bytearray()
+    deadline = time.time() + timeout
+    pending = len(sockets)
+    while pending and time.time() < deadline:
+        for key, _ in selector.select(timeout=1):
+            data = key.fileobj.recv(65536)
+            received[key.fileobj].extend(data)
+            # Fin del cuerpo chunked tras el evento final
+            if not data or received[key.fileobj].endswith(b"0\r\n\r\n"):
+                selector.unregister(key.fileobj)
+                pending -= 1
+    return received
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--audio-seconds", type=float, default=240)
+    parser.add_argument("--blockers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "tono.wav"
+        write_sine_wav(source, args.audio_seconds)
+        content = source.read_bytes()
+
+    report = {"subscribers": args.subscribers, "audio_seconds": args.audio_seconds}
+    with run_server({"CACHE_MAX_MB": "0", "JOB_CONCURRENCY_AUDIO": "1"}) as (host, port, process):
+        jobs = []
+        for i in range(args.blockers + 1):
+            status, data, _ = multipart_upload(host, port, "/jobs", f"tono_{i}.wav", 0,
+                                               {"output_format": "mp3"}, content=content)
+            if status != 202:
+                print(f"No se pudo encolar: HTTP {status} {data}", file=sys.stderr)
+                return 1
+            jobs.append(data["job_id"])
+
+        baseline_rss = current_rss_mb(process.pid)
+        start = time.perf_counter()
+        idle = [open_subscriber(host, port, f"/jobs/{jobs[-1]}/events") for _ in range(args.subscribers)]
+        report["connect_seconds"] = round(time.perf_counter() - start, 2)
+        time.sleep(1)
+        report["rss_per_subscriber_kb"] = round((current_rss_mb(process.pid) - baseline_rss) * 1024 / args.subscribers, 2)
+
+        # CPU del servidor con todos esperando (incluye la conversión en curso, que corre en FFmpeg)
+        cpu_before, wall_before = cpu_seconds(process.pid), time.perf_counter()
+        time.sleep(3)
+        report["idle_server_cpu_percent"] = round(
+            100 * (cpu_seconds(process.pid) - cpu_before) / (time.perf_counter() - wall_before), 1)
+
+        received = read_all(idle, timeout=60 * (args.blockers + 1))
+        report["subscribers_with_done"] = sum(b"event: done" in data for data in received.values())
+        for s in idle:
+            s.close()
+
+        # Con el worker libre: un trabajo más y un suscriptor que registra cuándo llega cada avance
+        _, data, _ = multipart_upload(host, port, "/jobs", "tono.wav", 0, {"output_format": "mp3"}, content=content)
+        live = open_subscriber(host, port, f"/jobs/{data['job_id']}/events")
+        live_start = time.perf_counter()
+        timeline = []
+        selector = selectors.DefaultSelector()
+        selector.register(live, selectors.EVENT_READ)
+        buffer = b""
+        while b"event: done" not in buffer and b"event: failed" not in buffer:
+            if not selector.select(timeout=120):
+                break
+            data = live.recv(65536)
+            if not data:
+                break
+            buffer += data
+            for line in data.split(b"\n"):
+                if line.startswith(b"data: {\"percent\""):
+                    timeline.append((round(time.perf_counter() - live_start, 2), json.loads(line[6:])["percent"]))
+        report["live_progress"] = timeline
+        live.close()
+
+    report["ok"] = report["subscribers_with_done"] == args.subscribers and len(report["live_progress"]) > 1
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: latencia de /download mientras se ejecutan conversiones de imágenes pesadas.
+
+Mide p50/p99 de la descarga de un archivo pequeño en reposo y con N conversiones TIFF→PNG
+grandes en curso. Si los conversores bloquean el event loop, la latencia bajo carga se dispara.
+
+Uso:
+    python benchmarks/bench_loop_latency.py --conversions 4 --megapixels 24
+"""
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+
+from PIL import Image
+
+from common import multipart_upload, percentile, request, run_server
+
+
+def make_tiff(megapixels: float) -> bytes:
+    """Genera un TIFF con ruido (poco comprimible) de aproximadamente `megapixels` MP"""
+    side = int((megapixels * 1_000_000) ** 0.5)
+    img = Image.effect_noise((side, side), 64).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="TIFF")
+    return buf.getvalue()
+
+
+def sample_latency(host, port, path, stop: threading.Event, interval: float = 0.05):
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        status, _ = request(host, port, "GET", path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if status != 200:
+            raise RuntimeError(f"Descarga falló con status {status}")
+        time.sleep(interval)
+    return latencies
+
+
+def summarize(latencies):
+    return {
+        "samples": len(latencies),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversions", type=int, default=4)
+    parser.add_argument("--megapixels", type=float, default=24)
+    parser.add_argument("--idle-seconds", type=float, default=2)
+    args = parser.parse_args()
+
+    tiff = make_tiff(args.megapixels)
+    small = io.BytesIO()
+    Image.new("RGB", (32, 32)).save(small, format="PNG")
+
+    with run_server() as (host, port, _):
+        status, data, _ = multipart_upload(host, port, "/convert", "small.png", 0,
+                                           {"output_format": "jpg"}, content=small.getvalue())
+        if status != 200:
+            raise RuntimeError(f"No se pudo preparar el archivo de descarga: {data}")
+        download_path = data["download_url"]
+
+        # Latencia en reposo
+        stop = threading.Event()
+        timer = threading.Timer(args.idle_seconds, stop.set)
+        timer.start()
+        idle = sample_latency(host, port, download_path, stop)
+
+        # Latencia con conversiones pesadas en curso
+        statuses = []
+
+        def convert(i):
+            status, _, elapsed = multipart_upload(host, port, "/convert", f"heavy_{i}.tiff", 0,
+                                                  {"output_format": "png"}, content=tiff)
+            statuses.append((status, round(elapsed, 2)))
+
+        stop = threading.Event()
+        loaded = []
+        sampler = threading.Thread(target=lambda: loaded.extend(sample_latency(host, port, download_path, stop)))
+        workers = [threading.Thread(target=convert, args=(i,)) for i in range(args.conversions)]
+        sampler.start()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        stop.set()
+        sampler.join()
+
+    report = {
+        "conversions": args.conversions,
+        "megapixels": args.megapixels,
+        "idle": summarize(idle),
+        "under_load": summarize(loaded),
+        "conversion_results": statuses,
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
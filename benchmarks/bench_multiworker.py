@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: modo multi-worker (WEB_CONCURRENCY) con estado compartido en SQLite.
+
+Levanta uvicorn con --workers N (vía WEB_CONCURRENCY) y usa una conexión nueva por petición, así
+el kernel reparte cada una entre los procesos. Verifica que:
+  - las peticiones llegan a más de un worker
+  - GET /jobs/{id} y /jobs/{id}/events responden desde cualquier worker, no solo desde el que encoló
+  - /download funciona desde cualquier worker
+  - la misma entrada subida otra vez se resuelve desde la caché aunque la atienda otro worker
+  - una subida reanudable cuyos bloques llegan a distintos workers se completa con el SHA-256 correcto
+  - varios POST /uploads/{id}/complete simultáneos (y un reintento posterior) responden todos 202 con
+    el mismo trabajo: la sesión se completa una sola vez aunque los pedidos caigan en workers distintos
+  - mientras otro proceso retiene el lock de escritura de SQLite, una petición que espera el store no
+    frena el event loop: GET /formats responde enseguida en el mismo worker
+
+Además mide el throughput de --jobs conversiones PNG→WebP simultáneas con 1 y con N workers (en
+una máquina de un solo núcleo no hay diferencia que medir: el reporte incluye os.cpu_count()).
+
+Uso:
+    python benchmarks/bench_multiworker.py --workers 4 --jobs 16 --megapixels 2
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from common import multipart_upload, request, run_server
+from fixtures import make_image
+
+
+def get_json(host: str, port: int, path: str):
+    status, body = request(host, port, "GET", path)
+    return status, json.loads(body) if body else None
+
+
+def wait_job(host: str, port: int, job_id: str, timeout: float = 300) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status, job = get_json(host, port, f"/jobs/{job_id}")
+        if status != 200:
+            return {"status": f"HTTP {status}"}
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.1)
+    return {"status": "timeout"}
+
+
+def convert_many(host: str, port: int, content: bytes, jobs: int) -> dict:
+    """Encola `jobs` conversiones a la vez (entradas distintas: sin aciertos de caché) y espera todas"""
+    # Bytes al final del PNG cambian el hash sin romper la imagen. Los servidores comparten
+    # OUTPUT_DIR y la caché: cada corrida lleva su propio id para no reutilizar las salidas de otra
+    salt = uuid.uuid4().bytes
+
+    def one(i):
+        status, data, _ = multipart_upload(host, port, "/jobs", f"img_{i}.png", 0, {"output_format": "webp", "preset": "fast"},
+                                           content=content + salt + i.to_bytes(4, "big"))
+        if status != 202:
+            return {"status": f"HTTP {status}"}
+        return wait_job(host, port, data["job_id"])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(one, range(jobs)))
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": round(elapsed, 2),
+        "jobs_per_second": round(jobs / elapsed, 2),
+        "failed": sum(r["status"] != "done" for r in results),
+    }
+
+
+def resumable_upload(host: str, port: int, content: bytes, chunk_size: int, concurrent_completes: int = 4) -> dict:
+    body = urllib.parse.urlencode({"filename": "fuente.png", "size": len(content),
+                                   "sha256": hashlib.sha256(content).hexdigest()}).encode()
+    status, data = request(host, port, "POST", "/uploads", body=body,
+                           headers={"Content-Type": "application/x-www-form-urlencoded"})
+    path = json.loads(data)["upload_url"]
+    workers = set()
+    offset = 0
+    while offset < len(content):
+        chunk = content[offset:offset + chunk_size]
+        status, data = request(host, port, "PUT", path, body=chunk, headers={
+            "Upload-Offset": str(offset), "X-Chunk-Sha256": hashlib.sha256(chunk).hexdigest(),
+            "Content-Type": "application/octet-stream"})
+        if status != 200:
+            return {"ok": False, "error": f"PUT HTTP {status} {data[:200]}"}
+        offset = json.loads(data)["offset"]
+        workers.add(get_json(host, port, "/")[1]["pid"])
+    body = urllib.parse.urlencode({"output_format": "jpg"}).encode()
+
+    def complete(_):
+        return request(host, port, "POST", f"{path}/complete", body=body,
+                       headers={"Content-Type": "application/x-www-form-urlencoded"})
+
+    # Pedidos simultáneos (cada uno con su conexión, repartidos entre workers) y un reintento al final
+    with ThreadPoolExecutor(max_workers=concurrent_completes) as pool:
+        responses = list(pool.map(complete, range(concurrent_completes)))
+    responses.append(complete(None))
+    statuses = [status for status, _ in responses]
+    if any(status != 202 for status in statuses):
+        return {"ok": False, "complete_statuses": statuses,
+                "error": next(data[:200].decode() for status, data in responses if status != 202)}
+    job_ids = {json.loads(data)["job_id"] for _, data in responses}
+    job = wait_job(host, port, next(iter(job_ids)))
+    return {"ok": job["status"] == "done", "chunks": -(-len(content) // chunk_size),
+            "complete_statuses": statuses, "single_job": len(job_ids) == 1}
+
+
+def loop_while_store_locked(host: str, port: int, db_path: str, hold: float = 2.0) -> dict:
+    """Retiene el lock de escritura de SQLite `hold` segundos mientras el servidor (un worker) crea
+    una sesión de subida, y mide cuánto tarda GET /formats en ese lapso"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    body = urllib.parse.urlencode({"filename": "bloqueada.png", "size": 1024}).encode()
+    blocked = {}
+
+    def create():
+        blocked["status"], _ = request(host, port, "POST", "/uploads", body=body,
+                                       headers={"Content-Type": "application/x-www-form-urlencoded"}, timeout=60)
+
+    thread = threading.Thread(target=create)
+    thread.start()
+    time.sleep(0.3)
+    start = time.perf_counter()
+    status, _ = request(host, port, "GET", "/formats", timeout=60)
+    formats_seconds = time.perf_counter() - start
+    time.sleep(max(0.0, hold - 0.3 - formats_seconds))
+    conn.execute("COMMIT")
+    conn.close()
+    thread.join()
+    return {"formats_status": status, "formats_seconds": round(formats_seconds, 3),
+            "blocked_create_status": blocked.get("status"), "hold_seconds": hold}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--megapixels", type=float, default=2)
+    args = parser.parse_args()
+
+    buffer = io.BytesIO()
+    make_image(args.megapixels).save(buffer, format="PNG", compress_level=1)
+    content = buffer.getvalue()
+    checks = {}
+    report = {"cpu_count": os.cpu_count(), "workers": args.workers, "jobs": args.jobs, "checks": checks}
+
+    with tempfile.TemporaryDirectory(prefix="bench_multiworker_") as tmp:
+        env = {"CACHE_MAX_MB": "200", "WEB_CONCURRENCY": "1", "SHARED_STORE": "memory"}
+        with run_server(env) as (host, port, _):
+            report["single_worker"] = convert_many(host, port, content, args.jobs)
+
+        env = {"CACHE_MAX_MB": "200", "WEB_CONCURRENCY": str(args.workers),
+               "SHARED_STORE": f"sqlite:///{tmp}/estado.db"}
+        with run_server(env) as (host, port, _):
+            pids = {get_json(host, port, "/")[1]["pid"] for _ in range(50)}
+            checks["requests_spread_over_workers"] = len(pids) > 1
+            report["workers_seen"] = len(pids)
+
+            status, data, _ = multipart_upload(host, port, "/jobs", "base.png", 0,
+                                               {"output_format": "webp"}, content=content)
+            job_id = data["job_id"]
+            job = wait_job(host, port, job_id)
+            # Varias lecturas con conexiones nuevas: con N workers casi seguro alguna cae en otro
+            reads = [get_json(host, port, f"/jobs/{job_id}") for _ in range(20)]
+            checks["job_visible_from_all_workers"] = all(s == 200 and j["status"] == "done" for s, j in reads)
+            events = [request(host, port, "GET", f"/jobs/{job_id}/events", timeout=30) for _ in range(10)]
+            checks["events_from_all_workers"] = all(s == 200 and b"event: done" in body for s, body in events)
+            downloads = [request(host, port, "GET", job["download_url"]) for _ in range(20)]
+            checks["download_from_all_workers"] = all(s == 200 and body[:4] == b"RIFF" for s, body in downloads)
+
+            cached = []
+            for _ in range(5):
+                status, data, _ = multipart_upload(host, port, "/convert", "base.png", 0,
+                                                   {"output_format": "webp"}, content=content)
+                cached.append(status == 200 and data.get("cached"))
+            checks["cache_shared_between_workers"] = all(cached)
+
+            upload = resumable_upload(host, port, content, chunk_size=max(len(content) // 8, 64 * 1024))
+            checks["resumable_upload_across_workers"] = upload["ok"]
+            checks["concurrent_complete_single_job"] = upload.get("single_job", False)
+            report["resumable_upload"] = upload
+
+            report["multi_worker"] = convert_many(host, port, content, args.jobs)
+
+        env = {"WEB_CONCURRENCY": "1", "SHARED_STORE": f"sqlite:///{tmp}/bloqueo.db"}
+        with run_server(env) as (host, port, _):
+            locked = loop_while_store_locked(host, port, f"{tmp}/bloqueo.db")
+            checks["loop_free_while_store_locked"] = (locked["formats_status"] == 200
+                                                      and locked["formats_seconds"] < 0.5
+                                                      and locked["blocked_create_status"] == 201)
+            report["store_locked"] = locked
+
+    checks["all_conversions_done"] = report["single_worker"]["failed"] == 0 and report["multi_worker"]["failed"] == 0
+    report["speedup"] = round(report["single_worker"]["seconds"] / report["multi_worker"]["seconds"], 2)
+    report["ok"] = all(checks.values())
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
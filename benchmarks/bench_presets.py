@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: tiempo de codificación vs tamaño de salida de cada preset (fast, balanced, small).
+
+Imágenes: convierte un BMP sintético (decodificación casi gratis) con converters.convert_image_sync.
+Audio: ejecuta FFmpeg con los mismos argumentos que convert_media (requiere FFmpeg). El tono
+senoidal de fixtures.py comprime mucho mejor que música real, así que en audio sirve para comparar
+tiempos entre presets más que para estimar tamaños absolutos.
+
+Imprime una tabla Markdown por formato (la columna "vs balanced" compara contra el preset por
+defecto) y con --output guarda el mismo resultado en JSON.
+
+Uso:
+    python benchmarks/bench_presets.py --megapixels 12 --audio-seconds 60 --repeat 3
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import BACKEND_DIR, percentile
+from fixtures import make_image, write_sine_wav
+
+sys.path.insert(0, str(BACKEND_DIR))
+import converters  # noqa: E402
+from ffmpeg_probe import AUDIO_ENCODERS  # noqa: E402
+from presets import ENCODING_PRESETS, audio_args  # noqa: E402
+
+IMAGE_FORMATS = ["jpg", "png", "webp", "tiff"]
+AUDIO_FORMATS = ["mp3", "aac", "ogg", "flac", "wma"]
+
+
+def measure(fn, output: Path, repeat: int) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        output.unlink(missing_ok=True)
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return {"p50_ms": round(percentile(latencies, 50) * 1000, 1), "output_bytes": output.stat().st_size}
+
+
+def bench_images(workdir: Path, megapixels: float, repeat: int) -> dict:
+    source = workdir / "fuente.bmp"
+    make_image(megapixels).save(source)
+    results = {}
+    for fmt in IMAGE_FORMATS:
+        output = workdir / f"salida.{fmt}"
+        results[fmt] = {
+            preset: measure(lambda: converters.convert_image_sync(source, output, fmt, preset=preset), output, repeat)
+            for preset in ENCODING_PRESETS
+        }
+        print(f"[imagen] {fmt}: {results[fmt]}", file=sys.stderr)
+    return results
+
+
+def bench_audio(workdir: Path, seconds: float, repeat: int) -> dict:
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        print("FFmpeg no está en el PATH: se omite audio", file=sys.stderr)
+        return {}
+    source = workdir / "fuente.wav"
+    write_sine_wav(source, seconds)
+    results = {}
+    for fmt in AUDIO_FORMATS:
+        output = workdir / f"salida.{fmt}"
+        results[fmt] = {}
+        for preset in ENCODING_PRESETS:
+            cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", str(source),
+                   "-codec:a", AUDIO_ENCODERS[fmt], *audio_args(fmt, preset), str(output)]
+            try:
+                results[fmt][preset] = measure(lambda: subprocess.run(cmd, check=True), output, repeat)
+            except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                results[fmt][preset] = {"error": str(e)}
+        print(f"[audio] {fmt}: {results[fmt]}", file=sys.stderr)
+    return results
+
+
+def markdown_table(title: str, results: dict) -> str:
+    lines = [f"### {title}", "", "| formato | preset | p50 (ms) | salida (KB) | tiempo vs balanced | tamaño vs balanced |",
+             "|---|---|---:|---:|---:|---:|"]
+    for fmt, by_preset in results.items():
+        base = by_preset.get("balanced", {})
+        for preset, row in by_preset.items():
+            if "error" in row:
+                lines.append(f"| {fmt} | {preset} | error | | | |")
+                continue
+            time_ratio = f"{row['p50_ms'] / base['p50_ms']:.2f}x" if base.get("p50_ms") else ""
+            size_ratio = f"{row['output_bytes'] / base['output_bytes']:.2f}x" if base.get("output_bytes") else ""
+            lines.append(f"| {fmt} | {preset} | {row['p50_ms']} | {row['output_bytes'] / 1024:.0f} | "
+                         f"{time_ratio} | {size_ratio} |")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--audio-seconds", type=float, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", choices=["image", "audio"])
+    parser.add_argument("--output", help="Archivo donde guardar el resultado en JSON")
+    args = parser.parse_args()
+
+    report = {"megapixels": args.megapixels, "audio_seconds": args.audio_seconds, "repeat": args.repeat}
+    with tempfile.TemporaryDirectory(prefix="bench_presets_") as tmp:
+        workdir = Path(tmp)
+        if args.only in (None, "image"):
+            report["image"] = bench_images(workdir, args.megapixels, args.repeat)
+        if args.only in (None, "audio"):
+            report["audio"] = bench_audio(workdir, args.audio_seconds, args.repeat)
+
+    if report.get("image"):
+        print(markdown_table(f"Imágenes ({args.megapixels} MP)", report["image"]) + "\n")
+    if report.get("audio"):
+        print(markdown_table(f"Audio ({args.audio_seconds} s)", report["audio"]))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
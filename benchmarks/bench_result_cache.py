@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: caché de resultados (aciertos, fallos y clave por tipo de entrada).
+
+Sube el mismo contenido HTML --repeat veces y mide la latencia de la primera conversión (fallo de
+caché) frente a las siguientes (aciertos). Verifica además que:
+  - las repeticiones se resuelven desde la caché con la misma salida
+  - los mismos bytes subidos con otra extensión (.html y luego .txt) no reutilizan la salida: el
+    lector de documentos depende de la extensión (HTML quita las etiquetas, TXT las conserva)
+
+Imprime un JSON con las latencias y el resultado de cada verificación; termina con código 1 si
+alguna falla.
+
+Uso:
+    python benchmarks/bench_result_cache.py --paragraphs 2000 --repeat 5
+"""
+import argparse
+import json
+import statistics
+import sys
+import uuid
+
+from common import multipart_upload, request, run_server
+from fixtures import paragraphs
+
+
+def convert(host: str, port: int, name: str, content: bytes, output_format: str):
+    status, data, elapsed = multipart_upload(host, port, "/convert", name, 0, {"output_format": output_format},
+                                             content=content)
+    if status != 200:
+        raise RuntimeError(f"La conversión de {name} falló: HTTP {status} {data}")
+    _, body = request(host, port, "GET", data["download_url"])
+    return data, body, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Un comentario con un id único: contenido nuevo en cada corrida (sin aciertos de corridas anteriores)
+    html = f"<!-- {uuid.uuid4()} --><html><body>" + "".join(
+        f"<p>{text} <b>negrita</b></p>" for text in paragraphs(args.paragraphs)) + "</body></html>"
+    content = html.encode("utf-8")
+
+    checks = {}
+    report = {"input_bytes": len(content), "checks": checks}
+    with run_server({"CACHE_MAX_MB": "200"}) as (host, port, _):
+        first, first_body, miss_seconds = convert(host, port, "pagina.html", content, "md")
+        hits = [convert(host, port, "pagina.html", content, "md") for _ in range(args.repeat)]
+        report["miss_seconds"] = round(miss_seconds, 3)
+        report["hit_seconds_median"] = round(statistics.median(elapsed for _, _, elapsed in hits), 3)
+        checks["repeat_is_cache_hit"] = all(data.get("cached") is True and data["filename"] == first["filename"]
+                                            and body == first_body for data, body, _ in hits)
+        checks["html_reader_strips_markup"] = b"<b>" not in first_body
+
+        as_text, text_body, _ = convert(host, port, "pagina.txt", content, "md")
+        checks["other_extension_not_shared"] = (as_text.get("cached") is False
+                                                and as_text["filename"] != first["filename"])
+        checks["text_reader_keeps_markup"] = b"<b>negrita</b>" in text_body
+        _, stats = request(host, port, "GET", "/cache/stats")
+        report["cache"] = json.loads(stats)
+
+    report["ok"] = all(checks.values())
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: subida reanudable por bloques (/uploads) con cortes y bloques corruptos.
+
+Genera un BMP grande y lo sube con el protocolo de /uploads:
+  - inicia la sesión declarando tamaño y SHA-256
+  - envía los bloques con Upload-Offset y X-Chunk-Sha256
+  - a mitad de camino corta la conexión en medio de un bloque y reanuda desde GET /uploads/{id}
+  - envía un bloque con checksum incorrecto (422) y lo reenvía
+  - completa la subida, espera el trabajo y descarga el resultado
+
+Imprime un JSON con la velocidad, la memoria del servidor y el resultado de cada verificación;
+termina con código 1 si alguna falla.
+
+Uso:
+    python benchmarks/bench_resumable_upload.py --megapixels 12 --chunk-mb 4
+"""
+import argparse
+import hashlib
+import io
+import json
+import socket
+import sys
+import time
+import urllib.parse
+
+from common import current_rss_mb, peak_rss_mb, request, run_server
+from fixtures import make_image
+
+
+def post_form(host: str, port: int, path: str, fields: dict):
+    body = urllib.parse.urlencode(fields).encode()
+    status, data = request(host, port, "POST", path, body=body,
+                           headers={"Content-Type": "application/x-www-form-urlencoded"})
+    return status, json.loads(data)
+
+
+def put_chunk(host: str, port: int, path: str, offset: int, data: bytes, checksum: str = None):
+    headers = {
+        "Upload-Offset": str(offset),
+        "X-Chunk-Sha256": checksum or hashlib.sha256(data).hexdigest(),
+        "Content-Type": "application/octet-stream",
+    }
+    status, body = request(host, port, "PUT", path, body=data, headers=headers)
+    return status, json.loads(body)
+
+
+def put_interrupted(host: str, port: int, path: str, offset: int, data: bytes):
+    """Envía la mitad de un bloque y cierra la conexión, como un cliente que pierde la red"""
+    head = (
+        f"PUT {path} HTTP/1.1\r\nHost: {host}\r\nUpload-Offset: {offset}\r\n"
+        f"X-Chunk-Sha256: {hashlib.sha256(data).hexdigest()}\r\nContent-Length: {len(data)}\r\n\r\n"
+    ).encode()
+    with socket.create_connection((host, port)) as s:
+        s.sendall(head + data[:len(data) // 2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--chunk-mb", type=float, default=4)
+    args = parser.parse_args()
+
+    buffer = io.BytesIO()
+    make_image(args.megapixels).save(buffer, format="BMP")
+    content = buffer.getvalue()
+    size = len(content)
+    chunk_size = int(args.chunk_mb * 1024 * 1024)
+    checks = {}
+    report = {"size_mb": round(size / (1024 * 1024), 1), "chunk_mb": args.chunk_mb, "checks": checks}
+
+    with run_server({"CACHE_MAX_MB": "0"}) as (host, port, process):
+        baseline = current_rss_mb(process.pid)
+        status, session = post_form(host, port, "/uploads", {
+            "filename": "fuente.bmp", "size": size, "sha256": hashlib.sha256(content).hexdigest()})
+        checks["initiate_201"] = status == 201
+        path = session["upload_url"]
+
+        offset = 0
+        interrupted = corrupted = False
+        start = time.perf_counter()
+        while offset < size:
+            data = content[offset:offset + chunk_size]
+            if not interrupted and offset >= size // 3:
+                interrupted = True
+                put_interrupted(host, port, path, offset, data)
+                time.sleep(0.2)
+                state = json.loads(request(host, port, "GET", path)[1])
+                checks["resume_offset_unchanged"] = state["offset"] == offset
+                status, _ = put_chunk(host, port, path, max(offset - chunk_size, 0), data)
+                checks["stale_offset_409"] = status == 409
+                continue
+            if not corrupted and offset >= 2 * size // 3:
+                corrupted = True
+                status, _ = put_chunk(host, port, path, offset, data, checksum="0" * 64)
+                checks["bad_checksum_422"] = status == 422
+                continue
+            status, state = put_chunk(host, port, path, offset, data)
+            if status != 200:
+                print(f"PUT falló en el offset {offset}: HTTP {status} {state}", file=sys.stderr)
+                return 1
+            offset = state["offset"]
+        report["upload_seconds"] = round(time.perf_counter() - start, 3)
+        report["upload_mb_per_s"] = round(size / (1024 * 1024) / (time.perf_counter() - start), 1)
+        report["rss_growth_mb"] = round(peak_rss_mb(process.pid) - baseline, 1)
+
+        status, job = post_form(host, port, f"{path}/complete", {"output_format": "jpg", "preset": "fast"})
+        checks["complete_202"] = status == 202
+        status_url = job.get("status_url", f"{path}/missing")
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            job = json.loads(request(host, port, "GET", status_url)[1])
+            if job.get("status", "failed") in ("done", "failed"):
+                break
+            time.sleep(0.2)
+        checks["job_done"] = job.get("status") == "done"
+        if checks["job_done"]:
+            status, output = request(host, port, "GET", job["download_url"])
+            checks["output_is_jpeg"] = status == 200 and output[:3] == b"\xff\xd8\xff"
+        checks["session_closed_404"] = request(host, port, "GET", path)[0] == 404
+
+    report["ok"] = all(checks.values())
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: salidas guardadas en un bucket compatible con S3 (OUTPUT_STORAGE=s3://...).
+
+Usa el S3 indicado con --endpoint (p. ej. MinIO, con un bucket ya creado y las credenciales en
+AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY) o, si no se indica, levanta `moto.server` como
+stand-in local. El servidor necesita boto3. Convierte una imagen grande a BMP (salida de decenas
+de MB, subida en varias partes) y verifica que:
+  - la salida se sube por multipart (el ETag del objeto termina en -N partes)
+  - /download responde 307 a una URL prefirmada que entrega el archivo con su nombre y tipo
+  - la misma entrada se resuelve desde la caché, también tras reiniciar el servidor (índice
+    reconstruido listando el bucket)
+  - /convert/batch arma el ZIP leyendo las salidas del bucket
+  - con DOWNLOAD_REDIRECT=0 la descarga se reenvía con ETag, 304, rangos e If-Range
+  - /cleanup borra el objeto
+
+Imprime un JSON con los tiempos de descarga (redirección vs reenvío) y el resultado de cada
+verificación; termina con código 1 si alguna falla.
+
+Uso:
+    python benchmarks/bench_storage.py --megapixels 12 --part-mb 5
+    python benchmarks/bench_storage.py --endpoint http://localhost:9000 --bucket convertidor
+"""
+import argparse
+import hashlib
+import http.client
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.parse
+import uuid
+import zipfile
+from contextlib import contextmanager, nullcontext
+
+from common import free_port, multipart_upload, request, run_server
+from fixtures import make_image
+
+
+def fetch(url: str, method: str = "GET", headers: dict = None):
+    """Petición a una URL absoluta; retorna (status, headers en minúsculas, cuerpo)"""
+    parts = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=600)
+    try:
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, {k.lower(): v for k, v in response.getheaders()}, response.read()
+    finally:
+        conn.close()
+
+
+@contextmanager
+def s3_stand_in(bucket: str):
+    """moto.server en un puerto libre, con el bucket creado"""
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-m", "moto.server", "-p", str(port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    endpoint = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                status, _ = request("127.0.0.1", port, "PUT", f"/{bucket}")
+                if status == 200:
+                    break
+            except OSError:
+                pass
+            time.sleep(0.2)
+        else:
+            raise RuntimeError("moto.server no respondió a tiempo")
+        yield endpoint
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def convert(host: str, port: int, content: bytes, path: str = "/convert", name: str = "fuente.png"):
+    status, data, elapsed = multipart_upload(host, port, path, name, 0,
+                                             {"output_format": "bmp", "preset": "fast"}, content=content)
+    if status != 200:
+        raise RuntimeError(f"La conversión falló: HTTP {status} {data}")
+    return data, elapsed
+
+
+def batch(host: str, port: int, content: bytes):
+    """POST /convert/batch con un solo archivo (campo `files`); retorna (status, cuerpo)"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"output_format\"\r\n\r\nbmp\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"preset\"\r\n\r\nfast\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"a.png\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return request(host, port, "POST", "/convert/batch", body=body,
+                   headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+
+def redirect_checks(host: str, port: int, content: bytes, part_size: int, checks: dict, report: dict) -> bytes:
+    data, elapsed = convert(host, port, content)
+    report["convert_and_upload_seconds"] = round(elapsed, 2)
+    base = f"http://{host}:{port}"
+
+    start = time.perf_counter()
+    status, headers, _ = fetch(base + data["download_url"])
+    location = headers.get("location", "")
+    checks["download_redirects_to_presigned_url"] = status == 307 and "X-Amz-Signature" in location
+    status, headers, body = fetch(location)
+    report["redirect_download_seconds"] = round(time.perf_counter() - start, 3)
+    report["output_bytes"] = len(body)
+    checks["presigned_download_ok"] = (status == 200 and body[:2] == b"BM"
+                                       and headers.get("content-type") == "image/bmp"
+                                       and data["filename"] in headers.get("content-disposition", ""))
+    parts = -(-len(body) // part_size)
+    report["expected_parts"] = parts
+    checks["multipart_upload"] = headers.get("etag", "").strip('"').endswith(f"-{parts}")
+
+    again, _ = convert(host, port, content)
+    checks["cache_hit_from_bucket"] = again.get("cached") is True and again["filename"] == data["filename"]
+
+    status, zipped = batch(host, port, content)
+    try:
+        with zipfile.ZipFile(io.BytesIO(zipped)) as archive:
+            checks["batch_zip_from_bucket"] = status == 200 and archive.read("a.bmp") == body
+    except zipfile.BadZipFile:
+        checks["batch_zip_from_bucket"] = False
+    return body
+
+
+def proxy_checks(host: str, port: int, content: bytes, expected: bytes, checks: dict, report: dict):
+    data, _ = convert(host, port, content)
+    checks["cache_survives_restart"] = data.get("cached") is True
+    path = f"http://{host}:{port}{data['download_url']}"
+
+    start = time.perf_counter()
+    status, headers, body = fetch(path)
+    report["proxied_download_seconds"] = round(time.perf_counter() - start, 3)
+    etag = headers.get("etag", "")
+    checks["proxied_download_ok"] = status == 200 and hashlib.sha256(body).digest() == hashlib.sha256(expected).digest()
+
+    status, _, body = fetch(path, headers={"If-None-Match": etag})
+    checks["proxied_not_modified"] = status == 304 and body == b""
+
+    middle = len(expected) // 2
+    status, headers, body = fetch(path, headers={"Range": f"bytes={middle}-", "If-Range": etag})
+    checks["proxied_range_resume"] = (status == 206 and body == expected[middle:]
+                                      and headers.get("content-range", "").startswith(f"bytes {middle}-"))
+    status, _, body = fetch(path, headers={"Range": f"bytes={middle}-", "If-Range": '"otro"'})
+    checks["proxied_stale_if_range_full"] = status == 200 and len(body) == len(expected)
+    status, _, _ = fetch(path, headers={"Range": f"bytes={len(expected) + 10}-"})
+    checks["proxied_range_not_satisfiable"] = status == 416
+
+    status, _ = request(host, port, "DELETE", f"/cleanup/{data['filename']}")
+    status_after, _, _ = fetch(path)
+    checks["cleanup_deletes_object"] = status == 200 and status_after == 404
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--part-mb", type=float, default=5, help="S3 exige al menos 5 MB por parte")
+    parser.add_argument("--endpoint", help="S3 compatible existente (por defecto se levanta moto.server)")
+    parser.add_argument("--bucket", default="convertidor-bench")
+    args = parser.parse_args()
+
+    buffer = io.BytesIO()
+    make_image(args.megapixels).save(buffer, format="PNG", compress_level=1)
+    content = buffer.getvalue()
+    part_size = int(args.part_mb * 1024 * 1024)
+    checks = {}
+    report = {"megapixels": args.megapixels, "part_mb": args.part_mb, "checks": checks}
+
+    if args.endpoint:
+        stand_in = nullcontext(args.endpoint)
+    else:
+        try:
+            import moto  # noqa: F401 (solo para avisar antes de levantar el stand-in)
+        except ImportError:
+            print("Sin --endpoint se necesita moto[server] para el stand-in de S3", file=sys.stderr)
+            return 1
+        stand_in = s3_stand_in(args.bucket)
+
+    with stand_in as endpoint:
+        report["endpoint"] = endpoint
+        env = {
+            "OUTPUT_STORAGE": f"s3://{args.bucket}/salidas",
+            "S3_ENDPOINT_URL": endpoint,
+            "S3_REGION": os.environ.get("S3_REGION", "us-east-1"),
+            "S3_PART_SIZE_MB": str(args.part_mb),
+            "AWS_ACCESS_KEY_ID": os.environ.get("AWS_ACCESS_KEY_ID", "test"),
+            "AWS_SECRET_ACCESS_KEY": os.environ.get("AWS_SECRET_ACCESS_KEY", "test"),
+            "CACHE_MAX_MB": "500",
+            "DISK_QUOTA_MB": "2000",
+        }
+        with run_server(env) as (host, port, _):
+            expected = redirect_checks(host, port, content, part_size, checks, report)
+        with run_server({**env, "DOWNLOAD_REDIRECT": "0"}) as (host, port, _):
+            proxy_checks(host, port, content, expected, checks, report)
+
+    report["ok"] = all(checks.values())
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: TXT→PDF con el bucle original (stringWidth por palabra) vs pdf_layout.
+
+El bucle original vuelve a medir la línea completa cada vez que agrega una palabra y dibuja cada
+línea con drawString; pdf_layout mide cada palabra una vez y dibuja cada página con un text object.
+Se usa el mismo texto sintético de fixtures.py y se verifica que ambos parten las líneas igual.
+
+Uso:
+    python benchmarks/bench_text_pdf.py --size-mb 10
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import BACKEND_DIR, peak_rss_mb, reset_peak_rss
+from fixtures import write_text
+
+sys.path.insert(0, str(BACKEND_DIR))
+from pdf_layout import TextLayout, render_text_pdf  # noqa: E402
+
+
+def legacy_render(text_content: str, output_path: Path, collect: list = None):
+    """Copia del bucle de convert_document_sync anterior a pdf_layout (referencia del benchmark)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(str(output_path), pagesize=A4)
+    width, height = A4
+    y_position = height - 50
+    line_height = 14
+    margin = 50
+    max_width = width - (2 * margin)
+    for line in text_content.split('\n'):
+        words = line.split(' ')
+        current_line = ""
+        for word in words:
+            test_line = current_line + (" " if current_line else "") + word
+            text_width = c.stringWidth(test_line, "Helvetica", 10)
+            if text_width > max_width and current_line:
+                c.drawString(margin, y_position, current_line)
+                if collect is not None:
+                    collect.append(current_line)
+                y_position -= line_height
+                current_line = word
+                if y_position < margin:
+                    c.showPage()
+                    y_position = height - 50
+            else:
+                current_line = test_line
+        if current_line:
+            c.drawString(margin, y_position, current_line)
+            if collect is not None:
+                collect.append(current_line)
+            y_position -= line_height
+        if y_position < margin:
+            c.showPage()
+            y_position = height - 50
+    c.save()
+
+
+def measure(fn) -> dict:
+    pid = os.getpid()
+    reset_peak_rss(pid)
+    start = time.perf_counter()
+    fn()
+    return {"seconds": round(time.perf_counter() - start, 2), "peak_rss_mb": round(peak_rss_mb(pid), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--skip-legacy", action="store_true", help="Medir solo pdf_layout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_text_pdf_") as tmp:
+        source = Path(tmp) / "texto.txt"
+        write_text(source, args.size_mb)
+        content = source.read_text(encoding="utf-8")
+        report = {"input_mb": round(source.stat().st_size / (1024 * 1024), 2)}
+
+        # Mismo partido de líneas (las líneas vacías el bucle original no las dibuja)
+        sample = content[:200_000]
+        legacy_lines = []
+        legacy_render(sample, Path(tmp) / "muestra.pdf", collect=legacy_lines)
+        layout = TextLayout()
+        new_lines = [w for line in sample.split("\n") for w in layout.wrap(line) if w]
+        report["same_line_breaks"] = legacy_lines == new_lines
+
+        if not args.skip_legacy:
+            legacy_out = Path(tmp) / "legacy.pdf"
+            report["legacy"] = measure(lambda: legacy_render(content, legacy_out))
+            report["legacy"]["output_mb"] = round(legacy_out.stat().st_size / (1024 * 1024), 2)
+        layout_out = Path(tmp) / "layout.pdf"
+        report["pdf_layout"] = measure(lambda: render_text_pdf(content.split("\n"), layout_out))
+        report["pdf_layout"]["output_mb"] = round(layout_out.stat().st_size / (1024 * 1024), 2)
+        if "legacy" in report:
+            report["speedup"] = round(report["legacy"]["seconds"] / report["pdf_layout"]["seconds"], 2)
+
+    print(json.dumps(report, indent=2))
+    return 0 if report["same_line_breaks"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark: memoria y escrituras a disco del servidor con N subidas concurrentes de ~50 MB a /convert.
+
+Los archivos son bytes aleatorios con extensión .png, así que Pillow falla enseguida al abrirlos:
+lo que se mide es la ingesta (el formulario se parsea a medida que llega y cada archivo se escribe
+directo en UPLOAD_DIR, ver multipart_upload.py), no la conversión. Verifica además que:
+  - cada subida se escribe una sola vez en disco (bytes escritos por el servidor / bytes subidos)
+  - un archivo que declara por Content-Length más de MAX_FILE_SIZE recibe 413 sin enviar el cuerpo
+  - un archivo sin Content-Length (chunked) recibe 413 en cuanto supera MAX_FILE_SIZE, sin esperar al resto
+  - lo mismo en /convert/stream: 413 antes de empezar la respuesta, no un 200 con la salida truncada
+
+Imprime un JSON con las mediciones y el resultado de cada verificación; termina con código 1 si
+alguna falla.
+
+Uso:
+    python benchmarks/bench_upload_memory.py --concurrency 3 --size-mb 49
+"""
+import argparse
+import json
+import os
+import select
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from common import current_rss_mb, multipart_upload, peak_rss_mb, run_server
+
+
+MAX_FILE_SIZE = 50 * 1024 * 1024
+
+
+def written_bytes(pid: int) -> int:
+    """Bytes pasados a write() por el proceso (wchar de /proc/<pid>/io). Solo Linux."""
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return -1
+
+
+def oversize_upload(host: str, port: int, size: int, declare_length: bool, path: str = "/convert",
+                    filename: str = "grande.png", output_format: str = "jpg"):
+    """Sube `size` bytes a `path` por un socket y deja de enviar en cuanto llega la respuesta.
+
+    Con `declare_length` la petición lleva Content-Length; si no, el cuerpo va chunked y el servidor
+    solo puede cortar al contar los bytes. Retorna (status, bytes del archivo enviados hasta la respuesta).
+    """
+    boundary = uuid.uuid4().hex
+    preamble = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"output_format\"\r\n\r\n{output_format}\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    epilogue = f"\r\n--{boundary}--\r\n".encode()
+    headers = [f"POST {path} HTTP/1.1", f"Host: {host}:{port}",
+               f"Content-Type: multipart/form-data; boundary={boundary}"]
+    if declare_length:
+        headers.append(f"Content-Length: {len(preamble) + size + len(epilogue)}")
+    else:
+        headers.append("Transfer-Encoding: chunked")
+
+    def send(data: bytes):
+        if not declare_length:
+            data = f"{len(data):x}\r\n".encode() + data + b"\r\n"
+        sock.sendall(data)
+
+    block = os.urandom(1024 * 1024)
+    sent = 0
+    response = b""
+    with socket.create_connection((host, port), timeout=60) as sock:
+        try:
+            sock.sendall(("\r\n".join(headers) + "\r\n\r\n").encode())
+            send(preamble)
+            while sent < size:
+                if select.select([sock], [], [], 0)[0]:
+                    break
+                piece = block[:size - sent]
+                send(piece)
+                sent += len(piece)
+            else:
+                send(epilogue)
+                if not declare_length:
+                    sock.sendall(b"0\r\n\r\n")
+            response = sock.recv(65536)
+        except OSError:
+            pass
+    status = int(response.split()[1]) if response.startswith(b"HTTP/") else None
+    return status, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--size-mb", type=float, default=49)
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    chunk = os.urandom(1024 * 1024)
+
+    checks = {}
+    with run_server() as (host, port, process):
+        baseline = current_rss_mb(process.pid)
+        written_before = written_bytes(process.pid)
+        results = []
+
+        def upload(i):
+            results.append(multipart_upload(host, port, "/convert", f"bench_{i}.png", size,
+                                            {"output_format": "jpg"}, chunk=chunk))
+
+        threads = [threading.Thread(target=upload, args=(i,)) for i in range(args.concurrency)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        peak = peak_rss_mb(process.pid)
+        written = written_bytes(process.pid) - written_before
+
+        oversize = int(1.6 * MAX_FILE_SIZE)
+        declared_status, declared_sent = oversize_upload(host, port, oversize, declare_length=True)
+        chunked_status, chunked_sent = oversize_upload(host, port, oversize, declare_length=False)
+        stream_status, stream_sent = oversize_upload(host, port, oversize, declare_length=False,
+                                                     path="/convert/stream", filename="grande.wav",
+                                                     output_format="mp3")
+
+    report = {
+        "concurrency": args.concurrency,
+        "size_mb": args.size_mb,
+        "rss_baseline_mb": round(baseline, 1),
+        "rss_peak_mb": round(peak, 1),
+        "rss_growth_mb": round(peak - baseline, 1),
+        "wall_seconds": round(elapsed, 2),
+        "upload_mb_per_s": round(args.concurrency * args.size_mb / elapsed, 1),
+        "statuses": sorted(status for status, _, _ in results),
+        "disk_writes_per_uploaded_byte": round(written / (args.concurrency * size), 2),
+        "oversize_declared": {"status": declared_status, "sent_mb": round(declared_sent / (1024 * 1024), 1)},
+        "oversize_chunked": {"status": chunked_status, "sent_mb": round(chunked_sent / (1024 * 1024), 1)},
+        "oversize_stream": {"status": stream_status, "sent_mb": round(stream_sent / (1024 * 1024), 1)},
+        "checks": checks,
+    }
+    # Una escritura por subida (antes: spool de Starlette + copia a UPLOAD_DIR ≈ 2)
+    checks["single_disk_write"] = 0.9 <= report["disk_writes_per_uploaded_byte"] < 1.2
+    # Rechazo sin recibir el cuerpo: solo lo que cupo en los buffers antes de leer la respuesta
+    checks["declared_oversize_rejected_upfront"] = declared_status == 413 and declared_sent < 8 * 1024 * 1024
+    checks["chunked_oversize_rejected_at_limit"] = (chunked_status == 413
+                                                    and chunked_sent < MAX_FILE_SIZE + 8 * 1024 * 1024)
+    # /convert/stream responde 413 antes de empezar la respuesta (no un 200 con el archivo truncado)
+    checks["stream_oversize_rejected_before_response"] = (stream_status == 413
+                                                          and stream_sent < MAX_FILE_SIZE + 8 * 1024 * 1024)
+    report["ok"] = all(checks.values())
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Utilidades compartidas por los benchmarks del backend (solo librería estándar)"""
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / "backend"
+
+
+def free_port() -> int:
+    """Obtiene un puerto TCP libre en localhost"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_mb(pid: int) -> float:
+    """Pico de memoria residente (VmHWM) de un proceso en MB. Solo Linux."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def current_rss_mb(pid: int) -> float:
+    """Memoria residente actual (VmRSS) de un proceso en MB. Solo Linux."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def process_tree(pid: int) -> list:
+    """PID del proceso y de todos sus descendientes (p. ej. servidor + workers del pool). Solo Linux."""
+    pids = [pid]
+    for current in pids:
+        try:
+            for tid in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{tid}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def reset_peak_rss(pid: int) -> bool:
+    """Reinicia VmHWM del proceso (escribiendo 5 en clear_refs) para medir el pico de un intervalo"""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def tree_peak_rss_mb(pid: int) -> float:
+    """Suma de los picos de memoria del proceso y sus descendientes vivos"""
+    return sum(value for value in (peak_rss_mb(p) for p in process_tree(pid)) if value == value)
+
+
+@contextmanager
+def run_server(env: dict = None):
+    """Inicia el backend con uvicorn en un subproceso y espera a que responda"""
+    port = free_port()
+    server_env = dict(os.environ)
+    # Los benchmarks disparan muchas conversiones desde una sola IP: sin límite por cliente
+    # salvo que el benchmark lo pida
+    server_env.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+    server_env.setdefault("JOB_QUEUE_MAX_PER_CLIENT", "0")
+    server_env.update(env or {})
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=server_env,
+    )
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                status, _ = request("127.0.0.1", port, "GET", "/formats")
+                if status == 200:
+                    break
+            except OSError:
+                time.sleep(0.2)
+        else:
+            raise RuntimeError("El servidor no respondió a tiempo")
+        yield "127.0.0.1", port, process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def request(host: str, port: int, method: str, path: str, body=None, headers: dict = None, timeout: float = 600):
+    """Petición HTTP simple; retorna (status, cuerpo en bytes)"""
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def multipart_upload(host: str, port: int, path: str, filename: str, size: int, fields: dict,
+                     chunk: bytes = None, content: bytes = None, timeout: float = 600, headers: dict = None):
+    """Sube un archivo multipart enviándolo por bloques (el cliente tampoco lo carga en memoria).
+
+    Si se pasa `content` se envía ese contenido; si no, se repite `chunk` hasta completar `size` bytes.
+    `headers` se agregan a la petición (p. ej. para simular clientes distintos).
+    Retorna (status, json o bytes de respuesta, segundos).
+    """
+    boundary = uuid.uuid4().hex
+    preamble = b""
+    for name, value in fields.items():
+        preamble += (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n"
+        ).encode()
+    preamble += (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    epilogue = f"\r\n--{boundary}--\r\n".encode()
+    if content is not None:
+        size = len(content)
+
+    def body():
+        yield preamble
+        if content is not None:
+            yield content
+        else:
+            block = chunk or os.urandom(1024 * 1024)
+            sent = 0
+            while sent < size:
+                piece = block[:size - sent]
+                sent += len(piece)
+                yield piece
+        yield epilogue
+
+    headers = {
+        **(headers or {}),
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Content-Length": str(len(preamble) + size + len(epilogue)),
+    }
+    start = time.perf_counter()
+    status, data = request(host, port, "POST", path, body=body(), headers=headers, timeout=timeout)
+    elapsed = time.perf_counter() - start
+    try:
+        data = json.loads(data)
+    except ValueError:
+        pass
+    return status, data, elapsed
+
+
+def percentile(values, pct: float) -> float:
+    """Percentil por interpolación lineal (pct entre 0 y 100)"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Generación de archivos sintéticos para los benchmarks de conversión.
+
+Todos los fixtures son deterministas (misma semilla, mismo contenido) para que los reportes
+de distintos commits sean comparables. Se generan una vez por ejecución en un directorio temporal.
+"""
+import array
+import math
+import random
+import shutil
+import subprocess
+import wave
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from PIL import Image
+
+SAMPLE_RATE = 44100
+
+LOREM = (
+    "El veloz murciélago hindú comía feliz cardillo y kiwi. La cigüeña tocaba el saxofón "
+    "detrás del palenque de paja. Ñandú, pingüino y acción: texto con acentos para probar encodings. "
+)
+
+
+def write_sine_wav(path: Path, seconds: float, frequency: float = 440.0):
+    """WAV estéreo 16 bits con un tono senoidal (frecuencia entera: cada segundo es idéntico)"""
+    samples = array.array("h")
+    for i in range(SAMPLE_RATE):
+        value = int(12000 * math.sin(2 * math.pi * frequency * i / SAMPLE_RATE))
+        samples.append(value)
+        samples.append(value)
+    one_second = samples.tobytes()
+    frames = int(SAMPLE_RATE * seconds)
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        for offset in range(0, frames, SAMPLE_RATE):
+            wav.writeframes(one_second[:(min(SAMPLE_RATE, frames - offset)) * 4])
+
+
+def transcode_audio(source: Path, path: Path) -> bool:
+    """Genera otros formatos de audio a partir del WAV (requiere FFmpeg)"""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return False
+    result = subprocess.run([ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", str(source), str(path)])
+    return result.returncode == 0 and path.exists()
+
+
+def make_image(megapixels: float) -> Image.Image:
+    """Imagen RGB con degradado y ruido (ni trivial de comprimir ni puro ruido)"""
+    side = int((megapixels * 1_000_000) ** 0.5)
+    gradient = Image.linear_gradient("L").resize((side, side))
+    noise = Image.effect_noise((side, side), 48)
+    return Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.ROTATE_90)))
+
+
+def write_animated_gif(path: Path, frames: int, side: int):
+    images = []
+    for i in range(frames):
+        frame = Image.new("RGB", (side, side), (i * 7 % 256, 80, 160))
+        frame.paste((255, 255, 255), (i * side // frames, 0, i * side // frames + side // 8, side))
+        images.append(frame.convert("P", palette=Image.Palette.ADAPTIVE))
+    images[0].save(path, save_all=True, append_images=images[1:], duration=40, loop=0)
+
+
+def paragraphs(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    words = LOREM.split()
+    for i in range(count):
+        yield f"{i + 1}. " + " ".join(rng.choice(words) for _ in range(rng.randint(40, 120)))
+
+
+def write_text(path: Path, size_mb: float):
+    target = int(size_mb * 1024 * 1024)
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for paragraph in paragraphs(10 ** 9):
+            f.write(paragraph + "\n\n")
+            written += len(paragraph.encode("utf-8")) + 2
+            if written >= target:
+                break
+
+
+def write_docx(path: Path, paragraph_count: int):
+    from docx import Document
+    doc = Document()
+    doc.add_heading("Documento de prueba", 0)
+    for paragraph in paragraphs(paragraph_count):
+        doc.add_paragraph(paragraph)
+    doc.save(str(path))
+
+
+def write_pdf(path: Path, pages: int):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    c = canvas.Canvas(str(path), pagesize=letter)
+    width, height = letter
+    texts = paragraphs(pages * 6)
+    for _ in range(pages):
+        y = height - 72
+        for _ in range(6):
+            text = next(texts)
+            for start in range(0, len(text), 90):
+                c.drawString(72, y, text[start:start + 90])
+                y -= 14
+            y -= 10
+        c.showPage()
+    c.save()
+
+
+def write_html(path: Path, paragraph_count: int):
+    body = "\n".join(f"<p>{p}</p>" for p in paragraphs(paragraph_count))
+    path.write_text(f"<html><head><meta charset=\"utf-8\"><title>Prueba</title></head><body>\n{body}\n</body></html>",
+                    encoding="utf-8")
+
+
+def write_markdown(path: Path, paragraph_count: int):
+    lines = ["# Documento de prueba", ""]
+    for i, paragraph in enumerate(paragraphs(paragraph_count)):
+        if i % 10 == 0:
+            lines += [f"## Sección {i // 10 + 1}", ""]
+        lines += [paragraph, ""]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def write_rtf(path: Path, paragraph_count: int):
+    body = "\n".join(r"\par " + p.encode("ascii", "ignore").decode() for p in paragraphs(paragraph_count))
+    path.write_text(r"{\rtf1\ansi\deff0 {\fonttbl {\f0 Helvetica;}}" + "\n" + body + "\n}", encoding="ascii")
+
+
+class FixtureSet:
+    """Crea bajo demanda un fixture por formato de entrada, según el tamaño elegido ("small" o "large")"""
+
+    SIZES = {
+        # audio_seconds, image_megapixels, gif_frames, pdf_pages, docx_paragraphs, text_mb
+        "small": dict(audio_seconds=5, megapixels=1, gif_frames=10, pdf_pages=5, paragraphs=200, text_mb=0.5),
+        "large": dict(audio_seconds=120, megapixels=24, gif_frames=60, pdf_pages=100, paragraphs=5000, text_mb=10),
+    }
+
+    def __init__(self, directory: Path, size: str = "small"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.params = self.SIZES[size]
+        self._cache: Dict[str, Optional[Path]] = {}
+
+    def get(self, input_format: str) -> Optional[Path]:
+        """Ruta del fixture para `input_format`, o None si no se puede generar en este entorno"""
+        if input_format not in self._cache:
+            path = self.directory / f"fixture.{input_format}"
+            generator = self._generators().get(input_format)
+            try:
+                ok = generator is not None and generator(path) is not False
+            except ImportError:
+                ok = False
+            self._cache[input_format] = path if ok and path.exists() else None
+        return self._cache[input_format]
+
+    def _generators(self) -> Dict[str, Callable[[Path], Optional[bool]]]:
+        p = self.params
+        audio_formats = ["mp3", "aac", "ogg", "flac", "m4a", "wma"]
+        generators = {
+            "wav": lambda path: write_sine_wav(path, p["audio_seconds"]),
+            "gif": lambda path: write_animated_gif(path, p["gif_frames"], int((p["megapixels"] * 1e6) ** 0.5) // 2),
+            "pdf": lambda path: write_pdf(path, p["pdf_pages"]),
+            "docx": lambda path: write_docx(path, p["paragraphs"]),
+            "txt": lambda path: write_text(path, p["text_mb"]),
+            "html": lambda path: write_html(path, p["paragraphs"]),
+            "md": lambda path: write_markdown(path, p["paragraphs"]),
+            "rtf": lambda path: write_rtf(path, p["paragraphs"]),
+        }
+        for fmt in audio_formats:
+            generators[fmt] = lambda path: transcode_audio(self.get("wav"), path) if self.get("wav") else False
+        for fmt, pillow_format in [("png", "PNG"), ("jpg", "JPEG"), ("jpeg", "JPEG"), ("webp", "WEBP"),
+                                   ("bmp", "BMP"), ("tiff", "TIFF")]:
+            generators[fmt] = lambda path, pillow_format=pillow_format: make_image(p["megapixels"]).save(path, format=pillow_format)
+        generators["ico"] = lambda path: make_image(0.07).save(path, format="ICO")
+        return generators